@@ -1,6 +1,65 @@
 from django.contrib import admin
-from .models import User, UserProfile, AdminProfile
 
-admin.site.register(User)
+from core.admin_tools import LargeTableAdmin
+from storage.activity import forget_activity, retained_activity
+from storage.models import FolderComment, FolderView
+
+from .messaging import rebuild_read_states
+from .models import AdminProfile, DirectMessage, User, UserProfile
+
+Follow = User.follows.through
+
+
+@admin.register(User)
+class UserAdmin(LargeTableAdmin):
+    list_display = ["id", "username", "email", "role", "is_public", "is_active", "date_joined"]
+    list_filter = ["role", "is_public", "is_active", "is_staff"]
+    search_fields = ["username", "email"]
+    raw_id_fields = ["follows", "groups", "user_permissions"]
+    readonly_fields = ["last_login", "date_joined"]
+    ordering = ["username"]
+
+    def affected_users(self, queryset):
+        # Removed follow rows change the follower counts on the other side,
+        # and removed messages the unread counts of their receivers.
+        ids = queryset.values("pk")
+        followed = Follow.objects.filter(from_user_id__in=ids).values_list("to_user_id", flat=True)
+        followers = Follow.objects.filter(to_user_id__in=ids).values_list("from_user_id", flat=True)
+        receivers = DirectMessage.objects.filter(sender_id__in=ids).values_list("receiver_id", flat=True).distinct()
+        return set(followed) | set(followers) | set(receivers)
+
+    @admin.action(description="Delete selected (no confirmation)", permissions=["delete"])
+    def bulk_delete(self, request, queryset):
+        # Their views and comments on other people's folders leave the activity buckets too.
+        ids = queryset.values("pk")
+        views = retained_activity(FolderView.objects.filter(user_id__in=ids), "viewed_at")
+        comments = retained_activity(FolderComment.objects.filter(owner_id__in=ids), "created_at")
+        super().bulk_delete(request, queryset)
+        forget_activity(views, "views")
+        forget_activity(comments, "comments")
+
+
+@admin.register(DirectMessage)
+class DirectMessageAdmin(LargeTableAdmin):
+    list_display = ["id", "sender", "receiver", "excerpt", "created_at"]
+    list_select_related = ["sender", "receiver"]
+    search_fields = ["text"]
+    autocomplete_fields = ["sender", "receiver"]
+    readonly_fields = ["created_at"]
+
+    def affected_users(self, queryset):
+        return set(queryset.values_list("receiver_id", flat=True).distinct())
+
+    def after_bulk_change(self, user_ids):
+        # Unread counters only ever grow from signals; recount them from the cursors.
+        if user_ids:
+            rebuild_read_states(user_ids)
+        super().after_bulk_change(user_ids)
+
+    @admin.display(description="text")
+    def excerpt(self, obj):
+        return obj.text[:80]
+
+
 admin.site.register(UserProfile)
-admin.site.register(AdminProfile)
\ No newline at end of file
+admin.site.register(AdminProfile)
@@ -0,0 +1,49 @@
+import heapq
+from operator import attrgetter
+
+from django.db.models import Q
+from django.views.decorators.http import require_GET
+
+from core.async_api import async_api_view, json_response, require_authenticated
+
+from .models import ArchivedDirectMessage, ConversationReadState, DirectMessage
+
+
+@require_GET
+@async_api_view
+async def chat_with_user(request, user_id):
+    require_authenticated(request)
+    if request.user.id == user_id:
+        return json_response({"error": "Cannot open chat with yourself."}, status=400)
+
+    conversation = Q(sender_id=request.user.id, receiver_id=user_id) | Q(
+        sender_id=user_id, receiver_id=request.user.id
+    )
+    # Archived history included, merged like core.archival.all_rows.
+    order = ("created_at", "id")
+    tables = []
+    for table in (ArchivedDirectMessage, DirectMessage):
+        rows = table.objects.filter(conversation).select_related("sender", "receiver").order_by(*order)
+        tables.append([message async for message in rows])
+    messages = heapq.merge(*tables, key=attrgetter(*order))
+    cursors = {
+        reader: cursor
+        async for reader, cursor in ConversationReadState.objects.filter(
+            Q(user_id=request.user.id, partner_id=user_id) | Q(user_id=user_id, partner_id=request.user.id)
+        ).values_list("user_id", "last_read_message_id")
+    }
+    return json_response(
+        [
+            {
+                "id": message.id,
+                "sender": message.sender_id,
+                "receiver": message.receiver_id,
+                "sender_username": message.sender.username,
+                "receiver_username": message.receiver.username,
+                "text": message.text,
+                "created_at": message.created_at,
+                "is_read": message.id <= cursors.get(message.receiver_id, 0),
+            }
+            for message in messages
+        ]
+    )
@@ -0,0 +1,105 @@
+"""
+JWT authentication that does not load the user row on every request.
+
+Access tokens carry the claims most views need (id, username, role,
+is_public) plus the user's ``token_version``. ``StatelessJWTAuthentication``
+turns them into a ``TokenClaimsUser``; the full ``User`` is only fetched the
+first time a view touches an attribute that is not in the token.
+Revocation is checked against ``token_version``/``is_active``, which are held
+in a small per-process cache for ``JWT_REVOCATION_CACHE_SECONDS``.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.utils.functional import SimpleLazyObject
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+CLAIM_FIELDS = ("username", "role", "is_public")
+VERSION_CLAIM = "ver"
+
+
+def add_user_claims(token, user):
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    token[VERSION_CLAIM] = user.token_version
+    return token
+
+
+class TokenVersionCache:
+    max_entries = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None and entry[2] > now:
+            return entry[0], entry[1]
+
+        row = User.objects.filter(pk=user_id).values_list("token_version", "is_active").first()
+        if row is None:
+            return None
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[user_id] = (*row, now + settings.JWT_REVOCATION_CACHE_SECONDS)
+        return row
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+token_versions = TokenVersionCache()
+
+
+class TokenClaimsUser(SimpleLazyObject):
+    """A ``User`` stand-in answering token claims without touching the database."""
+
+    def __init__(self, token, user_id):
+        super().__init__(lambda: User.objects.get(pk=user_id))
+        claims = {
+            "id": user_id,
+            "pk": user_id,
+            "is_authenticated": True,
+            "is_anonymous": False,
+            "is_active": True,
+            **{field: token[field] for field in CLAIM_FIELDS},
+        }
+        # Bypass LazyObject.__setattr__, which would evaluate the wrapped user.
+        self.__dict__.update(claims)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            # simplejwt serializes the id as a string; views compare it with integer FKs.
+            user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, ValidationError) as exc:
+            raise InvalidToken("Token contained no recognizable user identification") from exc
+
+        if any(field not in validated_token for field in (*CLAIM_FIELDS, VERSION_CLAIM)):
+            # Tokens issued before the claims were embedded: fall back to a DB load.
+            return super().get_user(validated_token)
+
+        state = token_versions.get(user_id)
+        if state is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        version, is_active = state
+        if not is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if validated_token[VERSION_CLAIM] != version:
+            raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+
+        return TokenClaimsUser(validated_token, user_id)
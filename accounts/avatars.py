@@ -0,0 +1,104 @@
+"""
+Resized copies of profile photos for use as avatars.
+
+Each upload is re-encoded into fixed square sizes (WebP, or JPEG when Pillow
+lacks WebP support). Files are named after a hash of their content, so a
+URL never changes meaning and can be cached forever. ``User.avatar_variants``
+maps each size name to its storage path, plus the photo it was made from
+under ``"source"``.
+"""
+
+import hashlib
+import io
+import logging
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from storage import versions
+
+logger = logging.getLogger(__name__)
+
+AVATAR_DIR = "avatars"
+AVATAR_SIZES = {"small": 64, "medium": 160, "large": 512}
+AVATAR_NAME = re.compile(r"^[0-9a-f]{16}-\d+\.(webp|jpg)$")
+CONTENT_TYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _encoder():
+    from PIL import features
+
+    if features.check("webp"):
+        return "WEBP", "webp", {"quality": 82, "method": 4}
+    return "JPEG", "jpg", {"quality": 85, "optimize": True, "progressive": True}
+
+
+def _square(image):
+    from PIL import ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    side = min(image.size)
+    left, top = (image.width - side) // 2, (image.height - side) // 2
+    return image.crop((left, top, left + side, top + side))
+
+
+def render_avatars(fileobj):
+    """Return ``{size_name: storage_path}`` for an image file, saving new files as needed."""
+    from PIL import Image
+
+    fmt, extension, options = _encoder()
+    with Image.open(fileobj) as original:
+        square = _square(original)
+
+    variants = {}
+    for name, pixels in AVATAR_SIZES.items():
+        image = square.resize((pixels, pixels), Image.LANCZOS) if square.width > pixels else square
+        if fmt == "JPEG" and image.mode == "RGBA":
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, fmt, **options)
+        digest = hashlib.sha256(buffer.getvalue()).hexdigest()[:16]
+        path = f"{AVATAR_DIR}/{digest}-{pixels}.{extension}"
+        if not default_storage.exists(path):
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+        variants[name] = path
+    return variants
+
+
+def process_avatar(user):
+    """Bring ``user.avatar_variants`` in line with ``user.profile_photo``; returns True if changed."""
+    photo = user.profile_photo
+    source = photo.name if photo else None
+    if user.avatar_variants.get("source") == source:
+        return False
+
+    variants = {}
+    if photo:
+        try:
+            with photo.open("rb") as handle:
+                variants = render_avatars(handle)
+        except Exception:
+            # Keep serving the original rather than retrying a broken upload on every save.
+            logger.exception("Could not build avatars for user %s", user.pk)
+        variants["source"] = source
+
+    user.avatar_variants = variants
+    type(user).objects.filter(pk=user.pk).update(avatar_variants=variants)
+    # ``update`` skips the post_save receiver that versions the owner fields of listings.
+    versions.bump(type(user))
+    return True
+
+
+def avatar_url(user, size="small", request=None):
+    """URL of the ``size`` avatar, falling back to the original photo until it is processed."""
+    path = user.avatar_variants.get(size)
+    if path:
+        url = default_storage.url(path)
+    elif user.profile_photo:
+        url = user.profile_photo.url
+    else:
+        return None
+    return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .models import normalize_email
+
+User = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    """Authenticate by email with a single indexed lookup on ``email_normalized``."""
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        user = User.objects.filter(email_normalized=normalize_email(email)).order_by("id").first()
+        if user is None:
+            # Hash anyway so unknown emails take as long as wrong passwords.
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,227 @@
+"""
+Follow-graph queries.
+
+Edges live in ``accounts_user_follows``: its unique ``(from_user, to_user)``
+index answers "whom does X follow" and its ``to_user`` index answers "who
+follows X". With a shared cache backend, each user's following and follower
+id sets are cached for ``FOLLOW_GRAPH_CACHE_SECONDS`` and ``record_follow``
+deletes the two sets a follow touches, so every worker sees the change on its
+next read. Per-process backends could only be invalidated in the worker that
+served the follow, so there the cache is off (the setting defaults to 0) and
+every answer comes from the table. Sets larger than ``FOLLOW_GRAPH_MAX_CACHED``
+are never cached. Questions about them go to the table, filtered to the ids
+being asked about.
+
+"People you may know" suggestions are stored in ``FollowSuggestion``, scored
+by how many of the people a user follows already follow the suggested
+account. ``rebuild_suggestions`` computes them in batches; between rebuilds
+the ``update_follow_suggestions`` task adjusts them after each follow (on a
+background thread in eager mode), reading the table rather than the cache so
+scores never drift from the real graph, and trims each user it touches back
+to ``SUGGESTIONS_PER_USER``.
+"""
+
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import FollowSuggestion
+
+User = get_user_model()
+Follow = User.follows.through
+
+SUGGESTIONS_PER_USER = 20
+CHUNK_SIZE = 500
+LARGE = "large"
+COLUMNS = {"following": ("from_user_id", "to_user_id"), "followers": ("to_user_id", "from_user_id")}
+
+
+def _key(kind, user_id):
+    return f"follow-graph:{kind}:{user_id}"
+
+
+def _load(kind, user_id):
+    """The id set from the table, or ``None`` when it is too large to cache."""
+    own, other = COLUMNS[kind]
+    limit = settings.FOLLOW_GRAPH_MAX_CACHED
+    rows = list(Follow.objects.filter(**{own: user_id}).values_list(other, flat=True)[: limit + 1])
+    return None if len(rows) > limit else frozenset(rows)
+
+
+def _adjacency(kind, user_id):
+    """The cached id set, or ``None`` when it is too large or caching is off."""
+    if settings.FOLLOW_GRAPH_CACHE_SECONDS <= 0:
+        return None
+    key = _key(kind, user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = _load(kind, user_id)
+        cache.set(key, LARGE if ids is None else ids, settings.FOLLOW_GRAPH_CACHE_SECONDS)
+    return None if ids == LARGE else ids
+
+
+def _query_among(kind, user_id, user_ids):
+    own, other = COLUMNS[kind]
+    return set(Follow.objects.filter(**{own: user_id, f"{other}__in": user_ids}).values_list(other, flat=True))
+
+
+def _among(kind, user_id, user_ids):
+    if not user_id or not user_ids:
+        return set()
+    ids = _adjacency(kind, user_id)
+    if ids is not None:
+        return ids.intersection(user_ids)
+    return _query_among(kind, user_id, user_ids)
+
+
+def following_among(user_id, user_ids):
+    """The subset of ``user_ids`` that ``user_id`` follows."""
+    return _among("following", user_id, user_ids)
+
+
+def followers_among(user_id, user_ids):
+    """The subset of ``user_ids`` that follow ``user_id``."""
+    return _among("followers", user_id, user_ids)
+
+
+def following(user_id):
+    ids = _adjacency("following", user_id)
+    if ids is None:
+        ids = frozenset(Follow.objects.filter(from_user_id=user_id).values_list("to_user_id", flat=True))
+    return ids
+
+
+def mutual_connections(viewer_id, user_id):
+    """People ``viewer_id`` follows who also follow ``user_id`` ("followed by ...")."""
+    return followers_among(user_id, following(viewer_id))
+
+
+def record_follow(follower_id, followed_id, follows):
+    """Bring the cache and suggestions up to date after a follow or unfollow."""
+    from .tasks import update_follow_suggestions
+
+    if settings.FOLLOW_GRAPH_CACHE_SECONDS > 0:
+        cache.delete_many([_key("following", follower_id), _key("followers", followed_id)])
+    update_follow_suggestions.enqueue(follower_id, followed_id, follows)
+
+
+# Suggestions ---------------------------------------------------------------
+
+
+def _chunks(ids, size=CHUNK_SIZE):
+    ids = sorted(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
+
+
+def _bump_suggestions(user_ids, suggested_ids, delta):
+    """
+    Add ``delta`` to every pair of ``user_ids`` x ``suggested_ids``, creating
+    rows as needed. Callers pass a single id on one side, so each chunk of the
+    other costs one UPDATE and, for votes gained, one INSERT.
+    """
+    for users in _chunks(user_ids):
+        for suggested in _chunks(suggested_ids):
+            FollowSuggestion.objects.filter(user_id__in=users, suggested_id__in=suggested).update(
+                score=F("score") + delta
+            )
+            if delta > 0:
+                # Rows the UPDATE just counted conflict and are skipped.
+                FollowSuggestion.objects.bulk_create(
+                    [FollowSuggestion(user_id=u, suggested_id=pk, score=delta) for u in users for pk in suggested],
+                    ignore_conflicts=True,
+                )
+
+
+def _trim_suggestions(user_ids, per_user=SUGGESTIONS_PER_USER):
+    """Keep each user's ``per_user`` best suggestions, ranked as ``rebuild_suggestions`` ranks them."""
+    for chunk in _chunks(user_ids):
+        ranked = defaultdict(list)
+        for pk, user_id, suggested_id, score in FollowSuggestion.objects.filter(user_id__in=chunk).values_list(
+            "pk", "user_id", "suggested_id", "score"
+        ):
+            ranked[user_id].append((-score, suggested_id, pk))
+        extra = [pk for rows in ranked.values() for _, _, pk in sorted(rows)[per_user:]]
+        if extra:
+            FollowSuggestion.objects.filter(pk__in=extra).delete()
+
+
+def adjust_suggestions(follower_id, followed_id, follows):
+    """
+    Apply one follow (or unfollow) to the stored suggestions: the follower
+    gains (or loses) a vote for everyone ``followed_id`` follows, and each of
+    the follower's followers gains (or loses) a vote for ``followed_id``.
+    Everyone who gained votes is trimmed back to ``SUGGESTIONS_PER_USER``.
+    Accounts with follow lists too large to cache are left to the next rebuild.
+    """
+    delta = 1 if follows else -1
+    own_following = frozenset(Follow.objects.filter(from_user_id=follower_id).values_list("to_user_id", flat=True))
+
+    with transaction.atomic():
+        second_hop = _load("following", followed_id)
+        if second_hop is not None:
+            candidates = second_hop - own_following - {follower_id}
+            _bump_suggestions([follower_id], candidates, delta)
+
+        voters = set()
+        followers = _load("followers", follower_id)
+        if followers:
+            voters = followers - {followed_id} - _query_among("followers", followed_id, followers)
+            _bump_suggestions(voters, [followed_id], delta)
+
+        if follows:
+            FollowSuggestion.objects.filter(user_id=follower_id, suggested_id=followed_id).delete()
+            _trim_suggestions({follower_id, *voters})
+        else:
+            # Unfollowing puts the account back in reach if friends still follow it.
+            votes = len(_query_among("followers", followed_id, own_following)) if own_following else 0
+            if votes:
+                FollowSuggestion.objects.update_or_create(
+                    user_id=follower_id, suggested_id=followed_id, defaults={"score": votes}
+                )
+                _trim_suggestions([follower_id])
+            FollowSuggestion.objects.filter(user_id=follower_id, score__lte=0).delete()
+            FollowSuggestion.objects.filter(suggested_id=followed_id, score__lte=0).delete()
+
+
+def rebuild_suggestions(user_ids=None, batch_size=500, per_user=SUGGESTIONS_PER_USER):
+    """Recompute suggestions from the follow table; all users when ``user_ids`` is None."""
+    users = User.objects.order_by("pk").values_list("pk", flat=True)
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+
+    rebuilt = 0
+    ids = list(users[:batch_size])
+    while ids:
+        first_hop = defaultdict(set)
+        for follower_id, followed_id in Follow.objects.filter(from_user_id__in=ids).values_list(
+            "from_user_id", "to_user_id"
+        ):
+            first_hop[follower_id].add(followed_id)
+
+        second_hop = defaultdict(list)
+        middle = set().union(*first_hop.values()) if first_hop else set()
+        for follower_id, followed_id in Follow.objects.filter(from_user_id__in=middle).values_list(
+            "from_user_id", "to_user_id"
+        ).iterator():
+            second_hop[follower_id].append(followed_id)
+
+        rows = []
+        for user_id in ids:
+            followed = first_hop.get(user_id, set())
+            votes = Counter(pk for friend in followed for pk in second_hop.get(friend, ()))
+            for pk in followed | {user_id}:
+                votes.pop(pk, None)
+            ranked = sorted(votes.items(), key=lambda item: (-item[1], item[0]))[:per_user]
+            rows.extend(FollowSuggestion(user_id=user_id, suggested_id=pk, score=n) for pk, n in ranked)
+
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(user_id__in=ids).delete()
+            FollowSuggestion.objects.bulk_create(rows, batch_size=1000)
+        rebuilt += len(ids)
+        ids = list(users.filter(pk__gt=ids[-1])[:batch_size])
+    return rebuilt
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import ArchivedDirectMessage, DirectMessage
+from core.archival import archive_older_than
+from storage.models import ArchivedFolderMessage, FolderMessage
+
+
+class Command(BaseCommand):
+    help = "Move direct and folder messages older than the retention window to the archive tables."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.MESSAGE_ARCHIVE_AFTER_DAYS,
+            help="Archive messages older than this many days.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many messages would move.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        tables = [
+            ("direct messages", DirectMessage, ArchivedDirectMessage),
+            ("folder messages", FolderMessage, ArchivedFolderMessage),
+        ]
+        for label, model, archive_model in tables:
+            if options["dry_run"]:
+                count = model.objects.filter(created_at__lt=cutoff).count()
+                self.stdout.write(f"{label}: {count} would be archived")
+                continue
+            moved = archive_older_than(model, archive_model, cutoff, batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{label}: archived {moved}"))
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts.avatars import process_avatar
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Build resized avatars for users whose profile photo has not been processed yet."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Rebuild avatars for every user with a photo.")
+
+    def handle(self, *args, **options):
+        users = User.objects.exclude(profile_photo="").exclude(profile_photo__isnull=True).only(
+            "pk", "profile_photo", "avatar_variants"
+        )
+        processed = 0
+        for user in users.iterator():
+            if options["force"]:
+                user.avatar_variants = {}
+            if process_avatar(user):
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed avatars for {processed} users."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from accounts.follow_graph import rebuild_suggestions
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored friends-of-friends follow suggestions."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only rebuild this user id (repeatable).")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = rebuild_suggestions(options["users"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt follow suggestions for {count} users."))
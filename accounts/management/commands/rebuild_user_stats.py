@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from accounts.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-user follower, following, folder, file, byte and unread-message counters."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only rebuild this user id (repeatable).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_user_stats(options["users"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} users."))
@@ -0,0 +1,107 @@
+"""
+Read cursors and unread counters for direct messages.
+
+Each (reader, partner) pair has a ``ConversationReadState`` holding the id of
+the last message the reader has seen and how many newer ones are waiting.
+The sum over a user's conversations is kept in ``UserStats.unread_messages``
+so the badge count is a single primary-key lookup. Archived messages
+(``ArchivedDirectMessage``) still count: cursors and unread counts are
+computed over both tables.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import ArchivedDirectMessage, ConversationReadState, DirectMessage, UserStats
+
+
+def record_message(message):
+    """Count a newly sent message as unread for its receiver."""
+    conversation = {"user_id": message.receiver_id, "partner_id": message.sender_id}
+    with transaction.atomic():
+        bump = F("unread_count") + 1
+        if not ConversationReadState.objects.filter(**conversation).update(unread_count=bump):
+            _, created = ConversationReadState.objects.get_or_create(**conversation, defaults={"unread_count": 1})
+            if not created:
+                ConversationReadState.objects.filter(**conversation).update(unread_count=bump)
+        UserStats.objects.filter(user_id=message.receiver_id).update(
+            unread_messages=F("unread_messages") + 1
+        )
+
+
+def mark_read(user_id, partner_id, message_id=None):
+    """
+    Move the read cursor up to ``message_id`` (the latest message when None)
+    and return the state. Cursors never move backwards, nor past the latest
+    message received from ``partner_id``, so later messages stay unread.
+    """
+    incoming = [
+        table.objects.filter(sender_id=partner_id, receiver_id=user_id)
+        for table in (DirectMessage, ArchivedDirectMessage)
+    ]
+    latest = max(rows.aggregate(latest=Max("id"))["latest"] or 0 for rows in incoming)
+    message_id = latest if message_id is None else min(message_id, latest)
+
+    with transaction.atomic():
+        state, _ = ConversationReadState.objects.select_for_update().get_or_create(
+            user_id=user_id, partner_id=partner_id
+        )
+        if message_id <= state.last_read_message_id:
+            return state
+        unread = sum(rows.filter(id__gt=message_id).count() for rows in incoming)
+        UserStats.objects.filter(user_id=user_id).update(
+            unread_messages=F("unread_messages") - (state.unread_count - unread)
+        )
+        state.last_read_message_id = message_id
+        state.unread_count = unread
+        state.save(update_fields=["last_read_message_id", "unread_count"])
+    return state
+
+
+def _unread_past_cursor(table):
+    # Messages of ``table`` newer than the cursor of the outer ConversationReadState.
+    return Subquery(
+        table.objects.filter(
+            receiver_id=OuterRef("user_id"),
+            sender_id=OuterRef("partner_id"),
+            id__gt=OuterRef("last_read_message_id"),
+        )
+        .order_by()
+        .values("receiver_id")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+
+
+def rebuild_read_states(user_ids):
+    """
+    Recount ``unread_count`` of every conversation of ``user_ids`` from their
+    read cursors, after messages were removed without signals. The users'
+    ``UserStats.unread_messages`` must be rebuilt afterwards.
+    """
+    return ConversationReadState.objects.filter(user_id__in=user_ids).update(
+        unread_count=Coalesce(_unread_past_cursor(DirectMessage), 0)
+        + Coalesce(_unread_past_cursor(ArchivedDirectMessage), 0)
+    )
+
+
+def unread_total(user_id):
+    return UserStats.objects.filter(user_id=user_id).values_list("unread_messages", flat=True).first() or 0
+
+
+def read_states(user_id, partner_ids):
+    """``{partner_id: (last_read_message_id, unread_count)}`` for ``user_id``'s conversations."""
+    rows = ConversationReadState.objects.filter(user_id=user_id, partner_id__in=partner_ids)
+    return {
+        partner: (cursor, unread)
+        for partner, cursor, unread in rows.values_list("partner_id", "last_read_message_id", "unread_count")
+    }
+
+
+def conversation_cursors(user_id, partner_id):
+    """``{reader_id: last_read_message_id}`` for both sides of a conversation."""
+    rows = ConversationReadState.objects.filter(
+        user_id__in=[user_id, partner_id], partner_id__in=[user_id, partner_id]
+    ).values_list("user_id", "partner_id", "last_read_message_id")
+    return {reader: cursor for reader, partner, cursor in rows if reader != partner}
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:25
+
+from django.db import migrations, models
+from django.db.models.functions import Lower, Trim
+
+
+def fill_email_normalized(apps, schema_editor):
+    User = apps.get_model("accounts", "User")
+    User.objects.update(email_normalized=Lower(Trim("email")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_user_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=254),
+        ),
+        migrations.RunPython(fill_email_normalized, migrations.RunPython.noop),
+    ]
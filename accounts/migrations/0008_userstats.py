@@ -0,0 +1,62 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def _grouped(queryset, key, value=None):
+    aggregate = Sum(value) if value else Count("pk")
+    return dict(queryset.values(key).annotate(n=aggregate).values_list(key, "n"))
+
+
+def create_user_stats(apps, schema_editor):
+    User = apps.get_model("accounts", "User")
+    UserStats = apps.get_model("accounts", "UserStats")
+    Folder = apps.get_model("storage", "Folder")
+    File = apps.get_model("storage", "File")
+    Follow = User.follows.through
+
+    followers = _grouped(Follow.objects.all(), "to_user_id")
+    following = _grouped(Follow.objects.all(), "from_user_id")
+    folders = _grouped(Folder.objects.all(), "owner_id")
+    files = _grouped(File.objects.all(), "owner_id")
+    sizes = _grouped(File.objects.all(), "owner_id", "size")
+    UserStats.objects.bulk_create(
+        (
+            UserStats(
+                user_id=pk,
+                followers_count=followers.get(pk, 0),
+                following_count=following.get(pk, 0),
+                folder_count=folders.get(pk, 0),
+                file_count=files.get(pk, 0),
+                total_bytes=sizes.get(pk) or 0,
+            )
+            for pk in User.objects.values_list("pk", flat=True).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_email_normalized'),
+        ('storage', '0008_file_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('followers_count', models.IntegerField(default=0)),
+                ('following_count', models.IntegerField(default=0)),
+                ('folder_count', models.IntegerField(default=0)),
+                ('file_count', models.IntegerField(default=0)),
+                ('total_bytes', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def mark_existing_read(apps, schema_editor):
+    # Messages sent before read tracking existed start out as read.
+    DirectMessage = apps.get_model("accounts", "DirectMessage")
+    ConversationReadState = apps.get_model("accounts", "ConversationReadState")
+    rows = DirectMessage.objects.values("receiver_id", "sender_id").annotate(last=Max("id"))
+    ConversationReadState.objects.bulk_create(
+        (
+            ConversationReadState(
+                user_id=row["receiver_id"],
+                partner_id=row["sender_id"],
+                last_read_message_id=row["last"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_userstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='unread_messages',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ConversationReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_message_id', models.BigIntegerField(default=0)),
+                ('unread_count', models.IntegerField(default=0)),
+                ('partner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'partner')},
+            },
+        ),
+        migrations.RunPython(mark_existing_read, migrations.RunPython.noop),
+    ]
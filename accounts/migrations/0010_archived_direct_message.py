@@ -0,0 +1,49 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_conversation_read_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDirectMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='directmessage',
+            index=models.Index(fields=['sender', 'receiver', 'created_at'], name='accounts_di_sender__3c7779_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='directmessage',
+            index=models.Index(fields=['receiver', 'sender', 'created_at'], name='accounts_di_receive_288b27_idx'),
+        ),
+        migrations.AddField(
+            model_name='archiveddirectmessage',
+            name='receiver',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archiveddirectmessage',
+            name='sender',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archiveddirectmessage',
+            index=models.Index(fields=['sender', 'receiver', 'created_at'], name='accounts_ar_sender__d88d8c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archiveddirectmessage',
+            index=models.Index(fields=['receiver', 'sender', 'created_at'], name='accounts_ar_receive_b2604e_idx'),
+        ),
+    ]
@@ -5,6 +5,10 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+
 class User(AbstractUser):
 
     ROLE_CHOICES = (
@@ -20,14 +24,46 @@ class User(AbstractUser):
     is_public = models.BooleanField(default=True)
     public_password = models.CharField(max_length=255, blank=True, null=True)
     profile_photo = models.ImageField(upload_to="profiles/", null=True, blank=True)
+    # Resized copies of ``profile_photo``; see ``accounts.avatars``.
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     follows = models.ManyToManyField(
         "self",
         symmetrical=False,
         related_name="followers",
         blank=True,
     )
+    # Indexed, case-folded copy of ``email`` for login lookups.
+    email_normalized = models.CharField(max_length=254, blank=True, db_index=True, editable=False)
+    # Embedded in access tokens; bumping it revokes every token issued so far.
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
     REQUIRED_FIELDS = ['email', 'role']
+
+    def save(self, *args, **kwargs):
+        self.email_normalized = normalize_email(self.email)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "email" in update_fields:
+            kwargs["update_fields"] = update_fields = {*update_fields, "email_normalized"}
+        # ``_password`` is only set by an explicit set_password(); the hash
+        # upgrade in check_password() clears it, so logins never revoke tokens.
+        password_changed = self._password is not None and self.pk is not None
+        if password_changed:
+            self.token_version += 1
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "token_version"}
+        super().save(*args, **kwargs)
+        if password_changed:
+            from .authentication import token_versions
+
+            token_versions.invalidate(self.pk)
+
+    def revoke_tokens(self):
+        from .authentication import token_versions
+
+        User.objects.filter(pk=self.pk).update(token_version=models.F("token_version") + 1)
+        self.refresh_from_db(fields=["token_version"])
+        token_versions.invalidate(self.pk)
+
     def __str__(self):
         name = self.get_full_name()
         if name:
@@ -37,6 +73,18 @@ class User(AbstractUser):
 
 
 
+class UserStats(models.Model):
+    """Denormalized per-user counters, maintained by signals in ``accounts.signals``."""
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    folder_count = models.IntegerField(default=0)
+    file_count = models.IntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
+    unread_messages = models.IntegerField(default=0)
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(blank=True, null=True)
@@ -52,3 +100,49 @@ class DirectMessage(models.Model):
     receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name="received_messages")
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["sender", "receiver", "created_at"]),
+            models.Index(fields=["receiver", "sender", "created_at"]),
+        ]
+
+
+class ArchivedDirectMessage(models.Model):
+    """Cold copy of a ``DirectMessage`` moved out by ``archive_messages``; ids are preserved."""
+
+    id = models.BigIntegerField(primary_key=True)
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    text = models.TextField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["sender", "receiver", "created_at"]),
+            models.Index(fields=["receiver", "sender", "created_at"]),
+        ]
+
+
+class ConversationReadState(models.Model):
+    """How far ``user`` has read the direct messages ``partner`` sent them."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="read_states")
+    partner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    last_read_message_id = models.BigIntegerField(default=0)
+    unread_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "partner")
+
+
+class FollowSuggestion(models.Model):
+    """Someone ``user`` does not follow yet but ``score`` of the people they follow do."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="follow_suggestions")
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    score = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "suggested")
+        indexes = [models.Index(fields=["user", "-score"])]
@@ -1,9 +1,17 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from core.instrumentation import InstrumentedSerializerMixin
 
 User = get_user_model()
 
-from accounts.models import AdminProfile, UserProfile, DirectMessage
+from accounts.authentication import VERSION_CLAIM, add_user_claims
+from accounts.avatars import avatar_url
+from accounts.follow_graph import followers_among, following_among
+from accounts.models import AdminProfile, UserProfile, UserStats, DirectMessage, normalize_email
 # ✅ Registration Serializer
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -19,8 +27,8 @@ class RegisterSerializer(serializers.ModelSerializer):
         return username
 
     def validate_email(self, value):
-        email = value.strip().lower()
-        if User.objects.filter(email__iexact=email).exists():
+        email = normalize_email(value)
+        if User.objects.filter(email_normalized=email).exists():
             raise serializers.ValidationError("This email is already registered.")
         return email
 
@@ -32,11 +40,34 @@ class RegisterSerializer(serializers.ModelSerializer):
         )
         return user
 
+class UserListSerializer(serializers.ListSerializer):
+    """Resolves the follow flags for the whole page at once, from the follow-graph cache."""
+
+    def to_representation(self, data):
+        users = list(data.all() if hasattr(data, "all") else data)
+        request = self.context.get("request")
+        if request and request.user.is_authenticated:
+            ids = [u.id for u in users]
+            self.context["following_ids"] = following_among(request.user.id, ids)
+            self.context["follower_ids"] = followers_among(request.user.id, ids)
+        return super().to_representation(users)
+
+
+def get_user_stats(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return None
+
+
 # ✅ Profile Serializer
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     followers_count = serializers.SerializerMethodField()
     following_count = serializers.SerializerMethodField()
     is_following = serializers.SerializerMethodField()
+    follows_you = serializers.SerializerMethodField()
+    is_mutual = serializers.SerializerMethodField()
+    avatar_url = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -46,27 +77,69 @@ class UserSerializer(serializers.ModelSerializer):
             "email",
             "is_public",
             "profile_photo",
+            "avatar_url",
             "followers_count",
             "following_count",
             "is_following",
+            "follows_you",
+            "is_mutual",
         ]
+        list_serializer_class = UserListSerializer
+
+    def get_avatar_url(self, obj):
+        return avatar_url(obj, "medium", self.context.get("request"))
 
     def get_followers_count(self, obj):
-        return obj.followers.count()
+        stats = get_user_stats(obj)
+        return stats.followers_count if stats else obj.followers.count()
 
     def get_following_count(self, obj):
-        return obj.follows.count()
+        stats = get_user_stats(obj)
+        return stats.following_count if stats else obj.follows.count()
 
-    def get_is_following(self, obj):
+    def _flag(self, obj, context_key, lookup):
         request = self.context.get("request")
         if not request or not request.user.is_authenticated:
             return False
-        return request.user.follows.filter(id=obj.id).exists()
+        if context_key not in self.context:
+            return obj.id in lookup(request.user.id, [obj.id])
+        return obj.id in self.context[context_key]
+
+    def get_is_following(self, obj):
+        return self._flag(obj, "following_ids", following_among)
+
+    def get_follows_you(self, obj):
+        return self._flag(obj, "follower_ids", followers_among)
 
+    def get_is_mutual(self, obj):
+        return self.get_is_following(obj) and self.get_follows_you(obj)
 
-class DirectMessageSerializer(serializers.ModelSerializer):
+
+class OwnProfileSerializer(UserSerializer):
+    folder_count = serializers.SerializerMethodField()
+    file_count = serializers.SerializerMethodField()
+    total_bytes = serializers.SerializerMethodField()
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ["folder_count", "file_count", "total_bytes"]
+
+    def get_folder_count(self, obj):
+        stats = get_user_stats(obj)
+        return stats.folder_count if stats else 0
+
+    def get_file_count(self, obj):
+        stats = get_user_stats(obj)
+        return stats.file_count if stats else 0
+
+    def get_total_bytes(self, obj):
+        stats = get_user_stats(obj)
+        return stats.total_bytes if stats else 0
+
+
+class DirectMessageSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     sender_username = serializers.CharField(source="sender.username", read_only=True)
     receiver_username = serializers.CharField(source="receiver.username", read_only=True)
+    is_read = serializers.SerializerMethodField()
 
     class Meta:
         model = DirectMessage
@@ -78,5 +151,31 @@ class DirectMessageSerializer(serializers.ModelSerializer):
             "receiver_username",
             "text",
             "created_at",
+            "is_read",
         ]
         read_only_fields = ["sender", "created_at", "sender_username", "receiver_username"]
+
+    def get_is_read(self, obj):
+        # ``read_cursors`` maps each reader to their last read message id.
+        return obj.id <= self.context.get("read_cursors", {}).get(obj.receiver_id, 0)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh that re-reads the user so new access tokens carry current claims."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = User.objects.filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM)).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        if VERSION_CLAIM in refresh and refresh[VERSION_CLAIM] != user.token_version:
+            raise AuthenticationFailed("Token has been revoked.", "token_revoked")
+
+        add_user_claims(refresh, user)
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+        return data
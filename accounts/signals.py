@@ -1,14 +1,113 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import UserProfile,AdminProfile
+
+from storage.models import File, Folder
+
+from . import tasks
+from .messaging import record_message
+from .models import ConversationReadState, DirectMessage, UserStats
+from .stats import adjust_user_stats, counters_deferred
 
 User = get_user_model()
+Follow = User.follows.through
 
 @receiver(post_save, sender=User)
 def create_profile_based_on_role(sender, instance, created, **kwargs):
     if created:
-        if instance.is_superuser:
-            AdminProfile.objects.create(user=instance)
-        else:
-            UserProfile.objects.create(user=instance)
\ No newline at end of file
+        tasks.create_profile.enqueue(instance.pk, idempotency_key=f"profile:{instance.pk}")
+
+
+@receiver(post_save, sender=User)
+def build_avatars(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and "profile_photo" not in update_fields):
+        return
+    source = instance.profile_photo.name if instance.profile_photo else None
+    if instance.avatar_variants.get("source") != source:
+        tasks.build_avatars.enqueue(instance.pk, idempotency_key=f"avatar:{instance.pk}:{source}")
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+def _existing_follows(instance, reverse, pk_set):
+    # ``remove()`` reports every id it was given, so look up the rows that really go away.
+    if reverse:
+        rows = Follow.objects.filter(to_user_id=instance.pk)
+        column = "from_user_id"
+    else:
+        rows = Follow.objects.filter(from_user_id=instance.pk)
+        column = "to_user_id"
+    if pk_set is not None:
+        rows = rows.filter(**{f"{column}__in": pk_set})
+    return set(rows.values_list(column, flat=True))
+
+
+@receiver(m2m_changed, sender=Follow)
+def update_follow_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("pre_remove", "pre_clear"):
+        instance._removed_follows = _existing_follows(instance, reverse, pk_set)
+        return
+    if action == "post_add":
+        changed, sign = pk_set, 1
+    elif action in ("post_remove", "post_clear"):
+        changed, sign = instance.__dict__.pop("_removed_follows", set()), -1
+    else:
+        return
+    if not changed:
+        return
+
+    own, other = ("followers_count", "following_count") if reverse else ("following_count", "followers_count")
+    adjust_user_stats([instance.pk], **{own: sign * len(changed)})
+    adjust_user_stats(list(changed), **{other: sign})
+
+
+@receiver(pre_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    # Cascades remove the user's follow rows and read states without
+    # m2m_changed or per-row signals, so settle the other side's counters here.
+    if counters_deferred():
+        return
+    followed = Follow.objects.filter(from_user_id=instance.pk).exclude(to_user_id=instance.pk)
+    adjust_user_stats(list(followed.values_list("to_user_id", flat=True)), followers_count=-1)
+    followers = Follow.objects.filter(to_user_id=instance.pk).exclude(from_user_id=instance.pk)
+    adjust_user_stats(list(followers.values_list("from_user_id", flat=True)), following_count=-1)
+    unread = ConversationReadState.objects.filter(partner_id=instance.pk, unread_count__gt=0)
+    for user_id, count in unread.values_list("user_id", "unread_count"):
+        adjust_user_stats(user_id, unread_messages=-count)
+
+
+@receiver(post_save, sender=Folder)
+def count_created_folder(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_user_stats(instance.owner_id, folder_count=1)
+
+
+@receiver(post_delete, sender=Folder)
+def count_deleted_folder(sender, instance, **kwargs):
+    adjust_user_stats(instance.owner_id, folder_count=-1)
+
+
+@receiver(post_save, sender=File)
+def count_created_file(sender, instance, created, raw=False, **kwargs):
+    previous = instance.__dict__.pop("_previous_size", None)
+    if raw:
+        return
+    if created:
+        adjust_user_stats(instance.owner_id, file_count=1, total_bytes=instance.size)
+    elif previous is not None:
+        adjust_user_stats(instance.owner_id, total_bytes=instance.size - previous)
+
+
+@receiver(post_delete, sender=File)
+def count_deleted_file(sender, instance, **kwargs):
+    adjust_user_stats(instance.owner_id, file_count=-1, total_bytes=-instance.size)
+
+
+@receiver(post_save, sender=DirectMessage)
+def count_unread_message(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_message(instance)
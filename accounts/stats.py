@@ -0,0 +1,84 @@
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from storage.models import File, Folder
+
+from .models import ConversationReadState, UserStats
+
+User = get_user_model()
+Follow = User.follows.through
+
+
+_local = threading.local()
+
+
+@contextmanager
+def defer_counters():
+    """
+    Skip the per-row counter updates made by signal handlers inside the block,
+    for bulk changes whose caller rebuilds the affected counters afterwards.
+    """
+    previous = counters_deferred()
+    _local.deferred = True
+    try:
+        yield
+    finally:
+        _local.deferred = previous
+
+
+def counters_deferred():
+    return getattr(_local, "deferred", False)
+
+
+def adjust_user_stats(user_ids, **deltas):
+    """Apply counter deltas, e.g. ``adjust_user_stats([1, 2], followers_count=1)``."""
+    if counters_deferred():
+        return
+    if isinstance(user_ids, int):
+        user_ids = [user_ids]
+    changes = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    if user_ids and changes:
+        UserStats.objects.filter(user_id__in=user_ids).update(**changes)
+
+
+def _grouped(queryset, key, value=None):
+    aggregate = Sum(value) if value else Count("pk")
+    return dict(queryset.values(key).annotate(n=aggregate).values_list(key, "n"))
+
+
+def rebuild_user_stats(user_ids=None, batch_size=1000):
+    """Recompute counters from the source tables; all users when ``user_ids`` is None."""
+    users = User.objects.order_by("pk").values_list("pk", flat=True)
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+
+    rebuilt = 0
+    ids = list(users[:batch_size])
+    while ids:
+        followers = _grouped(Follow.objects.filter(to_user_id__in=ids), "to_user_id")
+        following = _grouped(Follow.objects.filter(from_user_id__in=ids), "from_user_id")
+        folders = _grouped(Folder.objects.filter(owner_id__in=ids), "owner_id")
+        files = _grouped(File.objects.filter(owner_id__in=ids), "owner_id")
+        sizes = _grouped(File.objects.filter(owner_id__in=ids), "owner_id", "size")
+        unread = _grouped(ConversationReadState.objects.filter(user_id__in=ids), "user_id", "unread_count")
+        with transaction.atomic():
+            UserStats.objects.filter(user_id__in=ids).delete()
+            UserStats.objects.bulk_create(
+                UserStats(
+                    user_id=pk,
+                    followers_count=followers.get(pk, 0),
+                    following_count=following.get(pk, 0),
+                    folder_count=folders.get(pk, 0),
+                    file_count=files.get(pk, 0),
+                    total_bytes=sizes.get(pk) or 0,
+                    unread_messages=unread.get(pk) or 0,
+                )
+                for pk in ids
+            )
+        rebuilt += len(ids)
+        ids = list(users.filter(pk__gt=ids[-1])[:batch_size])
+    return rebuilt
@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+
+from tasks.queue import task
+
+from .avatars import process_avatar
+from .follow_graph import adjust_suggestions
+from .models import AdminProfile, UserProfile
+
+User = get_user_model()
+
+
+@task(priority=5)
+def create_profile(user_id):
+    user = User.objects.filter(pk=user_id).only("is_superuser").first()
+    if user is None:
+        return
+    if user.is_superuser:
+        AdminProfile.objects.get_or_create(user_id=user_id)
+    else:
+        UserProfile.objects.get_or_create(user_id=user_id)
+
+
+@task
+def build_avatars(user_id):
+    user = User.objects.filter(pk=user_id).only("profile_photo", "avatar_variants").first()
+    if user is not None:
+        process_avatar(user)
+
+
+# Following a well-connected account touches hundreds of suggestion rows.
+@task(background=True)
+def update_follow_suggestions(follower_id, followed_id, follows):
+    adjust_suggestions(follower_id, followed_id, follows)
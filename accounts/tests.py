@@ -1,3 +1,503 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.archival import archive_older_than
+from storage.models import File, Folder, FolderActivityBucket, FolderComment
+from storage.tasks import record_folder_view
+
+from .authentication import StatelessJWTAuthentication, TokenClaimsUser, add_user_claims, token_versions
+from .avatars import AVATAR_SIZES, avatar_url
+from .follow_graph import (
+    SUGGESTIONS_PER_USER,
+    adjust_suggestions,
+    followers_among,
+    following,
+    following_among,
+    record_follow,
+)
+from .messaging import rebuild_read_states, read_states, unread_total
+from .models import ArchivedDirectMessage, DirectMessage, FollowSuggestion, UserProfile, UserStats
+
+User = get_user_model()
+
+
+class TokenRevocationTests(TestCase):
+    password = "correct horse battery"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password=self.password)
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post(
+            "/api/token/", {"email": "alice@example.com", "password": self.password}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get_profile(self, access):
+        token_versions.invalidate(self.user.pk)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        response = self.client.get("/api/accounts/profile/")
+        self.client.credentials()
+        return response
+
+    def test_access_token_authenticates(self):
+        tokens = self.login()
+        self.assertEqual(self.get_profile(tokens["access"]).status_code, 200)
+
+    def test_password_hash_upgrade_keeps_tokens_valid(self):
+        tokens = self.login()
+        User.objects.filter(pk=self.user.pk).update(password=make_password(self.password, hasher="pbkdf2_sha1"))
+
+        upgraded = self.login()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        self.assertEqual(self.get_profile(upgraded["access"]).status_code, 200)
+        self.assertEqual(self.get_profile(tokens["access"]).status_code, 200)
+
+    def test_password_change_revokes_tokens(self):
+        tokens = self.login()
+        self.user.set_password("another long password")
+        self.user.save(update_fields=["password"])
+
+        response = self.get_profile(tokens["access"])
+        self.assertEqual(response.status_code, 401)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.token_version, 1)
+
+    def test_revoke_tokens(self):
+        tokens = self.login()
+        self.user.revoke_tokens()
+        self.assertEqual(self.get_profile(tokens["access"]).status_code, 401)
+
+    def test_refresh_with_revoked_token_fails(self):
+        tokens = self.login()
+        self.user.revoke_tokens()
+        response = self.client.post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+
+class StatelessAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="alice", email="alice@example.com", password="x", role="admin", is_public=False
+        )
+        self.user.first_name = "Alice"
+        self.user.save(update_fields=["first_name"])
+        token_versions.invalidate(self.user.pk)
+
+    def authenticate(self, token):
+        return StatelessJWTAuthentication().get_user(AccessToken(str(token)))
+
+    def test_claims_are_answered_from_the_token(self):
+        token = add_user_claims(AccessToken.for_user(self.user), self.user)
+        with self.assertNumQueries(1):
+            user = self.authenticate(token)
+            self.assertIsInstance(user, TokenClaimsUser)
+            self.assertEqual((user.id, user.username, user.role, user.is_public), (self.user.id, "alice", "admin", False))
+            self.assertTrue(user.is_authenticated)
+        # The revocation check is cached in-process for the next request.
+        with self.assertNumQueries(0):
+            self.authenticate(token)
+
+    def test_other_fields_load_the_user_lazily(self):
+        user = self.authenticate(add_user_claims(AccessToken.for_user(self.user), self.user))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.first_name, "Alice")
+            self.assertEqual(user.email, "alice@example.com")
+
+    def test_inactive_user_is_rejected(self):
+        token = add_user_claims(AccessToken.for_user(self.user), self.user)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_tokens_without_claims_fall_back_to_the_row(self):
+        user = self.authenticate(AccessToken.for_user(self.user))
+        self.assertIsInstance(user, User)
+        self.assertEqual(user.pk, self.user.pk)
+
+
+@override_settings(LOGIN_THROTTLE={"WINDOW": 300, "IP_ATTEMPTS": 30, "ACCOUNT_FAILURES": 2})
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username="alice", email="alice@example.com", password="correct horse battery")
+
+    def attempt(self, password="wrong"):
+        return APIClient().post("/api/token/", {"email": "alice@example.com", "password": password}, format="json")
+
+    @mock.patch("accounts.throttles.time.time")
+    def test_retry_after_counts_down_from_first_failure(self, now):
+        now.return_value = 1000
+        self.assertEqual(self.attempt().status_code, 401)
+        now.return_value = 1100
+        self.assertEqual(self.attempt().status_code, 401)
+
+        now.return_value = 1200
+        response = self.attempt("correct horse battery")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "100")
+
+    @override_settings(LOGIN_THROTTLE={"WINDOW": 300, "IP_ATTEMPTS": 2, "ACCOUNT_FAILURES": 100})
+    def test_forwarded_for_does_not_escape_the_ip_limit(self):
+        statuses = []
+        for n in range(3):
+            response = APIClient().post(
+                "/api/token/",
+                {"email": f"user{n}@example.com", "password": "wrong"},
+                format="json",
+                HTTP_X_FORWARDED_FOR=f"10.0.0.{n}",
+            )
+            statuses.append(response.status_code)
+        self.assertEqual(statuses, [401, 401, 429])
+
+
+class AvatarTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+
+    def upload(self, size=(800, 600)):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new("RGB", size, "red").save(buffer, "PNG")
+        self.user.profile_photo = SimpleUploadedFile("me.png", buffer.getvalue(), content_type="image/png")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.user.refresh_from_db()
+
+    def test_photo_is_resized_into_square_variants(self):
+        from PIL import Image
+
+        self.assertIsNone(avatar_url(self.user))
+        self.upload()
+        self.assertEqual(self.user.avatar_variants["source"], self.user.profile_photo.name)
+        for name, pixels in AVATAR_SIZES.items():
+            with default_storage.open(self.user.avatar_variants[name]) as handle, Image.open(handle) as image:
+                self.assertEqual(image.size, (pixels, pixels))
+        self.assertTrue(avatar_url(self.user, "medium").endswith(self.user.avatar_variants["medium"]))
+
+    def test_unchanged_photo_is_not_processed_again(self):
+        self.upload()
+        with mock.patch("accounts.avatars.render_avatars") as render, self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        render.assert_not_called()
+
+    def test_avatar_file_is_served_immutable(self):
+        self.upload()
+        name = self.user.avatar_variants["small"].split("/")[-1]
+        response = self.client.get(f"/media/avatars/{name}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(self.client.get("/media/avatars/..%2Fsecret.webp").status_code, 404)
+        self.assertEqual(self.client.get("/media/avatars/0000000000000000-64.webp").status_code, 404)
+
+
+class RegisterTests(TestCase):
+    def test_register_creates_profile(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post(
+                "/api/accounts/register/",
+                {"username": "bob", "email": "Bob@Example.com", "password": "correct horse battery"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(username="bob")
+        self.assertEqual(user.email_normalized, "bob@example.com")
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+
+
+class FollowGraphTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(username=name, email=f"{name}@example.com", password="x")
+            for name in ("alice", "bob", "carol")
+        )
+
+    @override_settings(FOLLOW_GRAPH_CACHE_SECONDS=600)
+    def test_follow_invalidates_cached_sets(self):
+        self.assertEqual(following_among(self.alice.id, [self.bob.id]), set())
+        self.assertEqual(followers_among(self.bob.id, [self.alice.id]), set())
+
+        self.alice.follows.add(self.bob)
+        record_follow(self.alice.id, self.bob.id, True)
+        self.assertEqual(following_among(self.alice.id, [self.bob.id]), {self.bob.id})
+        self.assertEqual(followers_among(self.bob.id, [self.alice.id]), {self.alice.id})
+
+    @override_settings(FOLLOW_GRAPH_CACHE_SECONDS=0)
+    def test_uncached_answers_come_from_the_table(self):
+        self.alice.follows.add(self.bob)
+        self.assertEqual(following_among(self.alice.id, [self.bob.id, self.carol.id]), {self.bob.id})
+        self.assertEqual(following(self.alice.id), {self.bob.id})
+
+    @override_settings(FOLLOW_GRAPH_CACHE_SECONDS=600)
+    def test_suggestions_ignore_stale_cache(self):
+        self.bob.follows.add(self.carol)
+        # Another worker cached bob's following set before he followed carol.
+        cache.set(f"follow-graph:following:{self.bob.id}", frozenset(), 600)
+
+        self.alice.follows.add(self.bob)
+        adjust_suggestions(self.alice.id, self.bob.id, True)
+        self.assertEqual(
+            list(FollowSuggestion.objects.filter(user=self.alice).values_list("suggested_id", "score")),
+            [(self.carol.id, 1)],
+        )
+
+        self.alice.follows.remove(self.bob)
+        adjust_suggestions(self.alice.id, self.bob.id, False)
+        self.assertFalse(FollowSuggestion.objects.filter(user=self.alice).exists())
+
+    def test_following_a_well_connected_account_is_batched_and_trimmed(self):
+        User.objects.bulk_create(
+            User(username=f"user{n}", email=f"user{n}@example.com", password="!") for n in range(300)
+        )
+        popular = User.objects.filter(username__startswith="user").order_by("pk")
+        self.bob.follows.add(*popular)
+        self.carol.follows.add(self.alice)
+        self.alice.follows.add(self.bob)
+
+        with self.assertNumQueries(13):
+            adjust_suggestions(self.alice.id, self.bob.id, True)
+        self.assertEqual(
+            list(FollowSuggestion.objects.filter(user=self.alice).order_by("suggested_id").values_list("suggested_id")),
+            [(pk,) for pk in popular.values_list("pk", flat=True)[:SUGGESTIONS_PER_USER]],
+        )
+        self.assertEqual(
+            list(FollowSuggestion.objects.filter(user=self.carol).values_list("suggested_id", "score")),
+            [(self.bob.id, 1)],
+        )
+
+    def test_eager_suggestion_updates_run_off_the_request(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        with mock.patch("tasks.queue.threading.Thread") as thread:
+            with self.captureOnCommitCallbacks(execute=True):
+                client.post(f"/api/accounts/users/{self.bob.id}/follow/")
+        thread.return_value.start.assert_called_once_with()
+
+    def test_suggestions_endpoint(self):
+        self.alice.follows.add(self.bob)
+        self.bob.follows.add(self.carol)
+        adjust_suggestions(self.alice.id, self.bob.id, True)
+        client = APIClient()
+        client.force_authenticate(self.alice)
+
+        response = client.get("/api/accounts/users/suggestions/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row["id"], row["mutual_count"]) for row in response.data], [(self.carol.id, 1)])
+        self.assertEqual(client.get("/api/accounts/users/suggestions/?limit=-1").status_code, 400)
+
+
+class UserStatsSignalTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(username=name, email=f"{name}@example.com", password="x")
+            for name in ("alice", "bob", "carol")
+        )
+
+    def stats(self, user, *fields):
+        return tuple(UserStats.objects.filter(user=user).values_list(*fields).get())
+
+    def test_follow_counts(self):
+        self.alice.follows.add(self.bob, self.carol)
+        self.bob.followers.add(self.carol)
+        self.assertEqual(self.stats(self.alice, "following_count", "followers_count"), (2, 0))
+        self.assertEqual(self.stats(self.bob, "following_count", "followers_count"), (0, 2))
+
+        self.alice.follows.remove(self.bob, self.bob)
+        self.bob.followers.clear()
+        self.assertEqual(self.stats(self.alice, "following_count"), (1,))
+        self.assertEqual(self.stats(self.bob, "followers_count"), (0,))
+        self.assertEqual(self.stats(self.carol, "following_count", "followers_count"), (0, 1))
+
+    def test_folder_and_file_counts_follow_size_changes(self):
+        folder = Folder.objects.create(name="docs", owner=self.alice)
+        upload = File.objects.create(
+            name="a.txt", file=SimpleUploadedFile("a.txt", b"x" * 10), folder=folder, owner=self.alice
+        )
+        self.assertEqual(self.stats(self.alice, "folder_count", "file_count", "total_bytes"), (1, 1, 10))
+
+        upload.file = SimpleUploadedFile("b.txt", b"y" * 25)
+        upload.save()
+        upload.refresh_from_db()
+        self.assertEqual(upload.size, 25)
+        self.assertEqual(self.stats(self.alice, "total_bytes"), (25,))
+
+        upload.name = "renamed.txt"
+        upload.save()
+        self.assertEqual(self.stats(self.alice, "total_bytes"), (25,))
+
+        folder.delete()
+        self.assertEqual(self.stats(self.alice, "folder_count", "file_count", "total_bytes"), (0, 0, 0))
+
+    def test_deleting_a_user_settles_other_counters(self):
+        self.alice.follows.add(self.bob)
+        self.carol.follows.add(self.alice)
+        DirectMessage.objects.create(sender=self.alice, receiver=self.bob, text="hi")
+        self.assertEqual(unread_total(self.bob.id), 1)
+
+        self.alice.delete()
+        self.assertEqual(self.stats(self.bob, "followers_count", "unread_messages"), (0, 0))
+        self.assertEqual(self.stats(self.carol, "following_count"), (0,))
+
+
+class AdminBulkActionTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="root", email="root@example.com", password="x")
+        self.alice = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.bob = User.objects.create_user(username="bob", email="bob@example.com", password="x")
+        self.client.force_login(self.admin)
+
+    def run_action(self, model, action, ids, **extra):
+        url = f"/admin/accounts/{model}/"
+        response = self.client.post(url, {"action": action, "_selected_action": ids, **extra})
+        self.assertEqual(response.status_code, 302)
+
+    def test_deleting_unread_messages_recounts_unread(self):
+        messages = [DirectMessage.objects.create(sender=self.alice, receiver=self.bob, text=str(i)) for i in range(3)]
+        self.assertEqual(unread_total(self.bob.id), 3)
+
+        self.run_action("directmessage", "bulk_delete", [messages[1].id, messages[2].id])
+        self.assertEqual(unread_total(self.bob.id), 1)
+        self.assertEqual(read_states(self.bob.id, [self.alice.id]), {self.alice.id: (0, 1)})
+
+    def test_deleting_a_sender_recounts_unread(self):
+        DirectMessage.objects.create(sender=self.alice, receiver=self.bob, text="hi")
+
+        self.run_action("user", "bulk_delete", [self.alice.id])
+        self.assertEqual(unread_total(self.bob.id), 0)
+
+    def test_deleting_a_follower_recounts_followers(self):
+        self.alice.follows.add(self.bob)
+
+        self.run_action("user", "bulk_delete", [self.alice.id])
+        self.assertEqual(UserStats.objects.get(user=self.bob).followers_count, 0)
+
+    def test_deleting_a_user_removes_their_activity(self):
+        folder = Folder.objects.create(name="docs", owner=self.bob)
+        FolderComment.objects.create(folder=folder, owner=self.alice, text="hi")
+        FolderComment.objects.create(folder=folder, owner=self.bob, text="hello")
+        record_folder_view(folder.id, self.alice.id)
+
+        self.run_action("user", "bulk_delete", [self.alice.id])
+        buckets = FolderActivityBucket.objects.filter(folder=folder)
+        self.assertEqual(set(buckets.values_list("views", "comments")), {(0, 1)})
+
+
+class ReadCursorTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.bob = User.objects.create_user(username="bob", email="bob@example.com", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def send(self, text):
+        return DirectMessage.objects.create(sender=self.alice, receiver=self.bob, text=text)
+
+    def mark_read(self, message_id=None):
+        data = {} if message_id is None else {"message_id": message_id}
+        return self.client.post(f"/api/accounts/chats/{self.alice.id}/read/", data, format="json").data
+
+    def test_read_up_to_message(self):
+        first, second = self.send("1"), self.send("2")
+        self.assertEqual(unread_total(self.bob.id), 2)
+
+        data = self.mark_read(first.id)
+        self.assertEqual((data["last_read_message_id"], data["unread_count"], data["unread_messages"]), (first.id, 1, 1))
+        self.assertEqual(self.mark_read()["last_read_message_id"], second.id)
+        self.assertEqual(unread_total(self.bob.id), 0)
+
+    def test_cursor_cannot_pass_latest_message(self):
+        first = self.send("1")
+        self.assertEqual(self.mark_read(first.id + 1000)["last_read_message_id"], first.id)
+
+        self.send("2")
+        self.assertEqual(unread_total(self.bob.id), 1)
+        self.assertEqual(read_states(self.bob.id, [self.alice.id]), {self.alice.id: (first.id, 1)})
+
+
+class MessageArchiveTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.bob = User.objects.create_user(username="bob", email="bob@example.com", password="x")
+        self.old = [self.send(self.alice, self.bob, f"old {i}") for i in range(3)]
+        DirectMessage.objects.update(created_at=timezone.now() - timedelta(days=400))
+        self.new = self.send(self.bob, self.alice, "new")
+
+    def send(self, sender, receiver, text):
+        return DirectMessage.objects.create(sender=sender, receiver=receiver, text=text)
+
+    def archive(self):
+        return archive_older_than(DirectMessage, ArchivedDirectMessage, timezone.now() - timedelta(days=30))
+
+    def client_for(self, user):
+        client = APIClient()
+        token = add_user_claims(AccessToken.for_user(user), user)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client
+
+    def test_archive_moves_old_messages(self):
+        self.assertEqual(self.archive(), 3)
+        self.assertEqual(list(DirectMessage.objects.values_list("id", flat=True)), [self.new.id])
+        self.assertEqual(
+            list(ArchivedDirectMessage.objects.order_by("id").values_list("id", "text")),
+            [(message.id, message.text) for message in self.old],
+        )
+        self.assertEqual(self.archive(), 0)
+
+    def test_taken_archive_id_keeps_the_hot_row(self):
+        ArchivedDirectMessage.objects.create(
+            id=self.old[1].id, sender=self.bob, receiver=self.alice, text="other", created_at=timezone.now()
+        )
+        self.assertEqual(self.archive(), 2)
+        self.assertEqual(DirectMessage.objects.get(id=self.old[1].id).text, "old 1")
+        self.assertEqual(ArchivedDirectMessage.objects.get(id=self.old[1].id).text, "other")
+
+    def test_chat_views_include_archived_history(self):
+        self.archive()
+        expected = [message.id for message in self.old] + [self.new.id]
+        client = self.client_for(self.bob)
+        for url in (f"/api/accounts/chats/{self.alice.id}/", f"/api/accounts/async/chats/{self.alice.id}/"):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([row["id"] for row in response.json()], expected)
+
+    def test_archived_messages_can_be_marked_read(self):
+        self.archive()
+        self.assertEqual(unread_total(self.bob.id), 3)
+        response = self.client_for(self.bob).post(f"/api/accounts/chats/{self.alice.id}/read/", {}, format="json")
+        self.assertEqual(response.data["last_read_message_id"], self.old[-1].id)
+        self.assertEqual(unread_total(self.bob.id), 0)
+
+    def test_rebuilt_read_states_count_archived_messages(self):
+        self.archive()
+        rebuild_read_states([self.bob.id])
+        self.assertEqual(read_states(self.bob.id, [self.alice.id]), {self.alice.id: (0, 3)})
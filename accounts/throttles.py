@@ -0,0 +1,62 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.throttling import client_ip
+
+
+class LoginAttemptLimiter:
+    """
+    Fixed-window login limits checked before any password hash runs: every
+    attempt counts against the client IP, failures count against the account.
+    Each counter stores when its window closes under ``<key>:expires`` so a
+    blocked client is told how long it actually has to wait.
+    """
+
+    def __init__(self, request, email):
+        config = settings.LOGIN_THROTTLE
+        self.window = config["WINDOW"]
+        ident = client_ip(request) if request is not None else "unknown"
+        digest = hashlib.sha256(email.encode()).hexdigest()[:32]
+        self.limits = {
+            f"login-ip:{ident}": config["IP_ATTEMPTS"],
+            f"login-account:{digest}": config["ACCOUNT_FAILURES"],
+        }
+        self.ip_key, self.account_key = self.limits
+
+    def wait(self):
+        """Seconds until every exhausted window closes; 0 when the attempt may go ahead."""
+        values = cache.get_many([*self.limits, *(f"{key}:expires" for key in self.limits)])
+        now = time.time()
+        return max(
+            (
+                max(values.get(f"{key}:expires", now + self.window) - now, 1)
+                for key, limit in self.limits.items()
+                if values.get(key, 0) >= limit
+            ),
+            default=0,
+        )
+
+    def attempt(self):
+        self._incr(self.ip_key)
+
+    def failure(self):
+        self._incr(self.account_key)
+
+    def success(self):
+        cache.delete(self.account_key)
+
+    def _incr(self, key):
+        if cache.add(key, 1, self.window):
+            self._open_window(key)
+            return
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, self.window)
+            self._open_window(key)
+
+    def _open_window(self, key):
+        cache.set(f"{key}:expires", time.time() + self.window, self.window)
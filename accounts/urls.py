@@ -1,9 +1,15 @@
 from django.urls import path
+from . import async_views
 from .views import (
+    ChatHistoryView,
     ChatListView,
+    ChatReadView,
     ChatWithUserView,
+    FollowSuggestionsView,
+    MutualConnectionsView,
     RegisterView,
     ToggleFollowView,
+    UnreadCountView,
     UsernameSuggestionsView,
     UserDetailView,
     UserFoldersView,
@@ -15,10 +21,16 @@ urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('profile/', UserProfileView.as_view(), name='profile'),
     path('users/', UserListView.as_view(), name='user-list'),
+    path('users/suggestions/', FollowSuggestionsView.as_view(), name='follow-suggestions'),
     path('users/<int:pk>/', UserDetailView.as_view(), name='user-detail'),
     path('users/<int:user_id>/folders/', UserFoldersView.as_view(), name='user-folders'),
     path('users/<int:user_id>/follow/', ToggleFollowView.as_view(), name='toggle-follow'),
+    path('users/<int:user_id>/mutuals/', MutualConnectionsView.as_view(), name='mutual-connections'),
     path('chats/', ChatListView.as_view(), name='chat-list'),
+    path('chats/unread/', UnreadCountView.as_view(), name='chat-unread'),
     path('chats/<int:user_id>/', ChatWithUserView.as_view(), name='chat-with-user'),
+    path('chats/<int:user_id>/history/', ChatHistoryView.as_view(), name='chat-history'),
+    path('chats/<int:user_id>/read/', ChatReadView.as_view(), name='chat-read'),
+    path('async/chats/<int:user_id>/', async_views.chat_with_user, name='async-chat-with-user'),
     path('username-suggestions/', UsernameSuggestionsView.as_view(), name='username-suggestions'),
 ]
@@ -1,17 +1,30 @@
 from rest_framework import generics, permissions
+from rest_framework.exceptions import Throttled
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.core.files.storage import default_storage
+from django.db.models import Max, Q
+from django.http import FileResponse, Http404
+from django.views.decorators.http import require_GET
 from rest_framework_simplejwt.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework import serializers
+from core.archival import all_rows, history_page, history_params
+from core.conditional import ConditionalGetMixin
+from core.db.routers import ReplicaReadMixin
+from notifications import hooks as notify
 from storage.models import Folder
 from storage.serializers import FolderSerializer
-from .models import DirectMessage
-from .serializers import DirectMessageSerializer, RegisterSerializer, UserSerializer
+from .authentication import add_user_claims
+from .avatars import AVATAR_DIR, AVATAR_NAME, CACHE_CONTROL, CONTENT_TYPES
+from .follow_graph import followers_among, following, following_among, mutual_connections, record_follow
+from .messaging import conversation_cursors, mark_read, read_states, unread_total
+from .models import ArchivedDirectMessage, DirectMessage, FollowSuggestion, normalize_email
+from .serializers import DirectMessageSerializer, OwnProfileSerializer, RegisterSerializer, UserSerializer
+from .throttles import LoginAttemptLimiter
 
 User = get_user_model()
 
@@ -28,11 +41,11 @@ class UserProfileView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        serializer = UserSerializer(request.user)
+        serializer = OwnProfileSerializer(request.user)
         return Response(serializer.data)
 
     def patch(self, request):
-        serializer = UserSerializer(
+        serializer = OwnProfileSerializer(
             request.user,
             data=request.data,
             partial=True
@@ -49,22 +62,26 @@ class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
     email = serializers.EmailField(write_only=True)
     password = serializers.CharField(write_only=True)
 
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
     def validate(self, attrs):
-        email = attrs.get("email", "").strip()
+        email = normalize_email(attrs.get("email", ""))
         password = attrs.get("password")
+        request = self.context.get("request")
 
-        try:
-            user = User.objects.get(email__iexact=email)
-        except User.DoesNotExist as exc:
-            raise AuthenticationFailed("No active account found with this email.") from exc
-
-        authenticated_user = authenticate(
-            request=self.context.get("request"),
-            username=user.username,
-            password=password,
-        )
+        limiter = LoginAttemptLimiter(request, email)
+        wait = limiter.wait()
+        if wait:
+            raise Throttled(wait=wait)
+        limiter.attempt()
+
+        authenticated_user = authenticate(request=request, email=email, password=password)
         if not authenticated_user:
+            limiter.failure()
             raise AuthenticationFailed("Invalid email or password.")
+        limiter.success()
 
         refresh = self.get_token(authenticated_user)
         return {"refresh": str(refresh), "access": str(refresh.access_token)}
@@ -74,26 +91,47 @@ class EmailTokenObtainPairView(TokenObtainPairView):
     serializer_class = EmailTokenObtainPairSerializer
 
 
-class UserListView(generics.ListAPIView):
+class UserListView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ("get",)
+    rate_limit_scopes = {"get": "search"}
 
     def get_queryset(self):
-        queryset = User.objects.all().order_by("username")
+        queryset = User.objects.select_related("stats").order_by("username")
         q = self.request.query_params.get("q", "").strip()
         if q:
             queryset = queryset.filter(Q(username__icontains=q) | Q(email__icontains=q))
         return queryset
 
 
-class UserDetailView(generics.RetrieveAPIView):
+class UserDetailView(ConditionalGetMixin, ReplicaReadMixin, generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
-    queryset = User.objects.all()
+    queryset = User.objects.select_related("stats")
+    replica_actions = ("get",)
+    conditional_actions = {"get": "user_validators"}
+
+    def user_validators(self, request, pk):
+        row = (
+            User.objects.filter(pk=pk)
+            .values_list(
+                "username",
+                "email",
+                "is_public",
+                "profile_photo",
+                "avatar_variants",
+                "stats__followers_count",
+                "stats__following_count",
+            )
+            .first()
+        )
+        return row, following_among(request.user.id, [pk]), followers_among(request.user.id, [pk])
 
 
-class UserFoldersView(APIView):
+class UserFoldersView(ReplicaReadMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ("get",)
 
     def get(self, request, user_id):
         folders = Folder.objects.filter(owner_id=user_id)
@@ -105,6 +143,7 @@ class UserFoldersView(APIView):
 
 class ToggleFollowView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    rate_limit_scopes = {"post": "follow"}
 
     def post(self, request, user_id):
         if request.user.id == int(user_id):
@@ -121,6 +160,8 @@ class ToggleFollowView(APIView):
         else:
             request.user.follows.add(target)
             following = True
+            notify.user_followed(request.user.id, target.id)
+        record_follow(request.user.id, target.id, following)
 
         return Response(
             {
@@ -130,42 +171,117 @@ class ToggleFollowView(APIView):
         )
 
 
-class ChatListView(APIView):
+class FollowSuggestionsView(ReplicaReadMixin, APIView):
+    """People you may know: accounts followed by the people you follow."""
+
     permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ("get",)
 
     def get(self, request):
-        messages = DirectMessage.objects.filter(
-            Q(sender=request.user) | Q(receiver=request.user)
-        ).order_by("-created_at")
-
-        seen = set()
-        partners = []
-        for msg in messages:
-            partner = msg.receiver if msg.sender_id == request.user.id else msg.sender
-            if partner.id in seen:
-                continue
-            seen.add(partner.id)
-            partners.append(
+        try:
+            limit = int(request.query_params.get("limit") or 10)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response({"error": "limit must be a positive integer."}, status=400)
+        limit = min(limit, 50)
+
+        # Rows can trail a follow by one task run, so skip anyone already followed.
+        followed = following(request.user.id)
+        rows = [
+            row
+            for row in FollowSuggestion.objects.filter(user_id=request.user.id)
+            .select_related("suggested__stats")
+            .order_by("-score", "suggested_id")[: limit * 2]
+            if row.suggested_id not in followed
+        ][:limit]
+        users = [row.suggested for row in rows]
+        serializer = UserSerializer(users, many=True, context={"request": request})
+        return Response(
+            [{**data, "mutual_count": row.score} for data, row in zip(serializer.data, rows)]
+        )
+
+
+class MutualConnectionsView(ReplicaReadMixin, APIView):
+    """People the current user follows who also follow ``user_id``."""
+
+    permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ("get",)
+
+    def get(self, request, user_id):
+        ids = mutual_connections(request.user.id, int(user_id))
+        users = User.objects.filter(id__in=ids).select_related("stats").order_by("username")[:50]
+        serializer = UserSerializer(users, many=True, context={"request": request})
+        return Response({"count": len(ids), "results": serializer.data})
+
+
+def _latest_per_partner(model, user_id, latest):
+    # One grouped query per direction, answered from the (sender, receiver) indexes.
+    known = list(latest)
+    for own, partner in (("sender_id", "receiver_id"), ("receiver_id", "sender_id")):
+        rows = (
+            model.objects.filter(**{own: user_id})
+            .exclude(**{f"{partner}__in": known})
+            .values(partner)
+            .annotate(last=Max("id"))
+            .values_list(partner, "last")
+        )
+        for partner_id, last in rows:
+            latest[partner_id] = max(last, latest.get(partner_id, 0))
+    return latest
+
+
+class ChatListView(ReplicaReadMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ("get",)
+
+    def get(self, request):
+        latest = _latest_per_partner(DirectMessage, request.user.id, {})
+        # Conversations with no recent messages are only found in the archive.
+        latest = _latest_per_partner(ArchivedDirectMessage, request.user.id, latest)
+        ordered = sorted(latest.items(), key=lambda item: item[1], reverse=True)
+
+        message_ids = [message_id for _, message_id in ordered]
+        messages = DirectMessage.objects.in_bulk(message_ids)
+        missing = [message_id for message_id in message_ids if message_id not in messages]
+        if missing:
+            messages.update(ArchivedDirectMessage.objects.in_bulk(missing))
+        users = User.objects.select_related("stats").in_bulk(list(latest))
+
+        partners = [users[partner_id] for partner_id, _ in ordered]
+        data = UserSerializer(partners, many=True, context={"request": request}).data
+        states = read_states(request.user.id, list(latest))
+        return Response(
+            [
                 {
-                    "user": UserSerializer(partner, context={"request": request}).data,
-                    "last_message": msg.text,
-                    "last_message_at": msg.created_at,
+                    "user": user,
+                    "last_message": messages[message_id].text,
+                    "last_message_at": messages[message_id].created_at,
+                    "unread_count": states.get(partner_id, (0, 0))[1],
                 }
-            )
-        return Response(partners)
+                for user, (partner_id, message_id) in zip(data, ordered)
+            ]
+        )
 
 
-class ChatWithUserView(APIView):
+class ChatWithUserView(ReplicaReadMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ("get",)
+    rate_limit_scopes = {"post": "message"}
 
     def get(self, request, user_id):
         if request.user.id == int(user_id):
             return Response({"error": "Cannot open chat with yourself."}, status=400)
 
-        messages = DirectMessage.objects.filter(
-            (Q(sender=request.user, receiver_id=user_id) | Q(sender_id=user_id, receiver=request.user))
-        ).order_by("created_at")
-        serializer = DirectMessageSerializer(messages, many=True)
+        conversation = Q(sender_id=request.user.id, receiver_id=user_id) | Q(
+            sender_id=user_id, receiver_id=request.user.id
+        )
+        messages = all_rows(
+            DirectMessage.objects.filter(conversation).select_related("sender", "receiver"),
+            ArchivedDirectMessage.objects.filter(conversation).select_related("sender", "receiver"),
+        )
+        context = {"read_cursors": conversation_cursors(request.user.id, user_id)}
+        serializer = DirectMessageSerializer(messages, many=True, context=context)
         return Response(serializer.data)
 
     def post(self, request, user_id):
@@ -186,12 +302,79 @@ class ChatWithUserView(APIView):
             receiver=receiver,
             text=text,
         )
+        notify.message_sent(message)
         serializer = DirectMessageSerializer(message)
         return Response(serializer.data, status=201)
 
 
+class ChatHistoryView(ReplicaReadMixin, APIView):
+    """Older messages of a conversation, newest page first, reaching into the archive."""
+
+    permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ("get",)
+
+    def get(self, request, user_id):
+        if request.user.id == int(user_id):
+            return Response({"error": "Cannot open chat with yourself."}, status=400)
+        try:
+            before, limit = history_params(request.query_params)
+        except ValueError:
+            return Response({"error": "before and limit must be positive integers."}, status=400)
+
+        conversation = Q(sender_id=request.user.id, receiver_id=user_id) | Q(
+            sender_id=user_id, receiver_id=request.user.id
+        )
+        messages, next_before = history_page(
+            DirectMessage.objects.filter(conversation).select_related("sender", "receiver"),
+            ArchivedDirectMessage.objects.filter(conversation).select_related("sender", "receiver"),
+            before,
+            limit,
+        )
+        context = {"read_cursors": conversation_cursors(request.user.id, user_id)}
+        return Response(
+            {
+                "results": DirectMessageSerializer(messages, many=True, context=context).data,
+                "next_before": next_before,
+            }
+        )
+
+
+class ChatReadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, user_id):
+        if request.user.id == int(user_id):
+            return Response({"error": "Cannot open chat with yourself."}, status=400)
+        if not User.objects.filter(id=user_id).exists():
+            return Response({"error": "User not found."}, status=404)
+
+        message_id = request.data.get("message_id")
+        if message_id is not None:
+            try:
+                message_id = int(message_id)
+            except (TypeError, ValueError):
+                return Response({"error": "message_id must be an integer."}, status=400)
+
+        state = mark_read(request.user.id, user_id, message_id)
+        return Response(
+            {
+                "last_read_message_id": state.last_read_message_id,
+                "unread_count": state.unread_count,
+                "unread_messages": unread_total(request.user.id),
+            }
+        )
+
+
+class UnreadCountView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({"unread_messages": unread_total(request.user.id)})
+
+
 class UsernameSuggestionsView(APIView):
     permission_classes = [permissions.AllowAny]
+    rate_limit_scopes = {"get": "search"}
 
     def get(self, request):
         raw = request.query_params.get("username", "").strip().lower()
@@ -211,3 +394,15 @@ class UsernameSuggestionsView(APIView):
             suffix += 1
 
         return Response({"suggestions": suggestions})
+
+
+@require_GET
+def avatar_file(request, name):
+    # Avatar names are content hashes, so browsers and CDNs may keep them forever.
+    match = AVATAR_NAME.match(name)
+    path = f"{AVATAR_DIR}/{name}"
+    if not match or not default_storage.exists(path):
+        raise Http404("Avatar not found.")
+    response = FileResponse(default_storage.open(path, "rb"), content_type=CONTENT_TYPES[match.group(1)])
+    response["Cache-Control"] = CACHE_CONTROL
+    return response
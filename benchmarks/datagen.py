@@ -0,0 +1,226 @@
+"""
+Synthetic data for the benchmark suite.
+
+Everything is created with ``bulk_create`` from a seeded RNG, so the same
+scale and seed always produce the same dataset (and the same query counts).
+"""
+
+import random
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from accounts.follow_graph import rebuild_suggestions
+from accounts.models import DirectMessage
+from accounts.stats import rebuild_user_stats
+from storage import versions
+from storage.activity import rebuild_activity
+from storage.recommendations import refresh_recommendations
+from storage.models import File, FileComment, Folder, FolderComment, FolderView
+
+User = get_user_model()
+
+USERNAME_PREFIX = "bench"
+PASSWORD = "bench-password"
+
+SCALES = {
+    "small": {
+        "users": 30,
+        "follows_per_user": 8,
+        "trees_per_user": 1,
+        "depth": 3,
+        "fanout": 2,
+        "files": 600,
+        "comments": 500,
+        "views": 1500,
+        "likes": 800,
+        "messages": 800,
+    },
+    "medium": {
+        "users": 200,
+        "follows_per_user": 25,
+        "trees_per_user": 2,
+        "depth": 4,
+        "fanout": 2,
+        "files": 8000,
+        "comments": 6000,
+        "views": 20000,
+        "likes": 10000,
+        "messages": 10000,
+    },
+}
+
+
+def _pairs(rng, left, right, count):
+    pairs = set()
+    limit = len(left) * len(right)
+    while len(pairs) < min(count, limit):
+        pairs.add((rng.choice(left), rng.choice(right)))
+    return sorted(pairs)
+
+
+@transaction.atomic
+def generate(scale="small", seed=42, stdout=None, **overrides):
+    params = {**SCALES[scale], **overrides}
+    rng = random.Random(seed)
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        User(
+            username=f"{USERNAME_PREFIX}{i}",
+            email=f"{USERNAME_PREFIX}{i}@example.com",
+            email_normalized=f"{USERNAME_PREFIX}{i}@example.com",
+            password=password,
+        )
+        for i in range(params["users"])
+    )
+    users = list(
+        User.objects.filter(username__startswith=USERNAME_PREFIX).order_by("id").values_list("id", flat=True)
+    )
+    log(f"users: {len(users)}")
+
+    # Power-law-ish follow graph: low ids are followed far more often.
+    weights = [1 / (rank + 1) for rank in range(len(users))]
+    follows = set()
+    for follower in users:
+        for followed in rng.choices(users, weights=weights, k=params["follows_per_user"]):
+            if followed != follower:
+                follows.add((follower, followed))
+    Through = User.follows.through
+    Through.objects.bulk_create(
+        Through(from_user_id=a, to_user_id=b) for a, b in sorted(follows)
+    )
+    log(f"follows: {len(follows)}")
+
+    # Folder trees, one level at a time; the generated codes map rows back to ids.
+    folders = []
+    level = [(owner, None) for owner in users for _ in range(params["trees_per_user"])]
+    for depth in range(params["depth"] + 1):
+        batch = [
+            Folder(
+                name=f"folder-{depth}-{index}",
+                owner_id=owner,
+                parent_id=parent,
+                is_public=rng.random() > 0.1,
+            )
+            for index, (owner, parent) in enumerate(level)
+        ]
+        Folder.objects.bulk_create(batch, batch_size=500)
+        codes = {folder.folder_code: folder.owner_id for folder in batch}
+        created = list(
+            Folder.objects.filter(folder_code__in=list(codes)).order_by("id").values_list("id", "owner_id")
+        )
+        folders.extend(created)
+        level = [(owner, pk) for pk, owner in created for _ in range(params["fanout"])]
+    folder_ids = [pk for pk, _ in folders]
+    owner_of = dict(folders)
+    log(f"folders: {len(folder_ids)}")
+
+    File.objects.bulk_create(
+        (
+            File(
+                name=f"file-{i}.txt",
+                file=f"uploads/bench-{i}.txt",
+                size=(i % 100 + 1) * 10_000,
+                folder_id=folder_id,
+                owner_id=owner_of[folder_id],
+            )
+            for i, folder_id in enumerate(rng.choice(folder_ids) for _ in range(params["files"]))
+        ),
+        batch_size=1000,
+    )
+    file_ids = list(File.objects.filter(folder_id__in=folder_ids).values_list("id", flat=True))
+    log(f"files: {len(file_ids)}")
+
+    FolderView.objects.bulk_create(
+        (
+            FolderView(folder_id=folder_id, user_id=user_id)
+            for user_id, folder_id in _pairs(rng, users, folder_ids, params["views"])
+        ),
+        batch_size=1000,
+    )
+    LikeThrough = Folder.liked_by.through
+    LikeThrough.objects.bulk_create(
+        (
+            LikeThrough(folder_id=folder_id, user_id=user_id)
+            for user_id, folder_id in _pairs(rng, users, folder_ids, params["likes"])
+        ),
+        batch_size=1000,
+    )
+    half = params["comments"] // 2
+    FolderComment.objects.bulk_create(
+        (
+            FolderComment(folder_id=rng.choice(folder_ids), owner_id=rng.choice(users), text="Nice folder")
+            for _ in range(half)
+        ),
+        batch_size=1000,
+    )
+    FileComment.objects.bulk_create(
+        (
+            FileComment(file_id=rng.choice(file_ids), owner_id=rng.choice(users), text="Nice file")
+            for _ in range(params["comments"] - half)
+        ),
+        batch_size=1000,
+    )
+    log("views, likes and comments created")
+
+    # The first two users always have a conversation so chat scenarios have data.
+    messages = []
+    for i in range(params["messages"]):
+        if i % 4 == 0:
+            sender, receiver = rng.sample(users[:2], 2)
+        else:
+            sender, receiver = rng.sample(users, 2)
+        messages.append(DirectMessage(sender_id=sender, receiver_id=receiver, text=f"message {i}"))
+    DirectMessage.objects.bulk_create(messages, batch_size=1000)
+    log(f"messages: {len(messages)}")
+
+    rebuild_user_stats(users)
+    log("user stats rebuilt")
+    rebuild_suggestions(users)
+    log("follow suggestions rebuilt")
+    rebuild_activity()
+    log("folder activity rebuilt")
+    refresh_recommendations(full=True)
+    log("recommendations computed")
+    versions.bump_all()
+
+    return params
+
+
+def synthetic_graph(edges=1_000_000, users=100_000, folders=50_000, like_share=0.3, follow_share=0.1, seed=42):
+    """
+    In-memory ``(likes, views, follows, folders)`` edge lists for the
+    recommendation benchmark, ``edges`` distinct edges in total. Folder
+    popularity and user activity follow a long tail, like real traffic.
+    """
+    rng = random.Random(seed)
+
+    def long_tail(n):
+        return list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(n)))
+
+    def distinct_pairs(count, left, right, allow_loops=True):
+        pairs = {}
+        while len(pairs) < count:
+            missing = count - len(pairs)
+            for pair in zip(
+                rng.choices(range(1, len(left) + 1), cum_weights=left, k=missing),
+                rng.choices(range(1, len(right) + 1), cum_weights=right, k=missing),
+            ):
+                if allow_loops or pair[0] != pair[1]:
+                    pairs[pair] = None
+        return list(pairs)[:count]
+
+    user_weights, folder_weights = long_tail(users), long_tail(folders)
+    follow_count = int(edges * follow_share)
+    interactions = distinct_pairs(edges - follow_count, user_weights, folder_weights)
+    follows = distinct_pairs(follow_count, user_weights, user_weights, allow_loops=False)
+    split = int(len(interactions) * like_share)
+    folder_rows = [(folder_id, folder_id % users + 1, rng.random() < 0.9) for folder_id in range(1, folders + 1)]
+    return interactions[:split], interactions[split:], follows, folder_rows
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.datagen import synthetic_graph
+from storage.recommendations import Graph, compute_neighbours, compute_recommendations, default_backend
+
+
+class Command(BaseCommand):
+    help = "Time the recommendation job on a synthetic graph, without touching the database."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--edges", type=int, default=1_000_000)
+        parser.add_argument("--users", type=int, default=100_000)
+        parser.add_argument("--folders", type=int, default=50_000)
+        parser.add_argument("--top-k", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--sample",
+            type=int,
+            help="Only rank this many folders and users, as an incremental refresh would.",
+        )
+        parser.add_argument("--backend", choices=["numpy", "python"], default=default_backend())
+
+    def handle(self, *args, **options):
+        if options["backend"] == "numpy" and default_backend() != "numpy":
+            raise CommandError("The numpy backend needs numpy and scipy installed.")
+        backend, k = options["backend"], options["top_k"]
+
+        timings = {}
+        start = time.perf_counter()
+        likes, views, follows, folders = synthetic_graph(
+            edges=options["edges"], users=options["users"], folders=options["folders"], seed=options["seed"]
+        )
+        timings["generate"] = time.perf_counter() - start
+        edges = len(likes) + len(views) + len(follows)
+
+        start = time.perf_counter()
+        graph = Graph(likes=likes, views=views, follows=follows, folders=folders)
+        timings["build graph"] = time.perf_counter() - start
+
+        folder_ids, user_ids = graph.folder_ids, graph.user_ids
+        if options["sample"]:
+            folder_ids, user_ids = folder_ids[: options["sample"]], user_ids[: options["sample"]]
+
+        start = time.perf_counter()
+        neighbours = compute_neighbours(graph, folder_ids, k, backend)
+        timings["neighbours"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        recommendations = compute_recommendations(graph, neighbours, user_ids, k, backend)
+        timings["users"] = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{edges} edges ({len(likes)} likes, {len(views)} views, {len(follows)} follows), "
+            f"backend {backend}, top {k}"
+        )
+        for name, seconds in timings.items():
+            self.stdout.write(f"{name:<12} {seconds:8.2f} s")
+        self.stdout.write(
+            f"ranked {len(neighbours)} folders ({sum(map(len, neighbours.values()))} rows) "
+            f"and {len(recommendations)} users ({sum(map(len, recommendations.values()))} rows)"
+        )
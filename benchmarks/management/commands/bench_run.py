@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment
+
+from benchmarks.runner import compare, run
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "baseline.json"
+
+
+class Command(BaseCommand):
+    help = "Run the API benchmark scenarios and optionally check them against a baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument("--warmup", type=int, default=1)
+        parser.add_argument("--scenario", action="append", dest="scenarios", help="Only run this scenario (repeatable).")
+        parser.add_argument("--output", help="Write the results as JSON to this path.")
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+        parser.add_argument("--write-baseline", action="store_true", help="Store these results as the new baseline.")
+        parser.add_argument("--check", action="store_true", help="Fail if any scenario regressed against the baseline.")
+        parser.add_argument(
+            "--latency-tolerance",
+            type=float,
+            default=0.5,
+            help="Allowed relative p50/p99 slowdown before --check fails (query counts must not grow at all).",
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # The suite replays each endpoint far faster than any client may.
+        with override_settings(RATE_LIMIT_ENABLED=False):
+            scenarios = run(
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+                only=options["scenarios"],
+            )
+        results = {
+            "meta": {"vendor": connection.vendor, "iterations": options["iterations"]},
+            "scenarios": scenarios,
+        }
+
+        for name, row in results["scenarios"].items():
+            self.stdout.write(
+                f"{name:<28} p50 {row['p50_ms']:>9.2f} ms  p99 {row['p99_ms']:>9.2f} ms  "
+                f"{row['queries']:>6} queries  {row['response_bytes']:>9} bytes"
+            )
+
+        payload = json.dumps(results, indent=2, sort_keys=True) + "\n"
+        if options["output"]:
+            Path(options["output"]).write_text(payload)
+        if options["write_baseline"]:
+            Path(options["baseline"]).write_text(payload)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}"))
+
+        if options["check"]:
+            baseline = json.loads(Path(options["baseline"]).read_text())
+            if baseline["meta"]["vendor"] != connection.vendor:
+                self.stderr.write(
+                    f"Baseline was recorded on {baseline['meta']['vendor']}; latencies may not be comparable."
+                )
+            regressions = compare(results["scenarios"], baseline["scenarios"], options["latency_tolerance"])
+            if regressions:
+                raise CommandError("Benchmark regressions:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
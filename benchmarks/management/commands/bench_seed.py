@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.datagen import SCALES, USERNAME_PREFIX, generate
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a deterministic synthetic dataset for the benchmark suite."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help="Delete previously generated benchmark users (and everything they own) first.",
+        )
+
+    def handle(self, *args, **options):
+        existing = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        if existing.exists():
+            if not options["flush"]:
+                raise CommandError("Benchmark data already exists; pass --flush to regenerate it.")
+            existing.delete()
+
+        generate(scale=options["scale"], seed=options["seed"], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Seeded '{options['scale']}' dataset."))
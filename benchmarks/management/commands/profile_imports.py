@@ -0,0 +1,103 @@
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+TARGETS = {
+    "setup": "import django; django.setup()",
+    # What a WSGI worker imports before it can answer its first request.
+    "wsgi": "import core.wsgi; from django.urls import get_resolver; get_resolver().reverse_dict",
+}
+COMMAND_CODE = "import sys; from django.core.management import execute_from_command_line; execute_from_command_line(sys.argv)"
+
+# This command's own options, picked out of the profiled command's arguments.
+OWN_OPTIONS = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+OWN_OPTIONS.add_argument("--limit", type=int)
+OWN_OPTIONS.add_argument("--by-package", action="store_true")
+
+
+def split_command_args(args):
+    """
+    ``(own options, child argv)`` for the arguments after ``command``. Options
+    of this command are recognised anywhere before a ``--``; everything after
+    it goes to the child untouched.
+    """
+    if "--" in args:
+        split = args.index("--")
+        args, passthrough = args[:split], args[split + 1 :]
+    else:
+        passthrough = []
+    own, rest = OWN_OPTIONS.parse_known_args(args)
+    return own, [*rest, *passthrough]
+
+
+def parse_importtime(output):
+    """``[(depth, self_us, cumulative_us, module), ...]`` from ``-X importtime`` output."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, int(own), int(cumulative), name.strip()))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Profile module import time for Django start-up, a WSGI worker or a management command."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("target", nargs="?", default="setup", help="'setup', 'wsgi' or 'command'.")
+        parser.add_argument(
+            "command_args",
+            nargs=argparse.REMAINDER,
+            help=(
+                "With 'command': the command and its arguments. This command's own options may come "
+                "anywhere; arguments after '--' all go to the profiled command."
+            ),
+        )
+        parser.add_argument("--limit", type=int, default=25)
+        parser.add_argument(
+            "--by-package",
+            action="store_true",
+            help="Total the time per top-level package instead of listing top-level imports.",
+        )
+
+    def handle(self, *args, **options):
+        target = options["target"]
+        if target == "command":
+            own, command_args = split_command_args(options["command_args"])
+            if not command_args:
+                raise CommandError("Name the management command to profile, e.g. 'command run_tasks --once'.")
+            if own.limit is not None:
+                options["limit"] = own.limit
+            options["by_package"] = options["by_package"] or own.by_package
+            argv = [sys.executable, "-X", "importtime", "-c", COMMAND_CODE, *command_args]
+        elif target in TARGETS:
+            argv = [sys.executable, "-X", "importtime", "-c", TARGETS[target]]
+        else:
+            raise CommandError(f"Unknown target {target!r}; use 'setup', 'wsgi' or 'command'.")
+
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "core.settings")}
+        process = subprocess.run(argv, capture_output=True, text=True, env=env)
+        if process.returncode:
+            raise CommandError(f"Profiled process failed:\n{process.stderr[-2000:]}")
+        rows = parse_importtime(process.stderr)
+        total = sum(own for _, own, _, _ in rows)
+
+        if options["by_package"]:
+            totals = defaultdict(int)
+            for _, own, _, name in rows:
+                totals[name.split(".")[0]] += own
+            ranked = sorted(totals.items(), key=lambda item: -item[1])
+        else:
+            # Top-level imports are the ones a lazy import in this project could avoid.
+            ranked = sorted(((name, cumulative) for depth, _, cumulative, name in rows if depth == 0), key=lambda item: -item[1])
+
+        self.stdout.write(f"{len(rows)} modules imported in {total / 1000:.1f} ms ({target})")
+        for name, micros in ranked[: options["limit"]]:
+            self.stdout.write(f"{micros / 1000:9.1f} ms  {name}")
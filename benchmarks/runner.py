@@ -0,0 +1,97 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .scenarios import SCENARIOS, fixtures
+
+User = get_user_model()
+
+
+def _percentile(samples, percent):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[percent - 1]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _client(username, clients):
+    if username not in clients:
+        headers = {}
+        if username is not None:
+            token = RefreshToken.for_user(User.objects.get(username=username)).access_token
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        clients[username] = Client(HTTP_ACCEPT="application/json", **headers)
+    return clients[username]
+
+
+def run(iterations=10, warmup=1, only=None):
+    values = fixtures()
+    clients = {}
+    results = {}
+    for name, viewer, path, *options in SCENARIOS:
+        if only and name not in only:
+            continue
+        client = _client(viewer, clients)
+        url = path.format(**values)
+        for _ in range(warmup):
+            client.get(url)
+
+        headers, expected_status = {}, 200
+        if "revalidate" in options:
+            headers["HTTP_IF_NONE_MATCH"] = client.get(url)["ETag"]
+            expected_status = 304
+
+        durations = []
+        queries = 0
+        size = 0
+        for _ in range(iterations):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                start = time.perf_counter()
+                response = client.get(url, **headers)
+                durations.append((time.perf_counter() - start) * 1000)
+            if response.status_code != expected_status:
+                raise RuntimeError(f"{name}: {url} returned {response.status_code}")
+            queries = counter.count
+            size = len(response.content)
+
+        results[name] = {
+            "p50_ms": round(_percentile(durations, 50), 2),
+            "p99_ms": round(_percentile(durations, 99), 2),
+            "mean_ms": round(statistics.fmean(durations), 2),
+            "queries": queries,
+            "response_bytes": size,
+        }
+    return results
+
+
+def compare(results, baseline, latency_tolerance):
+    """Return a list of human-readable regressions against ``baseline``."""
+    regressions = []
+    for name, current in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if current["queries"] > expected["queries"]:
+            regressions.append(
+                f"{name}: {current['queries']} queries (baseline {expected['queries']})"
+            )
+        for metric in ("p50_ms", "p99_ms"):
+            limit = expected[metric] * (1 + latency_tolerance)
+            if current[metric] > limit:
+                regressions.append(
+                    f"{name}: {metric} {current[metric]} > {limit:.2f} (baseline {expected[metric]})"
+                )
+    return regressions
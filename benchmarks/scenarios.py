@@ -0,0 +1,66 @@
+"""
+Benchmark scenarios: one entry per endpoint worth guarding.
+
+Each scenario is ``(name, viewer, path)``; ``viewer`` is ``None`` for an
+anonymous request, and ``path`` may use the ``{...}`` placeholders filled in
+by ``fixtures()`` from the seeded dataset. A trailing ``"revalidate"`` option
+replays the request with the ETag of a first response and expects a 304.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+
+from storage.models import Folder
+
+from .datagen import USERNAME_PREFIX
+
+User = get_user_model()
+
+VIEWER = f"{USERNAME_PREFIX}0"
+
+SCENARIOS = [
+    ("feed_anonymous", None, "/api/folders/feed/"),
+    ("feed_anonymous_revalidate", None, "/api/folders/feed/", "revalidate"),
+    ("feed", VIEWER, "/api/folders/feed/"),
+    ("feed_revalidate", VIEWER, "/api/folders/feed/", "revalidate"),
+    ("feed_async", VIEWER, "/api/async/folders/feed/"),
+    ("trending_anonymous", None, "/api/folders/trending/?window=24h"),
+    ("trending_7d", VIEWER, "/api/folders/trending/?window=7d"),
+    ("recommended", VIEWER, "/api/folders/recommended/"),
+    ("following_feed", VIEWER, "/api/folders/following_feed/"),
+    ("my_folders", VIEWER, "/api/folders/my_folders/"),
+    ("folder_retrieve_deep", VIEWER, "/api/folders/{deep_folder}/"),
+    ("folder_retrieve_revalidate", VIEWER, "/api/folders/{deep_folder}/", "revalidate"),
+    ("folder_children", VIEWER, "/api/folders/?parent={deep_folder}"),
+    ("file_list", VIEWER, "/api/files/?folder={busy_folder}"),
+    ("folder_comments", VIEWER, "/api/folder-comments/?folder={commented_folder}"),
+    ("user_list", VIEWER, "/api/accounts/users/"),
+    ("user_detail", VIEWER, "/api/accounts/users/{partner}/"),
+    ("follow_suggestions", VIEWER, "/api/accounts/users/suggestions/"),
+    ("mutual_connections", VIEWER, "/api/accounts/users/{partner}/mutuals/"),
+    ("chat_list", VIEWER, "/api/accounts/chats/"),
+    ("chat_with_user", VIEWER, "/api/accounts/chats/{partner}/"),
+]
+
+
+def fixtures():
+    viewer = User.objects.get(username=VIEWER)
+    partner = User.objects.get(username=f"{USERNAME_PREFIX}1")
+    roots = Folder.objects.filter(parent__isnull=True, is_public=True)
+    deep_folder = roots.annotate(n=Count("subfolders")).order_by("-n", "id").first()
+    busy_folder = (
+        Folder.objects.filter(is_public=True)
+        .annotate(n=Count("file"))
+        .order_by("-n", "id")
+        .first()
+    )
+    commented_folder = (
+        Folder.objects.annotate(n=Count("comments")).order_by("-n", "id").first()
+    )
+    return {
+        "viewer": viewer.id,
+        "partner": partner.id,
+        "deep_folder": deep_folder.id,
+        "busy_folder": busy_folder.id,
+        "commented_folder": commented_folder.id,
+    }
@@ -0,0 +1,86 @@
+"""
+Admin changelists for tables too big to count.
+
+A default changelist runs ``COUNT(*)`` twice per page: once for the
+filtered results and once for the whole table. ``LargeTableAdmin`` skips
+the second count, and its paginator counts the first one cheaply. An
+unfiltered list uses the table's row estimate from MySQL or PostgreSQL
+statistics. A filtered list counts at most ``COUNT_LIMIT`` rows. Either way
+the page total is approximate on big tables, but paging still works.
+
+``bulk_delete`` replaces Django's ``delete_selected``. That action lists
+every related object on a confirmation page first, which is unusable for
+folder trees with thousands of rows. ``bulk_delete`` deletes in batched
+queries with per-row counter signals deferred. ``after_bulk_change`` then
+rebuilds the affected users' counters and bumps the storage table versions
+once; subclasses extend it for their own counters.
+"""
+
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils.functional import cached_property
+
+from accounts.stats import defer_counters, rebuild_user_stats
+from storage import versions
+
+COUNT_LIMIT = 100_000
+
+
+def estimated_row_count(model, using):
+    """The database's row estimate for ``model``'s table, or ``None`` where there is none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "mysql":
+        sql = "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s"
+    elif connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)"
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for tables that were never analyzed.
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= COUNT_LIMIT:
+                return estimate
+        return queryset.order_by()[:COUNT_LIMIT].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    actions = ["bulk_delete"]
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+    def affected_users(self, queryset):
+        """Ids of the users whose counters change when ``queryset`` changes."""
+        return set()
+
+    def after_bulk_change(self, user_ids):
+        if user_ids:
+            rebuild_user_stats(user_ids)
+        # Cascades can reach any storage table, and their signals were deferred.
+        versions.bump_all()
+
+    @admin.action(description="Delete selected (no confirmation)", permissions=["delete"])
+    def bulk_delete(self, request, queryset):
+        user_ids = self.affected_users(queryset)
+        self.log_deletions(request, queryset)
+        with transaction.atomic(), defer_counters():
+            deleted, _ = queryset.delete()
+            self.after_bulk_change(user_ids)
+        self.message_user(request, f"Deleted {deleted} rows, including related ones.", messages.SUCCESS)
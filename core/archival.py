@@ -0,0 +1,89 @@
+"""
+Moving old rows to cold tables and paging across both.
+
+Archive models mirror their hot model's columns with ``id`` as a plain
+primary key, so rows keep their ids when they move. ``archive_older_than``
+copies and deletes in id-ordered batches, one transaction each; a hot row is
+only deleted once the archive holds an identical copy, so an id that is
+already taken in the archive by a different row (say after the hot table's
+auto-increment was reset) keeps that row hot. ``history_page`` reads
+newest-first from the hot table and only falls through to the archive once
+the hot rows are exhausted; ``all_rows`` returns both tables merged in
+chronological order.
+"""
+
+import heapq
+import logging
+from operator import attrgetter
+
+from django.db import router, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_LIMIT = 50
+MAX_HISTORY_LIMIT = 200
+
+
+def archive_older_than(model, archive_model, cutoff, batch_size=1000):
+    fields = [f.attname for f in archive_model._meta.concrete_fields]
+    old = model.objects.filter(created_at__lt=cutoff).order_by("id")
+    moved = 0
+    last_id = None
+    while True:
+        batch = old if last_id is None else old.filter(id__gt=last_id)
+        rows = list(batch.values(*fields)[:batch_size])
+        if not rows:
+            return moved
+        last_id = rows[-1]["id"]
+        with transaction.atomic(using=router.db_for_write(model)):
+            existing = {
+                row["id"]: row
+                for row in archive_model.objects.filter(id__in=[row["id"] for row in rows]).values(*fields)
+            }
+            archive_model.objects.bulk_create(
+                [archive_model(**row) for row in rows if row["id"] not in existing]
+            )
+            copied = [row["id"] for row in rows if existing.get(row["id"], row) == row]
+            model.objects.filter(id__in=copied).delete()
+        if len(copied) < len(rows):
+            logger.warning(
+                "Kept %d %s rows whose ids are taken in %s by other rows",
+                len(rows) - len(copied),
+                model._meta.label,
+                archive_model._meta.label,
+            )
+        moved += len(copied)
+
+
+def all_rows(hot, cold, order=("created_at", "id")):
+    """Every row of ``hot`` and ``cold`` sorted by ``order``."""
+    return list(heapq.merge(cold.order_by(*order), hot.order_by(*order), key=attrgetter(*order)))
+
+
+def history_params(query_params):
+    """Read ``before`` and ``limit``; raises ``ValueError`` on bad input."""
+    before = query_params.get("before")
+    before = int(before) if before else None
+    limit = int(query_params.get("limit") or DEFAULT_HISTORY_LIMIT)
+    if limit < 1:
+        raise ValueError("limit must be positive.")
+    return before, min(limit, MAX_HISTORY_LIMIT)
+
+
+def history_page(hot, cold, before=None, limit=DEFAULT_HISTORY_LIMIT):
+    """
+    Return ``(rows, next_before)``: up to ``limit`` rows older than the id
+    ``before`` in chronological order, and the cursor for the page before
+    them (None when there is nothing older).
+    """
+    if before is not None:
+        hot, cold = hot.filter(id__lt=before), cold.filter(id__lt=before)
+    rows = list(hot.order_by("-id")[: limit + 1])
+    if len(rows) <= limit:
+        if rows:
+            cold = cold.filter(id__lt=rows[-1].id)
+        rows += list(cold.order_by("-id")[: limit + 1 - len(rows)])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+    return rows, rows[0].id if has_more else None
@@ -2,6 +2,9 @@
 ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn core.asgi:application``) to get
+the non-blocking ``/api/async/...`` and ``/api/accounts/async/...`` read
+endpoints; the regular DRF views keep working under ASGI as well.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -0,0 +1,75 @@
+import math
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+from core.renderers import FastJSONRenderer
+from core.throttling import TokenBucketThrottle, default_scope
+
+_renderer = FastJSONRenderer()
+
+
+async def authenticate_request(request):
+    # Same authentication classes the DRF views use, so tokens behave identically.
+    for auth_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = await sync_to_async(auth_class().authenticate)(request)
+        if result is not None:
+            return result[0]
+    return AnonymousUser()
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        _renderer.render(data),
+        status=status,
+        content_type="application/json",
+    )
+
+
+def error_response(exc):
+    detail = exc.detail if isinstance(exc, exceptions.APIException) else str(exc)
+    if not isinstance(detail, dict):
+        detail = {"detail": detail}
+    response = json_response(detail, status=exc.status_code)
+    if exc.status_code == 401:
+        response["WWW-Authenticate"] = 'Bearer realm="api"'
+    if getattr(exc, "wait", None) is not None:
+        response["Retry-After"] = str(math.ceil(exc.wait))
+    return response
+
+
+async def throttle_request(request, scope):
+    # Same token buckets as the DRF views, so both APIs share one allowance.
+    throttle = TokenBucketThrottle()
+    if not await sync_to_async(throttle.allow)(request, scope or default_scope(request)):
+        raise exceptions.Throttled(throttle.wait())
+
+
+def async_api_view(view=None, *, rate_limit_scope=None):
+    """
+    Authenticate and rate-limit an async view. ``rate_limit_scope`` names its
+    bucket in ``settings.RATE_LIMITS``; without one it falls back to
+    ``"read"`` or ``"write"`` by HTTP method.
+    """
+    if view is None:
+        return lambda view: async_api_view(view, rate_limit_scope=rate_limit_scope)
+
+    @wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        try:
+            request.user = await authenticate_request(request)
+            await throttle_request(request, rate_limit_scope)
+            return await view(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return error_response(exc)
+
+    return wrapped
+
+
+def require_authenticated(request):
+    if not request.user.is_authenticated:
+        raise exceptions.NotAuthenticated()
@@ -0,0 +1,119 @@
+"""
+Response compression with zstd, Brotli or gzip.
+
+The encoding is picked from ``Accept-Encoding``, preferring zstd, then br,
+then gzip. zstd needs ``zstandard`` and br needs ``brotli``, both in
+``requirements.txt``; where either is missing that encoding is skipped, and
+gzip is always available. Bodies shorter than
+``COMPRESSION_MIN_SIZE`` or of a non-text type are left alone.
+
+Responses that carry an ETag are likely to be served again, so their
+compressed bytes are kept in the default cache for
+``COMPRESSION_CACHE_SECONDS``. The key is a digest of the uncompressed body,
+so a cached entry can never stand in for different content.
+"""
+
+import gzip
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/vnd.", "application/msgpack", "text/")
+_ACCEPT_ENCODING = re.compile(r"\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?")
+
+
+def _zstd(data):
+    return zstandard.ZstdCompressor(level=6).compress(data)
+
+
+def _br(data):
+    return brotli.compress(data, quality=5)
+
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+ENCODERS = [
+    ("zstd", _zstd, zstandard is not None),
+    ("br", _br, brotli is not None),
+    ("gzip", _gzip, True),
+]
+
+
+def accepted_encodings(header):
+    accepted = {}
+    for part in header.split(","):
+        match = _ACCEPT_ENCODING.match(part)
+        if match:
+            try:
+                accepted[match.group(1).lower()] = float(match.group(2) or 1)
+            except ValueError:
+                continue
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header or "")
+    for name, encode, available in ENCODERS:
+        if available and accepted.get(name, accepted.get("*", 0)) > 0:
+            return name, encode
+    return None, None
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.status_code != 200
+            or response.has_header("Content-Encoding")
+            or not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+            or len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding, encode = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING"))
+        if encoding is None:
+            return response
+
+        content = response.content
+        cacheable = response.has_header("ETag")
+        key = None
+        compressed = None
+        if cacheable:
+            digest = hashlib.blake2b(content, digest_size=20).hexdigest()
+            key = f"compressed:{encoding}:{digest}"
+            compressed = cache.get(key)
+        if compressed is None:
+            compressed = encode(content)
+            if cacheable and len(compressed) <= settings.COMPRESSION_CACHE_MAX_BYTES:
+                cache.set(key, compressed, settings.COMPRESSION_CACHE_SECONDS)
+        if len(compressed) >= len(content):
+            return response
+
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+        etag = response.get("ETag")
+        if etag and not etag.startswith("W/"):
+            # The representation changed, so a strong validator would no longer hold.
+            response["ETag"] = f"W/{etag}"
+        return response
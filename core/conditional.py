@@ -0,0 +1,98 @@
+"""
+Conditional GETs for DRF views.
+
+A view names, per action, a method that returns cheap *validators*: values
+that change whenever the rows behind the response change, such as the
+per-table write counters in ``storage.versions`` or, for a handful of rows
+reached through an index, their count and ``Max("updated_at")``. They are hashed together with
+the caller, the full path and the ``Accept`` header into a weak ETag. When
+it matches ``If-None-Match`` the view answers 304 before any serialization.
+
+Validators must cover every table a response renders, including display
+fields joined from other tables such as an owner's username or avatar
+(``storage.versions`` tracks users for that). Counts written on every read,
+such as folder views, are covered by a time window instead, so they lag by
+at most ``CONDITIONAL_VIEW_COUNT_SECONDS``.
+
+Anonymous responses are marked ``public`` for ``CONDITIONAL_MAX_AGE``
+seconds so a CDN or reverse proxy can serve them; authenticated ones are
+``private, no-cache`` and always revalidate.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+
+class NotModified(APIException):
+    status_code = 304
+    default_detail = ""
+
+
+def table_version(queryset, field="pk"):
+    """``(row count, max(field))`` for a queryset; one aggregate query."""
+    row = queryset.order_by().aggregate(count=Count("pk"), latest=Max(field))
+    return row["count"], row["latest"]
+
+
+def make_etag(request, validators):
+    user = request.user
+    parts = [
+        f"user:{user.id}" if user.is_authenticated else "anon",
+        request.get_full_path(),
+        request.META.get("HTTP_ACCEPT", ""),
+        *map(repr, validators),
+    ]
+    digest = hashlib.md5("\n".join(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _matches(etag, header):
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    if "*" in candidates:
+        return True
+    strip = lambda tag: tag[2:] if tag.startswith("W/") else tag
+    return strip(etag) in {strip(tag) for tag in candidates}
+
+
+class ConditionalGetMixin:
+    # action (or lower-case method name) -> name of a method returning validators
+    conditional_actions = {}
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        action = getattr(self, "action", None) or request.method.lower()
+        validator = self.conditional_actions.get(action)
+        if validator and request.method in ("GET", "HEAD"):
+            self.check_not_modified(*getattr(self, validator)(request, *args, **kwargs))
+
+    def check_not_modified(self, *validators):
+        """Set the response ETag; raise ``NotModified`` if the client already has it."""
+        self.etag = make_etag(self.request, validators)
+        if _matches(self.etag, self.request.META.get("HTTP_IF_NONE_MATCH")):
+            raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=304)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, "etag", None)
+        if etag and response.status_code in (200, 304):
+            response["ETag"] = etag
+            if request.user.is_authenticated:
+                response["Cache-Control"] = "private, no-cache"
+            else:
+                response["Cache-Control"] = f"public, max-age={settings.CONDITIONAL_MAX_AGE}"
+            patch_vary_headers(response, ["Accept", "Authorization"])
+        return response
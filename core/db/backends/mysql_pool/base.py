@@ -0,0 +1,107 @@
+"""
+MySQL backend that keeps a small per-process pool of mysqlclient connections.
+
+Django's own persistent connections (``CONN_MAX_AGE``) only help a thread that
+serves many requests; threads spun up for ASGI ``sync_to_async`` calls or
+short-lived worker threads still pay a full handshake. This backend hands
+closed connections back to a pool instead of closing them, so the next
+``connect()`` in any thread of the same process reuses one.
+
+Configure it through the ``POOL`` key of the database settings::
+
+    "POOL": {"SIZE": 10, "RECYCLE": 1800, "PING_AFTER": 30}
+"""
+
+import os
+import queue
+import threading
+import time
+
+from django.db.backends.mysql import base as mysql_base
+from django.utils.asyncio import async_unsafe
+
+Database = mysql_base.Database
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    def __init__(self, size, recycle, ping_after):
+        self.size = size
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self, connect):
+        while True:
+            try:
+                conn, created_at, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                return connect(), time.monotonic()
+
+            now = time.monotonic()
+            if self.recycle and now - created_at > self.recycle:
+                self._discard(conn)
+                continue
+            if self.ping_after is not None and now - released_at > self.ping_after:
+                try:
+                    conn.ping()
+                except Database.Error:
+                    self._discard(conn)
+                    continue
+            return conn, created_at
+
+    def release(self, conn, created_at):
+        if os.getpid() != self.pid:
+            # Never hand a connection inherited across fork() to the child.
+            return
+        try:
+            if not conn.get_autocommit():
+                conn.rollback()
+            self._idle.put_nowait((conn, created_at, time.monotonic()))
+        except (queue.Full, Database.Error):
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Database.Error:
+            pass
+
+
+def get_pool(alias, settings_dict):
+    options = settings_dict.get("POOL") or {}
+    key = (alias, os.getpid())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                size=int(options.get("SIZE", 10)),
+                recycle=options.get("RECYCLE", 1800),
+                ping_after=options.get("PING_AFTER", 30),
+            )
+    return pool
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        connection, self._pooled_since = self.pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params)
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        if self.errors_occurred or self.in_atomic_block:
+            # Anything that may have left server-side state behind is dropped.
+            return super()._close()
+        with self.wrap_database_errors:
+            self.pool.release(self.connection, self._pooled_since)
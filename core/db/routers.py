@@ -0,0 +1,73 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def _pin_key(user_id):
+    return f"db-pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """Keep a user's reads on the primary until replicas have caught up with their write."""
+    cache.set(_pin_key(user_id), True, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user_id):
+    return cache.get(_pin_key(user_id), False)
+
+
+class PrimaryReplicaRouter:
+    """Send reads to a replica while a view has opted in, everything else to default."""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if replicas and _replica_reads.get():
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaReadMixin:
+    """
+    Route the ORM reads of the safe-method actions listed in ``replica_actions``
+    to a read replica for the duration of the request. Viewsets list action
+    names; plain API views list handler names such as ``"get"``.
+
+    Users who wrote recently (see ``ReplicaPinMiddleware``) stay on the primary.
+    """
+
+    replica_actions = ("list", "retrieve")
+
+    def initial(self, request, *args, **kwargs):
+        if self._reads_from_replica(request):
+            self._replica_token = _replica_reads.set(True)
+        super().initial(request, *args, **kwargs)
+
+    def _reads_from_replica(self, request):
+        if not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS:
+            return False
+        action = getattr(self, "action", None) or request.method.lower()
+        if action not in self.replica_actions:
+            return False
+        user = request.user
+        return not (user.is_authenticated and is_pinned_to_primary(user.id))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_replica_token", None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,175 @@
+"""
+Per-request query and latency instrumentation.
+
+A sampled request collects its query count, DB time, repeated query
+fingerprints and serializer time. The numbers are sent back in a
+``Server-Timing`` header and folded into per-endpoint aggregates that the
+admin-only ``/api/admin/perf-stats/`` endpoint reports. Aggregates live in
+the worker process, so each worker reports what it has served.
+"""
+
+import random
+import re
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+_current = ContextVar("perf_sample", default=None)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+
+
+def fingerprint(sql):
+    sql = _LITERALS.sub("?", sql)
+    return _IN_LISTS.sub("(...)", sql)
+
+
+class RequestSample:
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.query_count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: n for sql, n in self.fingerprints.items() if n > 1}
+
+
+class EndpointStats:
+    window = 500
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.duplicate_queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.response_bytes = 0
+        self.durations = deque(maxlen=self.window)
+        self.duplicate_fingerprints = Counter()
+
+    def add(self, sample, duration, size):
+        duplicates = sample.duplicates
+        self.requests += 1
+        self.queries += sample.query_count
+        self.max_queries = max(self.max_queries, sample.query_count)
+        self.duplicate_queries += sum(n - 1 for n in duplicates.values())
+        self.db_time += sample.db_time
+        self.serializer_time += sample.serializer_time
+        self.response_bytes += size
+        self.durations.append(duration)
+        self.duplicate_fingerprints.update(duplicates)
+
+    def as_dict(self):
+        durations = sorted(self.durations)
+        quantiles = statistics.quantiles(durations, n=100) if len(durations) > 1 else durations * 99
+        return {
+            "requests": self.requests,
+            "avg_queries": round(self.queries / self.requests, 2),
+            "max_queries": self.max_queries,
+            "avg_duplicate_queries": round(self.duplicate_queries / self.requests, 2),
+            "avg_db_ms": round(self.db_time * 1000 / self.requests, 2),
+            "avg_serializer_ms": round(self.serializer_time * 1000 / self.requests, 2),
+            "avg_response_bytes": self.response_bytes // self.requests,
+            "p50_ms": round(quantiles[49] * 1000, 2),
+            "p99_ms": round(quantiles[98] * 1000, 2),
+            "top_duplicates": [
+                {"sql": sql, "count": n}
+                for sql, n in self.duplicate_fingerprints.most_common(5)
+            ],
+        }
+
+
+class StatsCollector:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, sample, duration, size):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.add(sample, duration, size)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in sorted(self._endpoints.items())}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+collector = StatsCollector()
+
+
+class InstrumentedSerializerMixin:
+    """Count time spent in the outermost ``to_representation`` of a sampled request."""
+
+    def to_representation(self, instance):
+        sample = _current.get()
+        if sample is None or sample.serializer_depth:
+            return super().to_representation(instance)
+        sample.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            sample.serializer_depth -= 1
+            sample.serializer_time += time.perf_counter() - start
+
+
+class QueryInstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.PERF_SAMPLE_RATE
+        if rate <= 0 or random.random() >= rate:
+            return self.get_response(request)
+
+        sample = RequestSample()
+        token = _current.set(sample)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sample))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - start
+
+        size = 0 if response.streaming else len(response.content)
+        match = request.resolver_match
+        endpoint = f"{request.method} {match.view_name if match else 'unresolved'}"
+        collector.record(endpoint, sample, duration, size)
+
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={sample.db_time * 1000:.1f};desc="{sample.query_count} queries"',
+                f"ser;dur={sample.serializer_time * 1000:.1f}",
+                f"total;dur={duration * 1000:.1f}",
+            ]
+        )
+        return response
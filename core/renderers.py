@@ -0,0 +1,76 @@
+"""
+Response renderers chosen by content negotiation (``Accept`` or ``?format=``).
+
+* ``FastJSONRenderer`` (``application/json``) encodes with orjson, and falls
+  back to DRF's encoder where orjson cannot be installed.
+* ``MessagePackRenderer`` (``application/msgpack``) needs ``msgpack``; it is
+  only enabled in settings when the package is importable.
+
+Both packages are in ``requirements.txt``; without them the API still works,
+it just serves plain DRF JSON.
+* ``ColumnarJSONRenderer`` (``application/vnd.columnar+json``) turns a list of
+  objects into ``{"count": n, "fields": {name: [values, ...]}}`` so each key
+  is sent once per response instead of once per row.
+"""
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+_encoder = JSONEncoder()
+
+
+def _default(value):
+    # Lazy translations, Decimals, querysets and the like, exactly as DRF encodes them.
+    return _encoder.default(value)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type or "", renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        content = orjson.dumps(data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        # Match DRF, which escapes these for embedding in <script> tags.
+        return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+def columns(data):
+    """Fields-as-arrays form of a list of dicts (or of a paginated ``results`` list)."""
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        return {**data, "results": columns(data["results"])}
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        return data
+    names = list(data[0]) if data else []
+    return {"count": len(data), "fields": {name: [row.get(name) for row in data] for name in names}}
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    media_type = "application/vnd.columnar+json"
+    format = "columnar"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if response is not None and response.exception:
+            return super().render(data, accepted_media_type, renderer_context)
+        return super().render(columns(data), accepted_media_type, renderer_context)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_default, datetime=False)
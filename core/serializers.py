@@ -0,0 +1,22 @@
+from rest_framework.permissions import SAFE_METHODS
+
+
+class SparseFieldsetMixin:
+    """
+    Limit output to the comma-separated names in ``?fields=`` on read
+    requests. Dropped ``SerializerMethodField``s are never evaluated.
+    """
+
+    fields_param = "fields"
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+        wanted = request.query_params.get(self.fields_param)
+        if not wanted:
+            return fields
+        names = {name.strip() for name in wanted.split(",")}
+        selected = {name: field for name, field in fields.items() if name in names}
+        return selected or fields
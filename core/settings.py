@@ -2,6 +2,7 @@
 Django settings for core project.
 """
 
+import importlib.util
 import os
 from datetime import timedelta
 from pathlib import Path
@@ -27,10 +28,15 @@ INSTALLED_APPS = [
     "rest_framework",
     "accounts",
     "storage",
+    "tasks",
+    "notifications",
+    "benchmarks",
     "corsheaders",
 ]
 
 MIDDLEWARE = [
+    "core.instrumentation.QueryInstrumentationMiddleware",
+    "core.compression.CompressionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -39,8 +45,12 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.db.middleware.ReplicaPinMiddleware",
 ]
 
+# Fraction of requests that record query counts, DB and serializer time (0 disables).
+PERF_SAMPLE_RATE = float(os.getenv("PERF_SAMPLE_RATE", "0"))
+
 ROOT_URLCONF = "core.urls"
 
 TEMPLATES = [
@@ -60,32 +70,175 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "core.wsgi.application"
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "0"))
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.mysql",
+        # A pool size > 0 switches to the pooled mysqlclient backend.
+        "ENGINE": "core.db.backends.mysql_pool" if DB_POOL_SIZE else "django.db.backends.mysql",
         "NAME": os.getenv("DB_NAME", "fileplatform"),
         "USER": os.getenv("DB_USER", "eduuser"),
         "PASSWORD": os.getenv("DB_PASSWORD", ""),
         "HOST": os.getenv("DB_HOST", "127.0.0.1"),
         "PORT": os.getenv("DB_PORT", "3306"),
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() == "true",
+        "POOL": {
+            "SIZE": DB_POOL_SIZE,
+            "RECYCLE": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            "PING_AFTER": int(os.getenv("DB_POOL_PING_AFTER", "30")),
+        },
     }
 }
-#
+
+# Local runs (e.g. the benchmark suite) can use SQLite: DB_ENGINE=sqlite DB_NAME=bench.sqlite3
+if os.getenv("DB_ENGINE", "mysql").lower() == "sqlite":
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / os.getenv("DB_NAME", "db.sqlite3"),
+    }
+
+# Read replicas share the primary's credentials; only the host differs.
+replica_hosts = os.getenv("DB_REPLICA_HOSTS", "")
+DATABASE_REPLICAS = []
+for index, host in enumerate(h.strip() for h in replica_hosts.split(",") if h.strip()):
+    alias = f"replica{index + 1}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["core.db.routers.PrimaryReplicaRouter"] if DATABASE_REPLICAS else []
+# Read-your-writes: after a write, that user's reads stay on the primary this long.
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "5"))
+
+# Use a shared backend (e.g. Redis) in production so per-user state such as
+# replica pinning is visible to every worker.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+# Per-process backends cannot see (or drop) entries written by other workers.
+CACHE_IS_SHARED = not CACHES["default"]["BACKEND"].endswith(("LocMemCache", "DummyCache"))
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.StatelessJWTAuthentication",
     ),
+    "DEFAULT_THROTTLE_CLASSES": (
+        "core.throttling.TokenBucketThrottle",
+    ),
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.FastJSONRenderer",
+        "core.renderers.ColumnarJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    # Reverse proxies in front of the app that append to X-Forwarded-For. The
+    # client IP is taken that many entries from the end; with 0 it is
+    # REMOTE_ADDR, since anything else in the header is client-supplied.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "0")),
+}
+if importlib.util.find_spec("msgpack"):
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].insert(2, "core.renderers.MessagePackRenderer")
+
+# Token buckets per endpoint class ("burst/period", refilled over the period);
+# "ip" is a per-client-IP budget shared by every endpoint.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "core.throttling.LocalBucketStore")
+RATE_LIMITS = {
+    "ip": os.getenv("RATE_LIMIT_IP", "600/min"),
+    "read": os.getenv("RATE_LIMIT_READ", "300/min"),
+    "write": os.getenv("RATE_LIMIT_WRITE", "60/min"),
+    "feed": os.getenv("RATE_LIMIT_FEED", "60/min"),
+    "search": os.getenv("RATE_LIMIT_SEARCH", "30/min"),
+    "like": os.getenv("RATE_LIMIT_LIKE", "30/min"),
+    "follow": os.getenv("RATE_LIMIT_FOLLOW", "30/min"),
+    "message": os.getenv("RATE_LIMIT_MESSAGE", "30/min"),
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=int(os.getenv("JWT_ACCESS_DAYS", "1"))),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=int(os.getenv("JWT_REFRESH_DAYS", "7"))),
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.ClaimsTokenRefreshSerializer",
 }
+# How long a worker trusts its cached token_version/is_active for a user.
+JWT_REVOCATION_CACHE_SECONDS = int(os.getenv("JWT_REVOCATION_CACHE_SECONDS", "30"))
+
+# Set when the WSGI server imports the app once before forking workers
+# (e.g. ``gunicorn --preload core.wsgi``); see core.prefork.
+WSGI_PRELOAD = os.getenv("WSGI_PRELOAD", "False").lower() == "true"
+
+# Cached following/follower id sets (see accounts.follow_graph); only on by
+# default with a shared cache, 0 disables. Sets larger than
+# FOLLOW_GRAPH_MAX_CACHED are always answered from the database.
+FOLLOW_GRAPH_CACHE_SECONDS = int(os.getenv("FOLLOW_GRAPH_CACHE_SECONDS", "600" if CACHE_IS_SHARED else "0"))
+FOLLOW_GRAPH_MAX_CACHED = int(os.getenv("FOLLOW_GRAPH_MAX_CACHED", "5000"))
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+AUTHENTICATION_BACKENDS = [
+    "accounts.backends.EmailBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
+# Responses smaller than this are sent uncompressed; compressed bodies of
+# ETag-carrying responses are cached (see core.compression).
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_CACHE_SECONDS = int(os.getenv("COMPRESSION_CACHE_SECONDS", "300"))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(1024 * 1024)))
+
+# Deferred side effects run in-process after the request's transaction commits.
+# Set TASKS_EAGER=False to queue them in the task table instead; that needs a
+# ``manage.py run_tasks`` process, or profiles, views and notifications never land.
+TASKS_EAGER = os.getenv("TASKS_EAGER", "True").lower() == "true"
+TASKS_RETRY_DELAY = int(os.getenv("TASKS_RETRY_DELAY", "10"))
+TASKS_LOCK_TIMEOUT = int(os.getenv("TASKS_LOCK_TIMEOUT", "600"))
+TASKS_RETENTION_DAYS = int(os.getenv("TASKS_RETENTION_DAYS", "7"))
+
+# Lifetime of anonymous responses that carry an ETag (see core.conditional).
+CONDITIONAL_MAX_AGE = int(os.getenv("CONDITIONAL_MAX_AGE", "30"))
+# Folder views are not versioned; listings showing view counts refresh their ETag this often.
+CONDITIONAL_VIEW_COUNT_SECONDS = int(os.getenv("CONDITIONAL_VIEW_COUNT_SECONDS", "60"))
+
+# Direct and folder messages older than this move to the archive tables
+# when ``manage.py archive_messages`` runs.
+MESSAGE_ARCHIVE_AFTER_DAYS = int(os.getenv("MESSAGE_ARCHIVE_AFTER_DAYS", "90"))
+
+# Hourly and daily folder activity buckets kept for trending; older ones are
+# dropped by ``manage.py rebuild_folder_activity --prune``.
+ACTIVITY_HOURLY_RETENTION_HOURS = int(os.getenv("ACTIVITY_HOURLY_RETENTION_HOURS", "48"))
+ACTIVITY_DAILY_RETENTION_DAYS = int(os.getenv("ACTIVITY_DAILY_RETENTION_DAYS", "30"))
+
+# Folder views and file downloads are buffered per process and written in
+# batches of ACCESS_LOG_BATCH_SIZE, or after ACCESS_LOG_FLUSH_SECONDS (0 writes
+# each event straight away). Raw events older than ACCESS_LOG_RETENTION_DAYS
+# are dropped by ``manage.py rollup_folder_stats --prune`` once rolled up.
+ACCESS_LOG_BATCH_SIZE = int(os.getenv("ACCESS_LOG_BATCH_SIZE", "200"))
+ACCESS_LOG_FLUSH_SECONDS = float(os.getenv("ACCESS_LOG_FLUSH_SECONDS", "5"))
+ACCESS_LOG_RETENTION_DAYS = int(os.getenv("ACCESS_LOG_RETENTION_DAYS", "14"))
+
+# Neighbours kept per folder and recommendations kept per user by
+# ``manage.py refresh_recommendations``.
+RECOMMENDATIONS_TOP_K = int(os.getenv("RECOMMENDATIONS_TOP_K", "20"))
+
+# Bulk folder-tree imports (see storage.importer) are rejected before anything
+# is stored when their files add up to more than this, or when an archive
+# member expands more than IMPORT_MAX_COMPRESSION_RATIO times.
+IMPORT_MAX_TOTAL_BYTES = int(os.getenv("IMPORT_MAX_TOTAL_BYTES", str(1024 * 1024 * 1024)))
+IMPORT_MAX_COMPRESSION_RATIO = int(os.getenv("IMPORT_MAX_COMPRESSION_RATIO", "100"))
+
+# Checked before any password hashing on the token endpoint.
+LOGIN_THROTTLE = {
+    "WINDOW": int(os.getenv("LOGIN_THROTTLE_WINDOW", "300")),
+    "IP_ATTEMPTS": int(os.getenv("LOGIN_THROTTLE_IP_ATTEMPTS", "30")),
+    "ACCOUNT_FAILURES": int(os.getenv("LOGIN_THROTTLE_ACCOUNT_FAILURES", "5")),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
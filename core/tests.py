@@ -0,0 +1,202 @@
+import importlib.util
+import os
+import subprocess
+import sys
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from core.instrumentation import collector, fingerprint
+from core.db.routers import PrimaryReplicaRouter, ReplicaReadMixin, is_pinned_to_primary, pin_to_primary
+from storage.models import Folder
+
+User = get_user_model()
+
+HAS_MYSQLCLIENT = importlib.util.find_spec("MySQLdb") is not None
+
+
+class FakeConnection:
+    def __init__(self, name):
+        self.name = name
+        self.autocommit = True
+        self.closed = self.rolled_back = False
+        self.pings = 0
+
+    def get_autocommit(self):
+        return self.autocommit
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def ping(self):
+        self.pings += 1
+
+    def close(self):
+        self.closed = True
+
+
+@skipUnless(HAS_MYSQLCLIENT, "the pooled backend subclasses the mysqlclient backend")
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        from core.db.backends.mysql_pool.base import ConnectionPool
+
+        self.pool = ConnectionPool(size=2, recycle=1800, ping_after=30)
+        self.opened = []
+
+    def connect(self):
+        conn = FakeConnection(len(self.opened))
+        self.opened.append(conn)
+        return conn
+
+    def test_released_connection_is_checked_out_again(self):
+        conn, created_at = self.pool.acquire(self.connect)
+        self.pool.release(conn, created_at)
+
+        again, _ = self.pool.acquire(self.connect)
+        self.assertIs(again, conn)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_open_transaction_is_rolled_back_on_return(self):
+        conn, created_at = self.pool.acquire(self.connect)
+        conn.autocommit = False
+        self.pool.release(conn, created_at)
+        self.assertTrue(conn.rolled_back)
+
+    def test_full_pool_closes_extra_connections(self):
+        checked_out = [self.pool.acquire(self.connect) for _ in range(3)]
+        for conn, created_at in checked_out:
+            self.pool.release(conn, created_at)
+        self.assertEqual([conn.closed for conn, _ in checked_out], [False, False, True])
+
+    def test_old_connections_are_recycled_and_idle_ones_pinged(self):
+        with mock.patch("core.db.backends.mysql_pool.base.time.monotonic", return_value=0):
+            conn, created_at = self.pool.acquire(self.connect)
+            self.pool.release(conn, created_at)
+        with mock.patch("core.db.backends.mysql_pool.base.time.monotonic", return_value=60):
+            again, _ = self.pool.acquire(self.connect)
+        self.assertIs(again, conn)
+        self.assertEqual(conn.pings, 1)
+        self.pool.release(again, created_at)
+
+        with mock.patch("core.db.backends.mysql_pool.base.time.monotonic", return_value=3600):
+            fresh, _ = self.pool.acquire(self.connect)
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(conn.closed)
+
+    def test_connections_are_not_returned_across_fork(self):
+        conn, created_at = self.pool.acquire(self.connect)
+        self.pool.pid -= 1
+        self.pool.release(conn, created_at)
+        self.assertIsNot(self.pool.acquire(self.connect)[0], conn)
+
+
+class RoutedView(ReplicaReadMixin, APIView):
+    replica_actions = ("get",)
+
+    def get(self, request):
+        return Response(PrimaryReplicaRouter().db_for_read(Folder))
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], DATABASE_REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def read_alias(self):
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, self.user)
+        return RoutedView.as_view()(request).data
+
+    def test_reads_go_to_replica_only_inside_the_view(self):
+        self.assertEqual(self.read_alias(), "replica1")
+        self.assertIsNone(PrimaryReplicaRouter().db_for_read(Folder))
+        self.assertEqual(PrimaryReplicaRouter().db_for_write(Folder), "default")
+
+    def test_write_pins_user_to_primary_until_it_expires(self):
+        with mock.patch("time.time", return_value=1000):
+            self.assertEqual(self.client.post("/api/folders/", {"name": "docs"}).status_code, 201)
+            self.assertTrue(is_pinned_to_primary(self.user.id))
+            self.assertIsNone(self.read_alias())
+
+        with mock.patch("time.time", return_value=1006):
+            self.assertFalse(is_pinned_to_primary(self.user.id))
+            self.assertEqual(self.read_alias(), "replica1")
+
+    def test_reads_and_failed_writes_do_not_pin(self):
+        self.client.get("/api/folders/")
+        self.client.post("/api/folders/", {})
+        self.assertFalse(is_pinned_to_primary(self.user.id))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_no_pin(self):
+        self.client.post("/api/folders/", {"name": "docs"})
+        self.assertFalse(is_pinned_to_primary(self.user.id))
+        pin_to_primary(self.user.id)
+        self.assertIsNone(self.read_alias())
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        collector.reset()
+        self.admin = User.objects.create_superuser(username="root", email="root@example.com", password="x")
+        Folder.objects.create(name="docs", owner=self.admin)
+        self.client = APIClient()
+
+    def test_fingerprint_folds_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE a = 5 AND b = 'x' AND c IN (%s, %s, %s)"),
+            "SELECT * FROM t WHERE a = ? AND b = ? AND c IN (...)",
+        )
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        response = self.client.get("/api/folders/")
+        self.assertFalse(response.has_header("Server-Timing"))
+        self.assertEqual(collector.snapshot(), {})
+
+    @override_settings(PERF_SAMPLE_RATE=1)
+    def test_sampled_requests_feed_perf_stats(self):
+        response = self.client.get("/api/folders/")
+        self.assertIn("queries", response["Server-Timing"])
+
+        self.client.force_authenticate(self.admin)
+        stats = self.client.get("/api/admin/perf-stats/").json()
+        endpoint = stats["GET folders-list"]
+        self.assertEqual(endpoint["requests"], 1)
+        self.assertGreater(endpoint["avg_queries"], 0)
+        self.assertGreater(endpoint["avg_response_bytes"], 0)
+
+        self.assertEqual(self.client.delete("/api/admin/perf-stats/").status_code, 204)
+        self.assertEqual(list(collector.snapshot()), ["DELETE perf-stats"])
+
+    def test_perf_stats_is_admin_only(self):
+        user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get("/api/admin/perf-stats/").status_code, 403)
+
+
+PRELOAD_CHECK = """
+import gc, sys
+import core.wsgi
+assert "storage.views" in sys.modules and "accounts.views" in sys.modules
+assert gc.get_freeze_count() > 0
+"""
+
+
+class PreforkTests(SimpleTestCase):
+    def test_wsgi_preload_imports_the_app_and_freezes_the_heap(self):
+        # A process of its own: freezing is global, and core.wsgi may be imported here already.
+        env = {**os.environ, "WSGI_PRELOAD": "True", "DJANGO_SETTINGS_MODULE": "core.settings"}
+        process = subprocess.run(
+            [sys.executable, "-c", PRELOAD_CHECK], capture_output=True, text=True, env=env, cwd=settings.BASE_DIR
+        )
+        self.assertEqual(process.returncode, 0, process.stderr[-2000:])
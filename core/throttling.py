@@ -0,0 +1,154 @@
+"""
+Token-bucket rate limiting for the API.
+
+Every request spends one token from each of up to two buckets, and only
+when both have one to spare:
+
+* the bucket of its endpoint class (scope) for the caller, keyed by user id
+  when authenticated and by client IP otherwise;
+* a per-IP bucket shared by all endpoints (the ``"ip"`` scope).
+
+The client IP comes from ``client_ip``, which only trusts as many
+X-Forwarded-For entries as ``REST_FRAMEWORK["NUM_PROXIES"]`` says our own
+proxies append, so a client cannot pick its bucket by sending the header.
+
+Scopes and their rates live in ``settings.RATE_LIMITS`` (``"30/min"`` means a
+burst of 30 that refills at 30 tokens per minute). Views pick a scope per
+action or handler through ``rate_limit_scopes``; anything unlisted falls
+back to ``"read"`` or ``"write"`` by HTTP method; async views pass theirs to
+``core.async_api.async_api_view``. Buckets are kept in the store named by
+``settings.RATE_LIMIT_STORE``: ``LocalBucketStore`` is per-process,
+``CacheBucketStore`` shares buckets through the default cache.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "sec": 1, "m": 60, "min": 60, "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+
+
+def client_ip(request):
+    """Address of the client, ignoring X-Forwarded-For entries our proxies did not add."""
+    return BaseThrottle().get_ident(request)
+
+
+def parse_rate(rate):
+    """Return ``(capacity, tokens per second)`` for a rate such as ``"30/min"``."""
+    count, period = rate.split("/")
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period]
+
+
+def refill(tokens, updated, now, capacity, per_second):
+    """Tokens in a bucket at ``now``."""
+    return min(capacity, tokens + (now - updated) * per_second)
+
+
+def wait_for(tokens, per_second):
+    """Seconds until a bucket holding ``tokens`` has one to spend."""
+    return 0 if tokens >= 1 else (1 - tokens) / per_second
+
+
+def spend(states, buckets, now):
+    """
+    Refill every bucket and take a token from each only when all of them have
+    one, so a request denied by one bucket costs nothing in the others.
+    ``states`` maps keys to ``(tokens, updated)``; returns ``(states, wait)``.
+    """
+    tokens = {
+        key: refill(*states.get(key, (capacity, now)), now, capacity, per_second)
+        for key, capacity, per_second in buckets
+    }
+    wait = max(wait_for(tokens[key], per_second) for key, _, per_second in buckets)
+    if not wait:
+        tokens = {key: value - 1 for key, value in tokens.items()}
+    return {key: (value, now) for key, value in tokens.items()}, wait
+
+
+class LocalBucketStore:
+    max_buckets = 50000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def consume(self, buckets):
+        """Spend a token from every ``(key, capacity, per_second)`` bucket, or none; returns the wait."""
+        now = time.monotonic()
+        with self._lock:
+            states, wait = spend(self._buckets, buckets, now)
+            for key, state in states.items():
+                self._buckets[key] = state
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_buckets:
+                # The least recently used bucket has been refilling the longest.
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class CacheBucketStore:
+    """Shares buckets between workers; concurrent updates may let a few extra requests through."""
+
+    def consume(self, buckets):
+        now = time.time()
+        states, wait = spend(cache.get_many([key for key, _, _ in buckets]), buckets, now)
+        timeout = max(int(capacity / per_second) + 1 for _, capacity, per_second in buckets)
+        cache.set_many(states, timeout=timeout)
+        return wait
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = import_string(settings.RATE_LIMIT_STORE)()
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        return self.allow(request, self.get_scope(request, view))
+
+    def allow(self, request, scope):
+        """Spend a token for ``scope`` and the client IP, or none; also used by ``core.async_api``."""
+        self.wait_seconds = 0
+        if not settings.RATE_LIMIT_ENABLED:
+            return True
+
+        ip = client_ip(request)
+        user = request.user
+        ident = f"user:{user.id}" if user and user.is_authenticated else f"ip:{ip}"
+
+        buckets = [
+            (key, *parse_rate(settings.RATE_LIMITS[bucket_scope]))
+            for bucket_scope, key in ((scope, f"rl:{scope}:{ident}"), ("ip", f"rl:ip:{ip}"))
+            if settings.RATE_LIMITS.get(bucket_scope)
+        ]
+        if buckets:
+            self.wait_seconds = get_store().consume(buckets)
+        return self.wait_seconds == 0
+
+    def get_scope(self, request, view):
+        action = getattr(view, "action", None) or request.method.lower()
+        scopes = getattr(view, "rate_limit_scopes", {})
+        if action in scopes:
+            return scopes[action]
+        return default_scope(request)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def default_scope(request):
+    return "read" if request.method in SAFE_METHODS else "write"
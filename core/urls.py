@@ -3,12 +3,14 @@ from django.urls import path, include
 from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
-from accounts.views import EmailTokenObtainPairView
+from accounts.views import EmailTokenObtainPairView, avatar_file
+from core.views import PerfStatsView
 from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/admin/perf-stats/', PerfStatsView.as_view(), name='perf-stats'),
 
     # Auth (JWT)
     path('api/token/', EmailTokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -17,8 +19,14 @@ urlpatterns = [
     # Accounts
     path('api/accounts/', include('accounts.urls')),
 
+    # Notifications
+    path('api/notifications/', include('notifications.urls')),
+
     # Storage
     path('api/', include('storage.urls')),
+
+    # Content-hashed avatars, served with immutable caching headers
+    path(f'{settings.MEDIA_URL.lstrip("/")}avatars/<str:name>', avatar_file, name='avatar-file'),
 ]
 
 # Media files (development only)
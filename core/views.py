@@ -0,0 +1,16 @@
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .instrumentation import collector
+
+
+class PerfStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(collector.snapshot())
+
+    def delete(self, request):
+        collector.reset()
+        return Response(status=204)
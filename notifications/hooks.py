@@ -0,0 +1,49 @@
+"""Entry points the views call when something worth notifying happens."""
+
+from .models import Notification
+from .tasks import deliver
+
+
+def _notify(verb, actor_id, recipient_ids, target_id=None, target_name="", idempotency_key=None):
+    recipient_ids = [pk for pk in recipient_ids if pk and pk != actor_id]
+    if recipient_ids:
+        deliver.enqueue(
+            verb, actor_id, recipient_ids, target_id, target_name, idempotency_key=idempotency_key
+        )
+
+
+def folder_liked(folder, user_id):
+    # Keyed per user and folder, so like/unlike/like only runs once; ``deliver``
+    # also counts each liker once, for when the finished task has been purged.
+    _notify(
+        Notification.LIKE,
+        user_id,
+        [folder.owner_id],
+        folder.id,
+        folder.name,
+        idempotency_key=f"notify:like:{folder.id}:{user_id}",
+    )
+
+
+def user_followed(follower_id, followed_id):
+    _notify(
+        Notification.FOLLOW,
+        follower_id,
+        [followed_id],
+        idempotency_key=f"notify:follow:{follower_id}:{followed_id}",
+    )
+
+
+def folder_commented(comment):
+    folder = comment.folder
+    _notify(Notification.FOLDER_COMMENT, comment.owner_id, [folder.owner_id], folder.id, folder.name)
+
+
+def file_commented(comment):
+    file_obj = comment.file
+    _notify(Notification.FILE_COMMENT, comment.owner_id, [file_obj.owner_id], file_obj.id, file_obj.name)
+
+
+def message_sent(message):
+    # Aggregated per sender: "3 new messages from ..." rather than one row each.
+    _notify(Notification.MESSAGE, message.sender_id, [message.receiver_id], message.sender_id)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verb', models.CharField(choices=[('like', 'Liked your folder'), ('follow', 'Followed you'), ('folder_comment', 'Commented on your folder'), ('file_comment', 'Commented on your file'), ('message', 'Sent you a message')], max_length=20)),
+                ('actor_count', models.PositiveIntegerField(default=1)),
+                ('target_id', models.BigIntegerField(blank=True, null=True)),
+                ('target_name', models.CharField(blank=True, max_length=255)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('actor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recipient', 'is_read', 'updated_at'], name='notificatio_recipie_350dba_idx'), models.Index(fields=['recipient', 'verb', 'target_id', 'is_read'], name='notificatio_recipie_e4eca3_idx')],
+            },
+        ),
+    ]
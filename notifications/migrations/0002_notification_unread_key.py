@@ -0,0 +1,35 @@
+# Generated by Django 5.2.11 on 2026-10-19 12:45
+
+from django.db import migrations, models
+
+
+def fill_unread_keys(apps, schema_editor):
+    # Fold unread duplicates left by concurrent deliveries into the newest row.
+    Notification = apps.get_model("notifications", "Notification")
+    kept = {}
+    for row in Notification.objects.filter(is_read=False).order_by("-updated_at", "-id").iterator():
+        key = f"{row.recipient_id}:{row.verb}:{'' if row.target_id is None else row.target_id}"
+        if key in kept:
+            kept[key].actor_count += row.actor_count
+            row.delete()
+        else:
+            kept[key] = row
+    for key, row in kept.items():
+        # update() leaves updated_at, and with it the notification order, alone.
+        Notification.objects.filter(pk=row.pk).update(unread_key=key, actor_count=row.actor_count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='unread_key',
+            field=models.CharField(editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(fill_unread_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.11 on 2026-10-19 13:14
+
+from django.db import migrations, models
+
+
+def fill_actor_ids(apps, schema_editor):
+    # Only the latest actor of an unread like or follow is known, so earlier
+    # ones may still be counted a second time.
+    Notification = apps.get_model("notifications", "Notification")
+    rows = Notification.objects.filter(is_read=False, verb__in=["like", "follow"], actor__isnull=False)
+    for row in rows.only("id", "actor_id").iterator():
+        Notification.objects.filter(pk=row.pk).update(actor_ids=[row.actor_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notification_unread_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='actor_ids',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(fill_actor_ids, migrations.RunPython.noop),
+    ]
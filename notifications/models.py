@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db import models
+
+User = settings.AUTH_USER_MODEL
+
+
+class Notification(models.Model):
+    """
+    One row per recipient, verb and target while unread: repeated events
+    raise ``actor_count`` and replace ``actor`` with the latest one.
+    ``unread_key`` enforces that in the database; it is cleared once the
+    row is read, so read rows never collide. For ``PER_ACTOR_VERBS`` the
+    count is people, so ``actor_ids`` remembers who is already counted.
+    """
+
+    LIKE = "like"
+    FOLLOW = "follow"
+    FOLDER_COMMENT = "folder_comment"
+    FILE_COMMENT = "file_comment"
+    MESSAGE = "message"
+    VERB_CHOICES = (
+        (LIKE, "Liked your folder"),
+        (FOLLOW, "Followed you"),
+        (FOLDER_COMMENT, "Commented on your folder"),
+        (FILE_COMMENT, "Commented on your file"),
+        (MESSAGE, "Sent you a message"),
+    )
+    PER_ACTOR_VERBS = {LIKE, FOLLOW}
+
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
+    verb = models.CharField(max_length=20, choices=VERB_CHOICES)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="+")
+    actor_count = models.PositiveIntegerField(default=1)
+    actor_ids = models.JSONField(default=list, blank=True, editable=False)
+    target_id = models.BigIntegerField(null=True, blank=True)
+    target_name = models.CharField(max_length=255, blank=True)
+    is_read = models.BooleanField(default=False)
+    unread_key = models.CharField(max_length=64, null=True, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["recipient", "is_read", "updated_at"]),
+            models.Index(fields=["recipient", "verb", "target_id", "is_read"]),
+        ]
+
+    @staticmethod
+    def make_unread_key(recipient_id, verb, target_id):
+        return f"{recipient_id}:{verb}:{'' if target_id is None else target_id}"
+
+    def save(self, *args, **kwargs):
+        self.unread_key = None if self.is_read else self.make_unread_key(self.recipient_id, self.verb, self.target_id)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "unread_key"}
+        super().save(*args, **kwargs)
@@ -0,0 +1,64 @@
+from rest_framework import serializers
+
+from accounts.avatars import avatar_url
+from core.instrumentation import InstrumentedSerializerMixin
+
+from .models import Notification
+
+PHRASES = {
+    Notification.LIKE: "liked your folder",
+    Notification.FOLLOW: "started following you",
+    Notification.FOLDER_COMMENT: "commented on your folder",
+    Notification.FILE_COMMENT: "commented on your file",
+    Notification.MESSAGE: "sent you a message",
+}
+
+# Likes and follows are delivered once per actor, so their count is people;
+# comments and messages can repeat, so theirs is events.
+BURST_PHRASES = {
+    Notification.FOLDER_COMMENT: "new comments on your folder",
+    Notification.FILE_COMMENT: "new comments on your file",
+    Notification.MESSAGE: "new messages, latest from",
+}
+
+
+class NotificationSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
+    actor_username = serializers.CharField(source="actor.username", read_only=True, default=None)
+    actor_avatar_url = serializers.SerializerMethodField()
+    text = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Notification
+        fields = [
+            "id",
+            "verb",
+            "actor",
+            "actor_username",
+            "actor_avatar_url",
+            "actor_count",
+            "target_id",
+            "target_name",
+            "text",
+            "is_read",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+    def get_actor_avatar_url(self, obj):
+        if obj.actor is None:
+            return None
+        return avatar_url(obj.actor, "small", self.context.get("request"))
+
+    def get_text(self, obj):
+        who = obj.actor.username if obj.actor else "Someone"
+        if obj.actor_count == 1:
+            text = f"{who} {PHRASES[obj.verb]}"
+        elif obj.verb in BURST_PHRASES:
+            text = f"{obj.actor_count} {BURST_PHRASES[obj.verb]}"
+            if obj.verb == Notification.MESSAGE:
+                return f"{text} {who}"
+        else:
+            others = obj.actor_count - 1
+            text = f"{who} and {others} {'other' if others == 1 else 'others'} {PHRASES[obj.verb]}"
+        return f"{text} {obj.target_name}" if obj.target_name else text
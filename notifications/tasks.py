@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from tasks.queue import task
+
+from .models import Notification
+
+User = get_user_model()
+
+FANOUT_BATCH_SIZE = 500
+
+
+@task(priority=-1)
+def deliver(verb, actor_id, recipient_ids, target_id=None, target_name=""):
+    """Fold the event into each recipient's unread notification, in batches."""
+    recipient_ids = sorted({pk for pk in recipient_ids if pk != actor_id})
+    for start in range(0, len(recipient_ids), FANOUT_BATCH_SIZE):
+        batch = recipient_ids[start : start + FANOUT_BATCH_SIZE]
+        with transaction.atomic():
+            # Locking the recipients (in id order, so deliveries cannot deadlock)
+            # serializes concurrent deliveries to the same person; row locks on
+            # notifications alone would miss rows that do not exist yet.
+            list(User.objects.select_for_update().filter(pk__in=batch).order_by("pk").values_list("pk"))
+            unread = Notification.objects.filter(
+                recipient_id__in=batch, verb=verb, target_id=target_id, is_read=False
+            )
+            if verb in Notification.PER_ACTOR_VERBS:
+                existing = _count_new_actor(unread, actor_id, target_name)
+            else:
+                existing = set(unread.values_list("recipient_id", flat=True))
+                unread.update(
+                    actor_id=actor_id,
+                    actor_count=F("actor_count") + 1,
+                    target_name=target_name,
+                    updated_at=timezone.now(),
+                )
+            # bulk_create skips save(), so the unread key is set here; the unique
+            # key drops anything a writer outside this lock created meanwhile.
+            Notification.objects.bulk_create(
+                (
+                    Notification(
+                        recipient_id=recipient_id,
+                        verb=verb,
+                        actor_id=actor_id,
+                        actor_ids=[actor_id] if verb in Notification.PER_ACTOR_VERBS else [],
+                        target_id=target_id,
+                        target_name=target_name,
+                        unread_key=Notification.make_unread_key(recipient_id, verb, target_id),
+                    )
+                    for recipient_id in batch
+                    if recipient_id not in existing
+                ),
+                ignore_conflicts=True,
+            )
+
+
+def _count_new_actor(unread, actor_id, target_name):
+    """
+    Add ``actor_id`` to the unread rows that have not counted them yet, so
+    like, unlike, like still reads as one person; returns the recipients
+    that already have an unread row.
+    """
+    rows = list(unread.only("id", "recipient_id", "actor_count", "actor_ids"))
+    now = timezone.now()
+    changed = []
+    for row in rows:
+        if actor_id in row.actor_ids:
+            continue
+        row.actor_id = actor_id
+        row.actor_ids = [*row.actor_ids, actor_id]
+        row.actor_count += 1
+        row.target_name = target_name
+        row.updated_at = now
+        changed.append(row)
+    Notification.objects.bulk_update(changed, ["actor", "actor_ids", "actor_count", "target_name", "updated_at"])
+    return {row.recipient_id for row in rows}
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from storage.models import Folder
+from tasks.models import Task
+
+from .models import Notification
+from .tasks import deliver
+
+User = get_user_model()
+
+
+class DeliverTests(TestCase):
+    def setUp(self):
+        self.owner, self.alice, self.bob = (
+            User.objects.create_user(username=name, email=f"{name}@example.com", password="x")
+            for name in ("owner", "alice", "bob")
+        )
+
+    def test_repeated_events_fold_into_one_unread_row(self):
+        deliver(Notification.LIKE, self.alice.id, [self.owner.id], 7, "docs")
+        deliver(Notification.LIKE, self.bob.id, [self.owner.id], 7, "docs")
+        deliver(Notification.LIKE, self.bob.id, [self.owner.id], 8, "other")
+
+        row = Notification.objects.get(recipient=self.owner, target_id=7)
+        self.assertEqual((row.actor_id, row.actor_count, row.is_read), (self.bob.id, 2, False))
+        self.assertEqual(Notification.objects.filter(recipient=self.owner).count(), 2)
+
+    def test_likes_and_follows_count_each_actor_once(self):
+        for actor in (self.alice, self.bob, self.alice):
+            deliver(Notification.LIKE, actor.id, [self.owner.id], 7, "docs")
+            deliver(Notification.FOLLOW, actor.id, [self.owner.id])
+        self.assertEqual(
+            sorted(Notification.objects.values_list("verb", "actor_id", "actor_count")),
+            [(Notification.FOLLOW, self.bob.id, 2), (Notification.LIKE, self.bob.id, 2)],
+        )
+
+    def test_like_unlike_like_notifies_once(self):
+        folder = Folder.objects.create(name="docs", owner=self.owner)
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                client.post(f"/api/folders/{folder.id}/like/")
+            # Finished tasks, and with them their idempotency keys, get purged.
+            Task.objects.all().delete()
+        row = Notification.objects.get(recipient=self.owner)
+        self.assertEqual((row.actor_id, row.actor_count), (self.alice.id, 1))
+
+    def test_actor_is_never_notified(self):
+        deliver(Notification.FOLLOW, self.alice.id, [self.alice.id, self.owner.id, self.owner.id])
+        self.assertEqual(list(Notification.objects.values_list("recipient_id", "actor_count")), [(self.owner.id, 1)])
+
+    def test_unread_rows_are_unique(self):
+        deliver(Notification.FOLLOW, self.alice.id, [self.owner.id])
+        with self.assertRaises(IntegrityError):
+            Notification.objects.create(recipient=self.owner, verb=Notification.FOLLOW, actor=self.bob)
+
+    def test_reading_starts_a_new_row(self):
+        deliver(Notification.FOLLOW, self.alice.id, [self.owner.id])
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.post("/api/notifications/read/", {}, format="json")
+        self.assertEqual(response.data, {"marked": 1, "unread_count": 0})
+
+        deliver(Notification.FOLLOW, self.bob.id, [self.owner.id])
+        response = client.get("/api/notifications/")
+        self.assertEqual(response.data["unread_count"], 1)
+        self.assertEqual([row["is_read"] for row in response.data["results"]], [False, True])
+
+    def test_fans_out_to_every_recipient(self):
+        recipients = [self.owner.id, self.bob.id]
+        deliver(Notification.FOLDER_COMMENT, self.alice.id, recipients, 3, "docs")
+        deliver(Notification.FOLDER_COMMENT, self.alice.id, recipients, 3, "docs")
+        self.assertEqual(
+            sorted(Notification.objects.values_list("recipient_id", "actor_count")),
+            [(self.owner.id, 2), (self.bob.id, 2)],
+        )
@@ -0,0 +1,59 @@
+from rest_framework import generics
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import Notification
+from .serializers import NotificationSerializer
+
+
+class NotificationPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["unread_count"] = self.unread_count
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"]["unread_count"] = {"type": "integer"}
+        return schema
+
+
+class NotificationListView(generics.ListAPIView):
+    serializer_class = NotificationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = NotificationPagination
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(recipient_id=self.request.user.id).select_related("actor")
+        if self.request.query_params.get("unread") in ("1", "true"):
+            queryset = queryset.filter(is_read=False)
+        return queryset.order_by("-updated_at", "-id")
+
+    def list(self, request, *args, **kwargs):
+        self.paginator.unread_count = Notification.objects.filter(
+            recipient_id=request.user.id, is_read=False
+        ).count()
+        return super().list(request, *args, **kwargs)
+
+
+class NotificationReadView(APIView):
+    """Mark the given ``ids`` read, or every notification when none are given."""
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        unread = Notification.objects.filter(recipient_id=request.user.id, is_read=False)
+        ids = request.data.get("ids")
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                return Response({"error": "'ids' must be a list of notification ids."}, status=400)
+            unread = unread.filter(id__in=ids)
+        marked = unread.update(is_read=True, unread_key=None)
+        remaining = Notification.objects.filter(recipient_id=request.user.id, is_read=False).count()
+        return Response({"marked": marked, "unread_count": remaining})
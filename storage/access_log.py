@@ -0,0 +1,160 @@
+"""
+Append-only folder access log and its daily rollup.
+
+Every folder view and file download becomes an ``AccessEvent``, anonymous
+ones included. Requests only append to a per-process buffer, which a
+background thread writes with one ``bulk_create`` once it holds
+``ACCESS_LOG_BATCH_SIZE`` events or every ``ACCESS_LOG_FLUSH_SECONDS``,
+and once more when the process exits. A crashed worker loses at most the
+events still buffered.
+
+``rollup_day`` turns one day of events into a ``FolderDailyStats`` row per
+folder. It is the only reader of the raw table, and it reads one
+``created_at`` range at a time; owners' analytics and exports read the
+stats. ``manage.py rollup_folder_stats`` rolls up yesterday and today and,
+with ``--prune``, drops raw events past ``ACCESS_LOG_RETENTION_DAYS``.
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import threading
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from core.throttling import client_ip
+
+from .models import AccessEvent, Folder, FolderDailyStats
+
+logger = logging.getLogger(__name__)
+
+VIEW, DOWNLOAD = AccessEvent.VIEW, AccessEvent.DOWNLOAD
+STATS_FIELDS = ("views", "unique_visitors", "anonymous_views", "downloads")
+
+
+class AccessLogBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._events = []
+        self._pid = None
+
+    def add(self, event):
+        if not settings.ACCESS_LOG_FLUSH_SECONDS:
+            self._write([event])
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads do not survive a fork, and buffered events belong to the parent.
+                self._pid = os.getpid()
+                self._events = []
+                threading.Thread(target=self._run, name="access-log", daemon=True).start()
+            self._events.append(event)
+            full = len(self._events) >= settings.ACCESS_LOG_BATCH_SIZE
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, []
+        return self._write(events)
+
+    def _write(self, events):
+        if not events:
+            return 0
+        try:
+            AccessEvent.objects.bulk_create(events, batch_size=500)
+        except DatabaseError:
+            logger.exception("Dropped %d access events", len(events))
+            return 0
+        return len(events)
+
+    def _run(self):
+        while True:
+            self._wake.wait(settings.ACCESS_LOG_FLUSH_SECONDS)
+            self._wake.clear()
+            if self.flush():
+                connections.close_all()
+
+
+buffer = AccessLogBuffer()
+atexit.register(buffer.flush)
+
+
+def visitor_key(request):
+    if request.user.is_authenticated:
+        return str(request.user.id)
+    ident = f"{client_ip(request)}|{request.META.get('HTTP_USER_AGENT', '')}"
+    return hashlib.blake2b(ident.encode(), digest_size=16, key=settings.SECRET_KEY.encode()[:64]).hexdigest()
+
+
+def record_access(request, folder_id, kind=VIEW, file_id=None):
+    buffer.add(
+        AccessEvent(
+            folder_id=folder_id,
+            file_id=file_id,
+            user_id=request.user.id if request.user.is_authenticated else None,
+            visitor=visitor_key(request),
+            kind=kind,
+            created_at=timezone.now(),
+        )
+    )
+
+
+# Rollup ---------------------------------------------------------------------
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+def oldest_kept_day(today=None):
+    today = today or timezone.localdate()
+    return today - timedelta(days=settings.ACCESS_LOG_RETENTION_DAYS)
+
+
+def rollup_day(day):
+    """Replace ``day``'s ``FolderDailyStats`` with totals from its raw events."""
+    if day < oldest_kept_day():
+        raise ValueError(f"Raw events for {day} have been pruned; its stats cannot be rebuilt.")
+    start, end = day_bounds(day)
+    rows = list(
+        AccessEvent.objects.filter(created_at__gte=start, created_at__lt=end)
+        .values("folder")
+        .annotate(
+            views=Count("pk", filter=Q(kind=VIEW)),
+            unique_visitors=Count("visitor", filter=Q(kind=VIEW), distinct=True),
+            anonymous_views=Count("pk", filter=Q(kind=VIEW, user__isnull=True)),
+            downloads=Count("pk", filter=Q(kind=DOWNLOAD)),
+        )
+        .order_by()
+    )
+
+    # Events outlive their folders; skip the ones deleted since.
+    existing = set()
+    ids = [row["folder"] for row in rows]
+    for offset in range(0, len(ids), 1000):
+        existing.update(Folder.objects.filter(id__in=ids[offset : offset + 1000]).values_list("id", flat=True))
+    stats = [
+        FolderDailyStats(folder_id=row["folder"], date=day, **{name: row[name] for name in STATS_FIELDS})
+        for row in rows
+        if row["folder"] in existing
+    ]
+
+    with transaction.atomic():
+        FolderDailyStats.objects.filter(date=day).delete()
+        FolderDailyStats.objects.bulk_create(stats, batch_size=1000)
+    return len(stats)
+
+
+def prune_events():
+    start, _ = day_bounds(oldest_kept_day())
+    deleted, _ = AccessEvent.objects.filter(created_at__lt=start).delete()
+    return deleted
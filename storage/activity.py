@@ -0,0 +1,182 @@
+"""
+Rolling per-folder activity counters.
+
+Every view, like and folder comment bumps two ``FolderActivityBucket`` rows:
+the folder's current hour and its current day. A trending window is then a
+sum over at most 25 hourly or 7 daily buckets per folder instead of a range
+scan over the views, likes and comments tables. Buckets past their
+retention are pruned by ``manage.py rebuild_folder_activity --prune``, which
+can also rebuild them from ``FolderView.viewed_at`` and comment timestamps
+(likes carry no timestamp, so they are only counted from the moment they
+happen, and an unlike can only take back a like counted in the current
+buckets; one counted in an earlier hour stays there until it ages out).
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest, TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import FolderActivityBucket, FolderComment, FolderView
+
+HOUR, DAY = FolderActivityBucket.HOUR, FolderActivityBucket.DAY
+COUNTERS = ("views", "likes", "comments")
+
+# window name -> (bucket granularity, how many buckets back from the current one)
+WINDOWS = {"24h": (HOUR, 24), "7d": (DAY, 6)}
+
+
+def bucket_start(when, granularity):
+    when = timezone.localtime(when)
+    when = when.replace(minute=0, second=0, microsecond=0)
+    if granularity == DAY:
+        when = when.replace(hour=0)
+    return when
+
+
+def _added(name, delta):
+    # Removals stop at zero: an unlike may land in a later bucket than its like.
+    return F(name) + delta if delta > 0 else Greatest(F(name) + delta, 0)
+
+
+def _bump(folder_id, granularity, start, deltas, create):
+    rows = FolderActivityBucket.objects.filter(folder_id=folder_id, granularity=granularity, bucket_start=start)
+    if rows.update(**{name: _added(name, delta) for name, delta in deltas.items()}) or not create:
+        return
+    try:
+        with transaction.atomic():
+            FolderActivityBucket.objects.create(
+                folder_id=folder_id, granularity=granularity, bucket_start=start, **deltas
+            )
+    except IntegrityError:
+        # Another request created the bucket first.
+        rows.update(**{name: _added(name, delta) for name, delta in deltas.items()})
+
+
+def record_activity(folder_ids, when=None, create=True, **deltas):
+    """
+    Add counter deltas, e.g. ``record_activity(5, likes=1)``, to the buckets
+    covering ``when`` (now by default). With ``create=False`` missing buckets
+    are left alone. Negative deltas never create buckets and never take a
+    counter below zero.
+    """
+    if isinstance(folder_ids, int):
+        folder_ids = [folder_ids]
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    create = create and all(delta > 0 for delta in deltas.values())
+    when = when or timezone.now()
+    for granularity in (HOUR, DAY):
+        start = bucket_start(when, granularity)
+        for folder_id in folder_ids:
+            _bump(folder_id, granularity, start, deltas, create)
+
+
+def window_since(window, now=None):
+    """Start of the oldest bucket in ``window``; raises ``KeyError`` for unknown windows."""
+    granularity, back = WINDOWS[window]
+    step = timedelta(hours=1) if granularity == HOUR else timedelta(days=1)
+    return granularity, bucket_start(now or timezone.now(), granularity) - back * step
+
+
+def trending(folders, window, limit):
+    """
+    ``(folder_id, views, likes, comments)`` for the top ``limit`` of ``folders``,
+    ranked like the feed but by activity inside ``window``.
+    """
+    granularity, since = window_since(window)
+    return list(
+        FolderActivityBucket.objects.filter(
+            granularity=granularity, bucket_start__gte=since, folder__in=folders
+        )
+        .values("folder_id")
+        .annotate(**{name: Sum(name) for name in COUNTERS})
+        .order_by("-views", "-likes", "-comments", "-folder_id")
+        .values_list("folder_id", *COUNTERS)[:limit]
+    )
+
+
+def retention_cutoffs(now=None):
+    now = now or timezone.now()
+    return {
+        HOUR: bucket_start(now, HOUR) - timedelta(hours=settings.ACTIVITY_HOURLY_RETENTION_HOURS),
+        DAY: bucket_start(now, DAY) - timedelta(days=settings.ACTIVITY_DAILY_RETENTION_DAYS),
+    }
+
+
+def retained_activity(queryset, field):
+    """
+    ``{(folder_id, hour): rows}`` for the rows of ``queryset`` still counted in
+    retained buckets, by their ``field`` timestamp. Taken before a bulk delete
+    whose per-row signals are deferred, and handed to ``forget_activity`` after.
+    """
+    since = min(retention_cutoffs().values())
+    return Counter(
+        (folder_id, bucket_start(when, HOUR))
+        for folder_id, when in queryset.filter(**{f"{field}__gte": since}).values_list("folder_id", field)
+    )
+
+
+def forget_activity(counts, counter):
+    # Buckets of folders deleted along the way are gone already; create=False skips them.
+    for (folder_id, hour), n in counts.items():
+        record_activity(folder_id, hour, create=False, **{counter: -n})
+
+
+def prune_activity(now=None):
+    deleted = 0
+    for granularity, cutoff in retention_cutoffs(now).items():
+        deleted += FolderActivityBucket.objects.filter(
+            granularity=granularity, bucket_start__lt=cutoff
+        ).delete()[0]
+    return deleted
+
+
+def rebuild_activity(batch_size=1000, now=None):
+    """
+    Recompute view and comment counts of every bucket inside the retention
+    window. Like counts of existing buckets are kept.
+    """
+    rebuilt = 0
+    for granularity, cutoff in retention_cutoffs(now).items():
+        trunc = TruncHour if granularity == HOUR else TruncDay
+        counts = {}
+        for name, queryset, field in (
+            ("views", FolderView.objects, "viewed_at"),
+            ("comments", FolderComment.objects, "created_at"),
+        ):
+            rows = (
+                queryset.filter(**{f"{field}__gte": cutoff})
+                .annotate(start=trunc(field))
+                .values("folder_id", "start")
+                .annotate(n=Count("pk"))
+                .values_list("folder_id", "start", "n")
+            )
+            for folder_id, start, n in rows:
+                counts.setdefault((folder_id, start), dict.fromkeys(COUNTERS, 0))[name] = n
+
+        likes = dict(
+            ((row["folder_id"], row["bucket_start"]), row["likes"])
+            for row in FolderActivityBucket.objects.filter(
+                granularity=granularity, bucket_start__gte=cutoff
+            ).exclude(likes=0).values("folder_id", "bucket_start", "likes")
+        )
+        for key, n in likes.items():
+            counts.setdefault(key, dict.fromkeys(COUNTERS, 0))["likes"] = n
+
+        with transaction.atomic():
+            FolderActivityBucket.objects.filter(granularity=granularity, bucket_start__gte=cutoff).delete()
+            FolderActivityBucket.objects.bulk_create(
+                (
+                    FolderActivityBucket(folder_id=folder_id, granularity=granularity, bucket_start=start, **values)
+                    for (folder_id, start), values in counts.items()
+                ),
+                batch_size=batch_size,
+            )
+        rebuilt += len(counts)
+    return rebuilt
@@ -1,3 +1,147 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
 
-# Register your models here.
+from core.admin_tools import LargeTableAdmin
+
+from . import versions
+from .activity import forget_activity, retained_activity
+from .models import File, FileComment, Folder, FolderComment, FolderMessage
+
+User = get_user_model()
+
+
+def subtree_ids(folder_ids):
+    """``folder_ids`` and every folder below them, one query per tree level."""
+    seen = set(folder_ids)
+    frontier = list(seen)
+    while frontier:
+        children = Folder.objects.filter(parent_id__in=frontier).values_list("id", flat=True)
+        frontier = [pk for pk in children if pk not in seen]
+        seen.update(frontier)
+    return seen
+
+
+class OwnerActionForm(ActionForm):
+    new_owner = forms.CharField(required=False, label="New owner (username)")
+
+
+def reassign_owner_action(reassign):
+    """
+    An admin action moving the selected rows to the user named in the action
+    form; ``reassign(queryset, owner)`` does the move and returns the number of
+    rows changed.
+    """
+
+    @admin.action(description="Reassign selected to the owner named below", permissions=["change"])
+    def reassign_owner(modeladmin, request, queryset):
+        username = request.POST.get("new_owner", "").strip()
+        owner = User.objects.filter(username=username).first() if username else None
+        if owner is None:
+            modeladmin.message_user(request, "Enter the username of an existing user to reassign to.", messages.ERROR)
+            return
+        user_ids = modeladmin.affected_users(queryset) | {owner.id}
+        with transaction.atomic():
+            changed = reassign(queryset, owner)
+            modeladmin.after_bulk_change(user_ids)
+        modeladmin.message_user(request, f"Reassigned {changed} rows to {owner.username}.", messages.SUCCESS)
+
+    return reassign_owner
+
+
+def reassign_folders(queryset, owner):
+    # A folder's whole subtree, and the files in it, move along.
+    ids = subtree_ids(queryset.values_list("id", flat=True))
+    changed = Folder.objects.filter(id__in=ids).update(owner=owner, updated_at=timezone.now())
+    return changed + File.objects.filter(folder_id__in=ids).update(owner=owner)
+
+
+def reassign_files(queryset, owner):
+    return queryset.update(owner=owner)
+
+
+class OwnedContentAdmin(LargeTableAdmin):
+    action_form = OwnerActionForm
+    autocomplete_fields = ["owner"]
+
+
+@admin.register(Folder)
+class FolderAdmin(OwnedContentAdmin):
+    list_display = ["id", "name", "owner", "parent", "is_public", "is_listed_in_feed", "folder_code", "created_at"]
+    list_filter = ["is_public", "is_listed_in_feed"]
+    list_select_related = ["owner", "parent"]
+    search_fields = ["=folder_code", "name"]
+    autocomplete_fields = ["owner", "parent"]
+    raw_id_fields = ["liked_by"]
+    readonly_fields = ["folder_code", "created_at", "updated_at"]
+    exclude = ["password"]
+    actions = [*LargeTableAdmin.actions, reassign_owner_action(reassign_folders), "unpublish"]
+
+    def affected_users(self, queryset):
+        # Deleting or moving a folder takes its whole subtree along.
+        ids = subtree_ids(queryset.values_list("id", flat=True))
+        owners = set(Folder.objects.filter(id__in=ids).values_list("owner_id", flat=True))
+        return owners | set(File.objects.filter(folder_id__in=ids).values_list("owner_id", flat=True))
+
+    @admin.action(description="Unpublish selected from the feed", permissions=["change"])
+    def unpublish(self, request, queryset):
+        # update() skips auto_now, and conditional GETs rely on updated_at.
+        changed = queryset.filter(is_listed_in_feed=True).update(is_listed_in_feed=False, updated_at=timezone.now())
+        versions.bump(Folder)
+        self.message_user(request, f"Unpublished {changed} folders.", messages.SUCCESS)
+
+
+@admin.register(File)
+class FileAdmin(OwnedContentAdmin):
+    list_display = ["id", "name", "folder", "owner", "size", "uploaded_at"]
+    list_select_related = ["folder", "owner"]
+    search_fields = ["name"]
+    autocomplete_fields = ["owner", "folder"]
+    readonly_fields = ["size", "uploaded_at"]
+    actions = [*LargeTableAdmin.actions, reassign_owner_action(reassign_files)]
+
+    def affected_users(self, queryset):
+        return set(queryset.values_list("owner_id", flat=True).distinct())
+
+
+class CommentAdmin(LargeTableAdmin):
+    list_display = ["id", "owner", "excerpt", "created_at"]
+    search_fields = ["text"]
+    autocomplete_fields = ["owner"]
+    readonly_fields = ["created_at", "updated_at"]
+
+    @admin.display(description="text")
+    def excerpt(self, obj):
+        return obj.text[:80]
+
+
+@admin.register(FolderComment)
+class FolderCommentAdmin(CommentAdmin):
+    list_display = [*CommentAdmin.list_display[:2], "folder", *CommentAdmin.list_display[2:]]
+    list_select_related = ["owner", "folder"]
+    autocomplete_fields = ["owner", "folder"]
+
+    @admin.action(description="Delete selected (no confirmation)", permissions=["delete"])
+    def bulk_delete(self, request, queryset):
+        # Comments still inside the activity buckets come out once per folder and hour.
+        comments = retained_activity(queryset, "created_at")
+        super().bulk_delete(request, queryset)
+        forget_activity(comments, "comments")
+
+
+@admin.register(FileComment)
+class FileCommentAdmin(CommentAdmin):
+    list_display = [*CommentAdmin.list_display[:2], "file", *CommentAdmin.list_display[2:]]
+    list_select_related = ["owner", "file"]
+    autocomplete_fields = ["owner", "file"]
+
+
+@admin.register(FolderMessage)
+class FolderMessageAdmin(CommentAdmin):
+    list_display = [*CommentAdmin.list_display[:2], "folder", *CommentAdmin.list_display[2:]]
+    list_select_related = ["owner", "folder"]
+    autocomplete_fields = ["owner", "folder"]
+    readonly_fields = ["created_at"]
@@ -0,0 +1,206 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import check_password
+from django.db.models import Count
+from django.views.decorators.http import require_GET
+
+from accounts.avatars import avatar_url
+from core.async_api import async_api_view, json_response
+
+from .access_log import record_access
+from .models import File, FileComment, Folder, FolderComment, FolderView
+from .tasks import enqueue_folder_view
+
+
+async def _grouped_counts(queryset, key):
+    rows = queryset.values(key).annotate(n=Count("pk")).values_list(key, "n")
+    return {pk: n async for pk, n in rows}
+
+
+async def _liked_ids(user, folder_ids):
+    if not user.is_authenticated:
+        return set()
+    rows = Folder.liked_by.through.objects.filter(
+        folder_id__in=folder_ids, user_id=user.id
+    ).values_list("folder_id", flat=True)
+    return {pk async for pk in rows}
+
+
+async def _tree_counts(folder_ids):
+    # Walk the tree one level per query, then total each subtree in memory.
+    children = {}
+    frontier = list(folder_ids)
+    seen = set(frontier)
+    while frontier:
+        rows = Folder.objects.filter(parent_id__in=frontier).values_list("id", "parent_id")
+        frontier = []
+        async for child_id, parent_id in rows:
+            children.setdefault(parent_id, []).append(child_id)
+            if child_id not in seen:
+                seen.add(child_id)
+                frontier.append(child_id)
+
+    direct_files = await _grouped_counts(File.objects.filter(folder_id__in=seen), "folder_id")
+
+    totals = {}
+
+    def total(node):
+        if node not in totals:
+            subfolders, files = 0, direct_files.get(node, 0)
+            for child in children.get(node, ()):
+                child_subfolders, child_files = total(child)
+                subfolders += 1 + child_subfolders
+                files += child_files
+            totals[node] = (subfolders, files)
+        return totals[node]
+
+    return {pk: total(pk) for pk in folder_ids}
+
+
+def _can_show_counts(folder, user):
+    if folder.is_public:
+        return True
+    return user.is_authenticated and user.id == folder.owner_id
+
+
+async def _serialize_folders(request, folders):
+    user = request.user
+    ids = [folder.id for folder in folders]
+    annotated = bool(folders) and hasattr(folders[0], "views_count")
+
+    lookups = [_tree_counts(ids), _liked_ids(user, ids)]
+    if not annotated:
+        lookups += [
+            _grouped_counts(FolderView.objects.filter(folder_id__in=ids), "folder_id"),
+            _grouped_counts(Folder.liked_by.through.objects.filter(folder_id__in=ids), "folder_id"),
+            _grouped_counts(FolderComment.objects.filter(folder_id__in=ids), "folder_id"),
+        ]
+    tree, liked, *counts = await asyncio.gather(*lookups)
+
+    data = []
+    for folder in folders:
+        if annotated:
+            views, likes, comments = folder.views_count, folder.likes_count, folder.comments_count
+        else:
+            views, likes, comments = (c.get(folder.id, 0) for c in counts)
+        subfolders, files = tree[folder.id]
+        show_counts = _can_show_counts(folder, user)
+        data.append(
+            {
+                "id": folder.id,
+                "name": folder.name,
+                "description": folder.description,
+                "owner_username": folder.owner.username,
+                "owner_id": folder.owner_id,
+                "owner_profile_photo": avatar_url(folder.owner, "small", request),
+                "subfolder_count": subfolders if show_counts else None,
+                "file_count": files if show_counts else None,
+                "view_count": views,
+                "like_count": likes,
+                "comment_count": comments,
+                "is_liked": folder.id in liked,
+                "is_public": folder.is_public,
+                "is_listed_in_feed": folder.is_listed_in_feed,
+                "created_at": folder.created_at,
+                "parent": folder.parent_id,
+                "folder_code": folder.folder_code,
+            }
+        )
+    return data
+
+
+async def _password_matches(password, folder):
+    if not (password and folder.password):
+        return False
+    return await sync_to_async(check_password)(password, folder.password)
+
+
+@require_GET
+@async_api_view(rate_limit_scope="feed")
+async def folder_feed(request):
+    folders = (
+        Folder.objects.filter(is_listed_in_feed=True)
+        .select_related("owner")
+        .annotate(
+            views_count=Count("views", distinct=True),
+            likes_count=Count("liked_by", distinct=True),
+            comments_count=Count("comments", distinct=True),
+        )
+        .order_by("-views_count", "-likes_count", "-comments_count", "-created_at")
+    )
+    if not request.user.is_authenticated:
+        folders = folders.filter(is_public=True)
+    folders = [folder async for folder in folders]
+    return json_response(await _serialize_folders(request, folders))
+
+
+@require_GET
+@async_api_view
+async def folder_detail(request, pk):
+    user = request.user
+    folders = Folder.objects.select_related("owner")
+    if not user.is_authenticated:
+        # Like the sync view: private folders do not exist for anonymous callers.
+        folders = folders.filter(is_public=True)
+    try:
+        folder = await folders.aget(pk=pk)
+    except Folder.DoesNotExist:
+        return json_response({"detail": "No Folder matches the given query."}, status=404)
+
+    is_owner = user.is_authenticated and user.id == folder.owner_id
+    if not (folder.is_public or is_owner):
+        if not await _password_matches(request.GET.get("password"), folder):
+            return json_response(
+                {"error": "This folder is private. Password required or incorrect."},
+                status=403,
+            )
+
+    await sync_to_async(record_access)(request, folder.id)
+    if user.is_authenticated:
+        await sync_to_async(enqueue_folder_view)(folder.id, user.id)
+    data = await _serialize_folders(request, [folder])
+    return json_response(data[0])
+
+
+@require_GET
+@async_api_view
+async def file_list(request):
+    user = request.user
+    folder_id = request.GET.get("folder")
+    files = File.objects.all()
+
+    if not folder_id:
+        if not user.is_authenticated:
+            return json_response([])
+        files = files.filter(owner_id=user.id)
+    else:
+        try:
+            folder = await Folder.objects.aget(id=folder_id)
+        except (Folder.DoesNotExist, ValueError):
+            return json_response([])
+        is_owner = user.is_authenticated and user.id == folder.owner_id
+        if not (folder.is_public or is_owner):
+            if not await _password_matches(request.GET.get("password"), folder):
+                return json_response([])
+        files = files.filter(folder_id=folder.id)
+
+    files = [f async for f in files]
+    comment_counts = await _grouped_counts(
+        FileComment.objects.filter(file_id__in=[f.id for f in files]), "file_id"
+    )
+    return json_response(
+        [
+            {
+                "id": f.id,
+                "comment_count": comment_counts.get(f.id, 0),
+                "name": f.name,
+                "file": f.file.url,
+                "size": f.size,
+                "uploaded_at": f.uploaded_at,
+                "folder": f.folder_id,
+                "owner": f.owner_id,
+            }
+            for f in files
+        ]
+    )
@@ -0,0 +1,269 @@
+"""
+Bulk import of a folder tree from a ZIP archive, a local directory or a
+JSON manifest.
+
+Folders are inserted one tree level per ``bulk_create``; file contents are
+streamed into storage from a thread pool and their rows inserted in batches.
+Nothing is written until the whole tree has been checked against
+``IMPORT_MAX_TOTAL_BYTES`` and, for archives, ``IMPORT_MAX_COMPRESSION_RATIO``;
+while copying, no file may yield more bytes than it declared.
+"""
+
+import json
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.files import File as DjangoFile
+from django.db import transaction
+
+from accounts.stats import adjust_user_stats
+
+from . import versions
+from .models import File, Folder
+
+MAX_FILE_SIZE = 100 * 1024 * 1024
+MAX_ENTRIES = 20000
+IGNORED_NAMES = {"__MACOSX", ".DS_Store", "Thumbs.db"}
+# Small, highly repetitive files compress well legitimately; only larger ones are ratio-checked.
+RATIO_CHECK_MIN_SIZE = 1024 * 1024
+
+
+class TreeImportError(ValueError):
+    pass
+
+
+@dataclass
+class FileEntry:
+    folder: tuple
+    name: str
+    size: int
+    open: object
+
+
+@dataclass
+class ImportResult:
+    folders: int = 0
+    files: int = 0
+    bytes: int = 0
+    root_ids: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)
+
+
+def _split(path):
+    parts = [part for part in path.replace("\\", "/").split("/") if part not in ("", ".")]
+    if ".." in parts:
+        raise TreeImportError(f"Invalid path in import: {path}")
+    return tuple(parts)
+
+
+def _ignored(parts):
+    return any(part in IGNORED_NAMES for part in parts)
+
+
+class BoundedReader:
+    """Reads at most ``limit`` bytes and fails if the source has more, whatever its header said."""
+
+    def __init__(self, handle, limit):
+        self.handle = handle
+        self.size = limit
+        self.remaining = limit
+
+    def read(self, size=-1):
+        want = self.remaining + 1 if size is None or size < 0 else min(size, self.remaining + 1)
+        data = self.handle.read(want)
+        if len(data) > self.remaining:
+            raise TreeImportError("A file in the import is larger than its declared size.")
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def entries_from_zip(archive):
+    """Yield ``(folder_path, FileEntry | None)`` pairs from a ZIP archive."""
+    max_ratio = settings.IMPORT_MAX_COMPRESSION_RATIO
+    for info in archive.infolist():
+        parts = _split(info.filename)
+        if not parts or _ignored(parts):
+            continue
+        if info.is_dir():
+            yield parts, None
+        else:
+            if info.file_size >= RATIO_CHECK_MIN_SIZE and info.file_size > max_ratio * max(info.compress_size, 1):
+                raise TreeImportError(f"{info.filename} is compressed more than {max_ratio}:1.")
+            yield parts[:-1], FileEntry(parts[:-1], parts[-1], info.file_size, lambda info=info: archive.open(info))
+
+
+def entries_from_directory(root):
+    """The directory itself becomes the top folder of the imported tree."""
+    root = os.path.abspath(root)
+    top = (os.path.basename(root),)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in IGNORED_NAMES)
+        folder = top + _split(os.path.relpath(dirpath, root))
+        yield folder, None
+        for name in sorted(filenames):
+            if name in IGNORED_NAMES:
+                continue
+            path = os.path.join(dirpath, name)
+            yield folder, FileEntry(folder, name, os.path.getsize(path), lambda path=path: open(path, "rb"))
+
+
+def entries_from_manifest(manifest_path):
+    """
+    A manifest is a JSON list of paths relative to the manifest's directory;
+    entries ending in ``/`` are (possibly empty) folders.
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path) as handle:
+        paths = json.load(handle)
+    for relative in paths:
+        parts = _split(relative)
+        if not parts or _ignored(parts):
+            continue
+        if relative.endswith("/"):
+            yield parts, None
+            continue
+        path = os.path.join(base, *parts)
+        yield parts[:-1], FileEntry(parts[:-1], parts[-1], os.path.getsize(path), lambda path=path: open(path, "rb"))
+
+
+class FolderTreeImporter:
+    def __init__(self, owner, parent=None, is_public=True, workers=8, batch_size=500, progress=None):
+        self.owner = owner
+        self.parent = parent
+        self.is_public = is_public
+        self.workers = workers
+        self.batch_size = batch_size
+        self.progress = progress or (lambda stage, done, total: None)
+
+    def run(self, entries):
+        result = ImportResult()
+        folders, files = self._collect(entries, result)
+        stored = []
+        try:
+            with transaction.atomic():
+                folder_ids = self._create_folders(folders, result)
+                self._create_files(files, folder_ids, stored, result)
+                # bulk_create skips the signals that keep the owner's counters and table versions current.
+                versions.bump(Folder, File)
+                adjust_user_stats(
+                    self.owner.id,
+                    folder_count=result.folders,
+                    file_count=result.files,
+                    total_bytes=result.bytes,
+                )
+        except BaseException:
+            storage = File._meta.get_field("file").storage
+            for name in stored:
+                storage.delete(name)
+            raise
+        return result
+
+    def _collect(self, entries, result):
+        folders, files = set(), []
+        for folder, entry in entries:
+            for depth in range(1, len(folder) + 1):
+                folders.add(folder[:depth])
+            if entry is None:
+                continue
+            if entry.size > MAX_FILE_SIZE:
+                result.skipped.append("/".join((*entry.folder, entry.name)))
+                continue
+            files.append(entry)
+            if len(folders) + len(files) > MAX_ENTRIES:
+                raise TreeImportError(f"Imports are limited to {MAX_ENTRIES} folders and files.")
+        if self.parent is None and any(not entry.folder for entry in files):
+            raise TreeImportError("Files must be inside a folder when importing at the top level.")
+        limit = settings.IMPORT_MAX_TOTAL_BYTES
+        if sum(entry.size for entry in files) > limit:
+            raise TreeImportError(f"Imports are limited to {limit} bytes of file content.")
+        return folders, files
+
+    def _create_folders(self, paths, result):
+        ids = {(): self.parent.id if self.parent else None}
+        by_depth = {}
+        for path in paths:
+            by_depth.setdefault(len(path), []).append(path)
+
+        for depth in sorted(by_depth):
+            level = sorted(by_depth[depth])
+            objs = [
+                Folder(
+                    name=path[-1][:255],
+                    owner=self.owner,
+                    parent_id=ids[path[:-1]],
+                    is_public=self.is_public,
+                )
+                for path in level
+            ]
+            Folder.objects.bulk_create(objs, batch_size=self.batch_size)
+            if any(obj.pk is None for obj in objs):
+                # MySQL does not return ids from bulk inserts; map them back by code.
+                by_code = dict(
+                    Folder.objects.filter(folder_code__in=[obj.folder_code for obj in objs])
+                    .values_list("folder_code", "id")
+                )
+                for obj in objs:
+                    obj.pk = by_code[obj.folder_code]
+            ids.update((path, obj.pk) for path, obj in zip(level, objs))
+            result.folders += len(objs)
+            if depth == 1:
+                result.root_ids = [obj.pk for obj in objs]
+            self.progress("folders", result.folders, len(paths))
+        return ids
+
+    def _create_files(self, entries, folder_ids, stored, result):
+        file_field = File._meta.get_field("file")
+
+        def store(entry):
+            with BoundedReader(entry.open(), entry.size) as handle:
+                name = file_field.generate_filename(None, entry.name)
+                return file_field.storage.save(name, DjangoFile(handle))
+
+        rows, errors = [], []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(store, entry): entry for entry in entries}
+            for future in as_completed(futures):
+                entry = futures[future]
+                try:
+                    name = future.result()
+                except Exception as exc:
+                    errors.append(exc)
+                    continue
+                stored.append(name)
+                rows.append(
+                    File(
+                        name=entry.name[:255],
+                        file=name,
+                        size=entry.size,
+                        folder_id=folder_ids[entry.folder],
+                        owner=self.owner,
+                    )
+                )
+                result.files += 1
+                result.bytes += entry.size
+                self.progress("files", result.files, len(entries))
+        if errors:
+            raise errors[0]
+
+        File.objects.bulk_create(rows, batch_size=self.batch_size)
+
+
+def import_zip(fileobj, **kwargs):
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as exc:
+        raise TreeImportError("Upload is not a valid ZIP archive.") from exc
+    with archive:
+        return FolderTreeImporter(**kwargs).run(entries_from_zip(archive))
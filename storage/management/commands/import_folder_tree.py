@@ -0,0 +1,74 @@
+import os
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from storage.importer import (
+    FolderTreeImporter,
+    TreeImportError,
+    entries_from_directory,
+    entries_from_manifest,
+    entries_from_zip,
+)
+from storage.models import Folder
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Import a folder tree for a user from a directory, a ZIP archive or a JSON manifest."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Directory, .zip archive or .json manifest.")
+        parser.add_argument("--owner", required=True, help="Username or id of the owner.")
+        parser.add_argument("--parent", type=int, help="Import below this folder (must belong to the owner).")
+        parser.add_argument("--private", action="store_true", help="Create the folders as private.")
+        parser.add_argument("--workers", type=int, default=8, help="Threads used to copy file contents.")
+
+    def handle(self, *args, **options):
+        owner_ref = options["owner"]
+        lookup = {"id": owner_ref} if owner_ref.isdigit() else {"username": owner_ref}
+        try:
+            owner = User.objects.get(**lookup)
+        except User.DoesNotExist as exc:
+            raise CommandError(f"User {owner_ref} not found.") from exc
+
+        parent = None
+        if options["parent"]:
+            parent = Folder.objects.filter(id=options["parent"], owner=owner).first()
+            if parent is None:
+                raise CommandError("Parent folder not found for this owner.")
+
+        importer = FolderTreeImporter(
+            owner=owner,
+            parent=parent,
+            is_public=not options["private"],
+            workers=options["workers"],
+            progress=self.report,
+        )
+        source = options["source"]
+        try:
+            if os.path.isdir(source):
+                result = importer.run(entries_from_directory(source))
+            elif source.endswith(".json"):
+                result = importer.run(entries_from_manifest(source))
+            else:
+                with zipfile.ZipFile(source) as archive:
+                    result = importer.run(entries_from_zip(archive))
+        except (TreeImportError, OSError, zipfile.BadZipFile) as exc:
+            raise CommandError(str(exc)) from exc
+
+        for path in result.skipped:
+            self.stderr.write(f"Skipped (over size limit): {path}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result.folders} folders and {result.files} files "
+                f"({result.bytes} bytes); top folders: {result.root_ids}"
+            )
+        )
+
+    def report(self, stage, done, total):
+        if done == total or done % 500 == 0:
+            self.stdout.write(f"{stage}: {done}/{total}")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from storage.activity import prune_activity, rebuild_activity
+
+
+class Command(BaseCommand):
+    help = "Recompute the hourly and daily folder activity buckets used by the trending ranking."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prune", action="store_true", help="Only drop buckets past their retention.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        pruned = prune_activity()
+        self.stdout.write(f"Pruned {pruned} expired buckets.")
+        if options["prune"]:
+            return
+        count = rebuild_activity(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} activity buckets."))
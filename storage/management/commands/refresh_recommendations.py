@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from storage.recommendations import default_backend, refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = "Recompute stored folder neighbours and per-user folder recommendations."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recompute everything instead of what changed since the last run.")
+        parser.add_argument("--top-k", type=int, help="Rows kept per folder and per user (default RECOMMENDATIONS_TOP_K).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--backend", choices=["numpy", "python"], help=f"Defaults to {default_backend()!r} here.")
+
+    def handle(self, *args, **options):
+        if options["top_k"] is not None and options["top_k"] < 1:
+            raise CommandError("--top-k must be positive.")
+        if options["backend"] == "numpy" and default_backend() != "numpy":
+            raise CommandError("The numpy backend needs numpy and scipy installed.")
+        result = refresh_recommendations(
+            full=options["full"],
+            k=options["top_k"],
+            batch_size=options["batch_size"],
+            backend=options["backend"],
+        )
+        kind = "Full" if result.full else "Incremental"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{kind} refresh ({result.backend}): {result.folders} folders, {result.users} users."
+            )
+        )
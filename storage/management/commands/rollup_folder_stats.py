@@ -0,0 +1,34 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from storage.access_log import prune_events, rollup_day
+
+
+class Command(BaseCommand):
+    help = "Roll the folder access log up into per-folder daily stats (yesterday and today by default)."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Last day to roll up, as YYYY-MM-DD (default: today).")
+        parser.add_argument("--days", type=int, default=2, help="How many days to roll up, ending at --date.")
+        parser.add_argument("--prune", action="store_true", help="Then drop raw events past their retention.")
+
+    def handle(self, *args, **options):
+        try:
+            last = date.fromisoformat(options["date"]) if options["date"] else timezone.localdate()
+        except ValueError:
+            raise CommandError("--date must be YYYY-MM-DD.")
+
+        for back in range(options["days"] - 1, -1, -1):
+            day = last - timedelta(days=back)
+            try:
+                count = rollup_day(day)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(f"{day}: {count} folders")
+
+        if options["prune"]:
+            self.stdout.write(f"Pruned {prune_events()} raw access events.")
+        self.stdout.write(self.style.SUCCESS("Rollup complete."))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:28
+
+from django.db import migrations, models
+
+
+def fill_file_sizes(apps, schema_editor):
+    File = apps.get_model("storage", "File")
+    for file_obj in File.objects.filter(size=0).iterator():
+        try:
+            size = file_obj.file.size
+        except (OSError, ValueError):
+            continue
+        File.objects.filter(pk=file_obj.pk).update(size=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0007_folder_code_required'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='size',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_file_sizes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0008_file_size'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedFolderMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='foldermessage',
+            index=models.Index(fields=['folder', 'created_at'], name='storage_fol_folder__ff669d_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedfoldermessage',
+            name='folder',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='storage.folder'),
+        ),
+        migrations.AddField(
+            model_name='archivedfoldermessage',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedfoldermessage',
+            index=models.Index(fields=['folder', 'created_at'], name='storage_arc_folder__7f194c_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0010_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FolderActivityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('views', models.IntegerField(default=0)),
+                ('likes', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+                ('folder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_buckets', to='storage.folder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'bucket_start'], name='storage_fol_granula_f0cd02_idx')],
+                'unique_together': {('folder', 'granularity', 'bucket_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.11 on 2026-10-19 12:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0012_recommendations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('visitor', models.CharField(max_length=32)),
+                ('kind', models.CharField(choices=[('view', 'View'), ('download', 'Download')], max_length=8)),
+                ('created_at', models.DateTimeField()),
+                ('file', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='storage.file')),
+                ('folder', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='storage.folder')),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='storage_acc_created_b0f67e_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FolderDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.IntegerField(default=0)),
+                ('unique_visitors', models.IntegerField(default=0)),
+                ('anonymous_views', models.IntegerField(default=0)),
+                ('downloads', models.IntegerField(default=0)),
+                ('folder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='storage.folder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='storage_fol_date_f3b76e_idx')],
+                'unique_together': {('folder', 'date')},
+            },
+        ),
+    ]
@@ -1,10 +1,47 @@
-﻿import uuid
+﻿import secrets
+from contextlib import nullcontext
 
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
 
 User = settings.AUTH_USER_MODEL
 
+# Codes are random, so a collision is rare; it is detected by the unique
+# index on insert and retried instead of being checked up front.
+FOLDER_CODE_ATTEMPTS = 5
+
+
+def generate_folder_code():
+    return secrets.token_hex(4).upper()
+
+
+def _retryable_insert(using):
+    # A failed insert only needs a savepoint when it runs inside a transaction.
+    if transaction.get_connection(using).in_atomic_block:
+        return transaction.atomic(using=using)
+    return nullcontext()
+
+
+class FolderQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        missing = [obj for obj in objs if not obj.folder_code]
+        for attempt in range(FOLDER_CODE_ATTEMPTS):
+            codes = set()
+            for obj in missing:
+                code = generate_folder_code()
+                while code in codes:
+                    code = generate_folder_code()
+                obj.folder_code = code
+                codes.add(code)
+            try:
+                with _retryable_insert(self.db):
+                    return super().bulk_create(objs, *args, **kwargs)
+            except IntegrityError:
+                last_attempt = attempt == FOLDER_CODE_ATTEMPTS - 1
+                if last_attempt or not self.filter(folder_code__in=codes).exists():
+                    raise
+
 
 class Folder(models.Model):
     name = models.CharField(max_length=255)
@@ -23,17 +60,26 @@ class Folder(models.Model):
     password = models.CharField(max_length=255, blank=True, null=True)
     liked_by = models.ManyToManyField(User, blank=True, related_name="liked_folders")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
-    def save(self, *args, **kwargs):
-        if not self.folder_code:
-            self.folder_code = self.generate_unique_code()
-        super().save(*args, **kwargs)
+    objects = FolderQuerySet.as_manager()
 
-    def generate_unique_code(self):
-        while True:
-            code = uuid.uuid4().hex[:8].upper()
-            if not Folder.objects.filter(folder_code=code).exists():
-                return code
+    def save(self, *args, **kwargs):
+        if self.folder_code:
+            return super().save(*args, **kwargs)
+
+        using = kwargs.get("using") or router.db_for_write(Folder, instance=self)
+        for attempt in range(FOLDER_CODE_ATTEMPTS):
+            self.folder_code = generate_folder_code()
+            try:
+                with _retryable_insert(using):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                last_attempt = attempt == FOLDER_CODE_ATTEMPTS - 1
+                taken = Folder.objects.using(using).filter(folder_code=self.folder_code).exists()
+                if last_attempt or not taken:
+                    self.folder_code = ""
+                    raise
 
 
 class FolderView(models.Model):
@@ -45,19 +91,121 @@ class FolderView(models.Model):
         unique_together = ("folder", "user")
 
 
+class FolderActivityBucket(models.Model):
+    """Views, likes and comments a folder gained during one hour or one day."""
+
+    HOUR = "hour"
+    DAY = "day"
+    GRANULARITY_CHOICES = ((HOUR, "Hour"), (DAY, "Day"))
+
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name="activity_buckets")
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    views = models.IntegerField(default=0)
+    likes = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("folder", "granularity", "bucket_start")
+        indexes = [models.Index(fields=["granularity", "bucket_start"])]
+
+
+class AccessEvent(models.Model):
+    """
+    One folder view or file download, appended by ``storage.access_log``.
+    Only the daily rollup reads this table; nothing references its rows, so
+    it carries no foreign-key constraints or indexes beyond ``created_at``.
+    """
+
+    VIEW = "view"
+    DOWNLOAD = "download"
+    KIND_CHOICES = ((VIEW, "View"), (DOWNLOAD, "Download"))
+
+    folder = models.ForeignKey(
+        Folder, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+"
+    )
+    file = models.ForeignKey(
+        "File", on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name="+"
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name="+"
+    )
+    # The user id, or a keyed hash of IP address and user agent for anonymous visitors.
+    visitor = models.CharField(max_length=32)
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["created_at"])]
+
+
+class FolderDailyStats(models.Model):
+    """One day of a folder's access log, written by ``storage.access_log.rollup_day``."""
+
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name="daily_stats")
+    date = models.DateField()
+    views = models.IntegerField(default=0)
+    unique_visitors = models.IntegerField(default=0)
+    anonymous_views = models.IntegerField(default=0)
+    downloads = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("folder", "date")
+        indexes = [models.Index(fields=["date"])]
+
+
+class FolderNeighbour(models.Model):
+    """A folder liked or viewed by the same people as ``folder``, ranked by similarity."""
+
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name="neighbours")
+    neighbour = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name="neighbour_of")
+    score = models.FloatField()
+    computed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ("folder", "neighbour")
+        indexes = [models.Index(fields=["folder", "-score"])]
+
+
+class UserRecommendation(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="folder_recommendations")
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name="recommendations")
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "folder")
+        indexes = [models.Index(fields=["user", "-score"])]
+
+
 class File(models.Model):
     name = models.CharField(max_length=255)
     file = models.FileField(upload_to="uploads/")
+    size = models.BigIntegerField(default=0, editable=False)
     folder = models.ForeignKey(Folder, on_delete=models.CASCADE)
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        # A newly assigned upload is not committed to storage yet.
+        if self.file and (not self.size or not self.file._committed):
+            previous = self.size
+            try:
+                self.size = self.file.size
+            except OSError:
+                pass
+            if self.pk is not None and self.size != previous:
+                # Picked up by the post_save stats handler in accounts.signals.
+                self._previous_size = previous
+        super().save(*args, **kwargs)
+
 
 class FolderComment(models.Model):
     folder = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name="comments")
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 class FileComment(models.Model):
@@ -65,6 +213,7 @@ class FileComment(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 class FolderMessage(models.Model):
@@ -72,3 +221,26 @@ class FolderMessage(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["folder", "created_at"])]
+
+
+class ArchivedFolderMessage(models.Model):
+    """Cold copy of a ``FolderMessage`` moved out by ``archive_messages``; ids are preserved."""
+
+    id = models.BigIntegerField(primary_key=True)
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name="+")
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    text = models.TextField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["folder", "created_at"])]
+
+
+class TableVersion(models.Model):
+    """A counter bumped on every write to the table ``name``; see ``storage.versions``."""
+
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
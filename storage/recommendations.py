@@ -0,0 +1,386 @@
+"""
+Precomputed folder recommendations.
+
+Users and folders form a weighted interaction matrix: a view counts
+``VIEW_WEIGHT`` and a like ``LIKE_WEIGHT``. Two folders are neighbours when
+the same people interact with both, scored by the cosine similarity of their
+columns. A user's candidates are the neighbours of what they interacted
+with, plus what the people they follow liked, viewed or own, damped by
+``FOLLOW_WEIGHT``. Folders a user already interacted with or owns are never
+recommended, and only public folders listed in the feed are candidates.
+
+``refresh_recommendations`` stores the top ``RECOMMENDATIONS_TOP_K`` rows per
+folder and per user, so serving them is a single indexed read. The first run
+(or ``full=True``) computes everything. Later runs only recompute folders
+with activity buckets newer than the previous run, the folders sharing users
+with them, and the users (and their followers) who touched them.
+
+The products run on NumPy/SciPy sparse matrices (both in ``requirements.txt``).
+Where they cannot be installed the same scores are computed with
+dictionaries, which is fine for small installations and slow past a few
+hundred thousand interactions.
+"""
+
+import heapq
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .activity import DAY, HOUR, bucket_start
+from .models import Folder, FolderActivityBucket, FolderNeighbour, FolderView, UserRecommendation
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - optional dependency
+    np = sparse = None
+
+User = get_user_model()
+
+VIEW_WEIGHT = 1.0
+LIKE_WEIGHT = 2.0
+OWNER_WEIGHT = 2.0
+FOLLOW_WEIGHT = 0.5
+# Very active accounts would dominate the co-occurrence counts (and their cost).
+MAX_ITEMS_PER_USER = 1000
+CHUNK_SIZE = 2000
+
+
+def default_backend():
+    return "python" if sparse is None else "numpy"
+
+
+class Graph:
+    def __init__(self, likes=(), views=(), follows=(), folders=()):
+        items = defaultdict(dict)
+        for user_id, folder_id in views:
+            items[user_id][folder_id] = VIEW_WEIGHT
+        for user_id, folder_id in likes:
+            items[user_id][folder_id] = items[user_id].get(folder_id, 0) + LIKE_WEIGHT
+        for user_id, weights in items.items():
+            if len(weights) > MAX_ITEMS_PER_USER:
+                top = heapq.nlargest(MAX_ITEMS_PER_USER, weights.items(), key=lambda item: (item[1], item[0]))
+                items[user_id] = dict(top)
+        self.items = dict(items)
+
+        self.follows = defaultdict(set)
+        self.followers = defaultdict(set)
+        for follower_id, followed_id in follows:
+            self.follows[follower_id].add(followed_id)
+            self.followers[followed_id].add(follower_id)
+
+        self.owned = defaultdict(list)
+        self.allowed = set()
+        for folder_id, owner_id, listed in folders:
+            self.owned[owner_id].append(folder_id)
+            if listed:
+                self.allowed.add(folder_id)
+
+        users_of = defaultdict(dict)
+        for user_id, weights in self.items.items():
+            for folder_id, weight in weights.items():
+                users_of[folder_id][user_id] = weight
+        self.users_of = dict(users_of)
+
+    @property
+    def user_ids(self):
+        return sorted(set(self.items) | set(self.follows))
+
+    @property
+    def folder_ids(self):
+        return sorted(self.users_of)
+
+
+def load_graph():
+    Like = Folder.liked_by.through
+    Follow = User.follows.through
+    return Graph(
+        likes=Like.objects.values_list("user_id", "folder_id").iterator(),
+        views=FolderView.objects.values_list("user_id", "folder_id").iterator(),
+        follows=Follow.objects.values_list("from_user_id", "to_user_id").iterator(),
+        folders=(
+            (folder_id, owner_id, is_public and is_listed)
+            for folder_id, owner_id, is_public, is_listed in Folder.objects.values_list(
+                "id", "owner_id", "is_public", "is_listed_in_feed"
+            ).iterator()
+        ),
+    )
+
+
+# Pure Python ---------------------------------------------------------------
+
+
+def _python_neighbours(graph, folder_ids, k):
+    norms = {
+        folder_id: math.sqrt(sum(w * w for w in users.values()))
+        for folder_id, users in graph.users_of.items()
+    }
+    result = {}
+    for folder_id in folder_ids:
+        dots = defaultdict(float)
+        for user_id, weight in graph.users_of.get(folder_id, {}).items():
+            for other_id, other_weight in graph.items[user_id].items():
+                if other_id != folder_id and other_id in graph.allowed:
+                    dots[other_id] += weight * other_weight
+        scored = ((other_id, dot / (norms[folder_id] * norms[other_id])) for other_id, dot in dots.items())
+        result[folder_id] = heapq.nlargest(k, scored, key=lambda pair: (pair[1], -pair[0]))
+    return result
+
+
+def _python_recommendations(graph, neighbours, user_ids, k):
+    result = {}
+    for user_id in user_ids:
+        seen = graph.items.get(user_id, {})
+        scores = defaultdict(float)
+        for folder_id, weight in seen.items():
+            for other_id, similarity in neighbours.get(folder_id, ()):
+                scores[other_id] += weight * similarity
+        for followed_id in graph.follows.get(user_id, ()):
+            for folder_id, weight in graph.items.get(followed_id, {}).items():
+                scores[folder_id] += FOLLOW_WEIGHT * weight
+            for folder_id in graph.owned.get(followed_id, ()):
+                scores[folder_id] += FOLLOW_WEIGHT * OWNER_WEIGHT
+        excluded = set(seen) | set(graph.owned.get(user_id, ()))
+        candidates = (
+            (folder_id, score)
+            for folder_id, score in scores.items()
+            if folder_id in graph.allowed and folder_id not in excluded
+        )
+        result[user_id] = heapq.nlargest(k, candidates, key=lambda pair: (pair[1], -pair[0]))
+    return result
+
+
+# NumPy / SciPy -------------------------------------------------------------
+
+
+class _Index:
+    def __init__(self, ids):
+        self.ids = np.asarray(sorted(ids), dtype=np.int64)
+        self.positions = {pk: i for i, pk in enumerate(self.ids.tolist())}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def take(self, ids):
+        return np.fromiter((self.positions[pk] for pk in ids if pk in self.positions), dtype=np.int64)
+
+
+def _csr(entries, shape):
+    rows, cols, data = [], [], []
+    for row, col, value in entries:
+        rows.append(row)
+        cols.append(col)
+        data.append(value)
+    rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+    return sparse.csr_matrix((np.asarray(data, dtype=np.float64), (rows, cols)), shape=shape)
+
+
+def _top_k(indices, scores, k):
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        indices, scores = indices[keep], scores[keep]
+    order = np.lexsort((indices, -scores))
+    return indices[order], scores[order]
+
+
+def _interactions(graph, users, folders):
+    return _csr(
+        (
+            (users.positions[user_id], folders.positions[folder_id], weight)
+            for user_id, weights in graph.items.items()
+            for folder_id, weight in weights.items()
+        ),
+        (len(users), len(folders)),
+    )
+
+
+def _numpy_neighbours(graph, folder_ids, k):
+    users = _Index(graph.items)
+    folders = _Index(graph.users_of)
+    matrix = _interactions(graph, users, folders)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    normalized = (matrix @ sparse.diags(1 / np.where(norms > 0, norms, 1))).tocsr()
+    transposed = normalized.T.tocsr()
+    allowed = np.isin(folders.ids, np.fromiter(graph.allowed, dtype=np.int64))
+
+    targets = folders.take(folder_ids)
+    result = {folder_id: [] for folder_id in folder_ids}
+    for start in range(0, len(targets), CHUNK_SIZE):
+        chunk = targets[start : start + CHUNK_SIZE]
+        similarity = (transposed[chunk] @ normalized).tocsr()
+        for row, position in enumerate(chunk):
+            begin, end = similarity.indptr[row], similarity.indptr[row + 1]
+            indices, scores = similarity.indices[begin:end], similarity.data[begin:end]
+            keep = allowed[indices] & (indices != position)
+            indices, scores = _top_k(indices[keep], scores[keep], k)
+            result[int(folders.ids[position])] = list(zip(folders.ids[indices].tolist(), scores.tolist()))
+    return result
+
+
+def _numpy_recommendations(graph, neighbours, user_ids, k):
+    folder_ids = set(graph.users_of) | graph.allowed
+    folder_ids.update(other_id for rows in neighbours.values() for other_id, _ in rows)
+    owners = {folder_id: owner_id for owner_id, owned in graph.owned.items() for folder_id in owned}
+    folder_ids.update(owners)
+    folders = _Index(folder_ids)
+    users = _Index(set(graph.items) | set(graph.follows) | set(graph.followers) | set(graph.owned) | set(user_ids))
+    shape = (len(users), len(folders))
+
+    interactions = _interactions(graph, users, folders)
+    owned = _csr(((users.positions[owner_id], folders.positions[folder_id], 1.0) for folder_id, owner_id in owners.items()), shape)
+    follows = _csr(
+        (
+            (users.positions[follower_id], users.positions[followed_id], FOLLOW_WEIGHT)
+            for follower_id, followed in graph.follows.items()
+            for followed_id in followed
+        ),
+        (len(users), len(users)),
+    )
+    similar = _csr(
+        (
+            (folders.positions[folder_id], folders.positions[other_id], similarity)
+            for folder_id, rows in neighbours.items()
+            if folder_id in folders.positions
+            for other_id, similarity in rows
+        ),
+        (len(folders), len(folders)),
+    )
+    followed_items = interactions + OWNER_WEIGHT * owned
+    excluded = (interactions + owned).tocsr()
+    allowed = np.isin(folders.ids, np.fromiter(graph.allowed, dtype=np.int64))
+
+    targets = users.take(user_ids)
+    result = {user_id: [] for user_id in user_ids}
+    for start in range(0, len(targets), CHUNK_SIZE):
+        chunk = targets[start : start + CHUNK_SIZE]
+        scores = (interactions[chunk] @ similar + follows[chunk] @ followed_items).tocsr()
+        for row, position in enumerate(chunk):
+            begin, end = scores.indptr[row], scores.indptr[row + 1]
+            indices, values = scores.indices[begin:end], scores.data[begin:end]
+            seen = excluded.indices[excluded.indptr[position] : excluded.indptr[position + 1]]
+            keep = allowed[indices] & ~np.isin(indices, seen) & (values > 0)
+            indices, values = _top_k(indices[keep], values[keep], k)
+            result[int(users.ids[position])] = list(zip(folders.ids[indices].tolist(), values.tolist()))
+    return result
+
+
+def compute_neighbours(graph, folder_ids, k, backend=None):
+    """``{folder_id: [(neighbour_id, similarity), ...]}``, best first."""
+    if (backend or default_backend()) == "numpy":
+        return _numpy_neighbours(graph, folder_ids, k)
+    return _python_neighbours(graph, folder_ids, k)
+
+
+def compute_recommendations(graph, neighbours, user_ids, k, backend=None):
+    """``{user_id: [(folder_id, score), ...]}``, best first."""
+    if (backend or default_backend()) == "numpy":
+        return _numpy_recommendations(graph, neighbours, user_ids, k)
+    return _python_recommendations(graph, neighbours, user_ids, k)
+
+
+# Storage -------------------------------------------------------------------
+
+
+@dataclass
+class RefreshResult:
+    full: bool
+    folders: int
+    users: int
+    backend: str
+
+
+def _stored_neighbours():
+    neighbours = defaultdict(list)
+    rows = FolderNeighbour.objects.order_by("folder_id", "-score")
+    for folder_id, neighbour_id, score in rows.values_list(
+        "folder_id", "neighbour_id", "score"
+    ).iterator():
+        neighbours[folder_id].append((neighbour_id, score))
+    return neighbours
+
+
+def _replace_rows(model, key, ranked, make_row, batch_size):
+    ids = list(ranked)
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start : start + batch_size]
+        with transaction.atomic():
+            model.objects.filter(**{f"{key}__in": chunk}).delete()
+            model.objects.bulk_create(
+                (make_row(owner_id, other_id, score) for owner_id in chunk for other_id, score in ranked[owner_id]),
+                batch_size=batch_size,
+            )
+
+
+def _changed_since(graph, since, now):
+    """Folders, and then users, whose rankings may have moved since ``since``."""
+    granularity = HOUR
+    if since < now - timedelta(hours=settings.ACTIVITY_HOURLY_RETENTION_HOURS):
+        granularity = DAY
+    dirty = set(
+        FolderActivityBucket.objects.filter(
+            granularity=granularity, bucket_start__gte=bucket_start(since, granularity)
+        ).values_list("folder_id", flat=True)
+    )
+    dirty.update(Folder.objects.filter(created_at__gte=since).values_list("id", flat=True))
+
+    touched_users = {user_id for folder_id in dirty for user_id in graph.users_of.get(folder_id, ())}
+    folders = dirty | {folder_id for user_id in touched_users for folder_id in graph.items[user_id]}
+    folders &= set(graph.users_of)
+
+    users = set(touched_users)
+    owners = {owner_id for owner_id, owned in graph.owned.items() if dirty.intersection(owned)}
+    for user_id in touched_users | owners:
+        users.update(graph.followers.get(user_id, ()))
+    # New accounts, and anyone whose last refresh found nothing to recommend.
+    have_rows = set(UserRecommendation.objects.values_list("user_id", flat=True).distinct())
+    users.update(user_id for user_id in graph.user_ids if user_id not in have_rows)
+    return folders, users
+
+
+def refresh_recommendations(full=False, k=None, batch_size=1000, backend=None):
+    k = k or settings.RECOMMENDATIONS_TOP_K
+    backend = backend or default_backend()
+    now = timezone.now()
+    since = None if full else FolderNeighbour.objects.aggregate(last=Max("computed_at"))["last"]
+
+    graph = load_graph()
+    if since is None:
+        folder_ids, user_ids = graph.folder_ids, graph.user_ids
+        neighbours = compute_neighbours(graph, folder_ids, k, backend)
+        all_neighbours = neighbours
+    else:
+        folder_ids, user_ids = _changed_since(graph, since, now)
+        neighbours = compute_neighbours(graph, sorted(folder_ids), k, backend)
+        all_neighbours = {**_stored_neighbours(), **neighbours}
+    recommendations = compute_recommendations(graph, all_neighbours, sorted(user_ids), k, backend)
+
+    _replace_rows(
+        FolderNeighbour,
+        "folder_id",
+        neighbours,
+        lambda folder_id, other_id, score: FolderNeighbour(
+            folder_id=folder_id, neighbour_id=other_id, score=score, computed_at=now
+        ),
+        batch_size,
+    )
+    _replace_rows(
+        UserRecommendation,
+        "user_id",
+        recommendations,
+        lambda user_id, folder_id, score: UserRecommendation(
+            user_id=user_id, folder_id=folder_id, score=score, computed_at=now
+        ),
+        batch_size,
+    )
+    if since is None:
+        # Folders and users that dropped out of the graph keep no stale rows.
+        FolderNeighbour.objects.filter(computed_at__lt=now).delete()
+        UserRecommendation.objects.filter(computed_at__lt=now).delete()
+    return RefreshResult(full=since is None, folders=len(neighbours), users=len(recommendations), backend=backend)
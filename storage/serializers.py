@@ -1,12 +1,16 @@
 ﻿from django.contrib.auth.hashers import make_password
 from rest_framework import serializers
 
+from accounts.avatars import avatar_url
+from core.instrumentation import InstrumentedSerializerMixin
+from core.serializers import SparseFieldsetMixin
+
 from .models import File, FileComment, Folder, FolderComment, FolderMessage
 
 
-class FolderSerializer(serializers.ModelSerializer):
+class FolderSerializer(SparseFieldsetMixin, InstrumentedSerializerMixin, serializers.ModelSerializer):
     owner_username = serializers.CharField(source="owner.username", read_only=True)
-    owner_profile_photo = serializers.ImageField(source="owner.profile_photo", read_only=True)
+    owner_profile_photo = serializers.SerializerMethodField()
     owner_id = serializers.IntegerField(source="owner.id", read_only=True)
     password = serializers.CharField(write_only=True, required=False, allow_blank=True)
 
@@ -41,6 +45,9 @@ class FolderSerializer(serializers.ModelSerializer):
             "folder_code",
         ]
 
+    def get_owner_profile_photo(self, obj):
+        return avatar_url(obj.owner, "small", self.context.get("request"))
+
     def create(self, validated_data):
         password = validated_data.pop("password", None)
         if password:
@@ -102,7 +109,7 @@ class FolderSerializer(serializers.ModelSerializer):
         return request.user.id == obj.owner_id
 
 
-class FileSerializer(serializers.ModelSerializer):
+class FileSerializer(SparseFieldsetMixin, InstrumentedSerializerMixin, serializers.ModelSerializer):
     comment_count = serializers.SerializerMethodField()
 
     class Meta:
@@ -118,14 +125,15 @@ class FileSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data["file"] = instance.file.url
+        if "file" in data:
+            data["file"] = instance.file.url
         return data
 
     def get_comment_count(self, obj):
         return obj.comments.count()
 
 
-class FolderCommentSerializer(serializers.ModelSerializer):
+class FolderCommentSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     owner_username = serializers.CharField(source="owner.username", read_only=True)
 
     class Meta:
@@ -134,7 +142,7 @@ class FolderCommentSerializer(serializers.ModelSerializer):
         read_only_fields = ["owner", "created_at", "owner_username"]
 
 
-class FileCommentSerializer(serializers.ModelSerializer):
+class FileCommentSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     owner_username = serializers.CharField(source="owner.username", read_only=True)
 
     class Meta:
@@ -143,7 +151,7 @@ class FileCommentSerializer(serializers.ModelSerializer):
         read_only_fields = ["owner", "created_at", "owner_username"]
 
 
-class FolderMessageSerializer(serializers.ModelSerializer):
+class FolderMessageSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     owner_username = serializers.CharField(source="owner.username", read_only=True)
 
     class Meta:
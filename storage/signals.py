@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.stats import counters_deferred
+
+from . import versions
+from .activity import record_activity
+from .models import File, FileComment, Folder, FolderComment
+
+User = get_user_model()
+Like = Folder.liked_by.through
+
+# Tables whose version changes when a row of the key model is deleted,
+# including the rows that go with it by cascade. Likes are only ever deleted
+# by cascade, so they get no receiver of their own and keep Django's fast
+# (signal-free) cascade delete. Views are not versioned at all: listings let
+# view counts lag by ``CONDITIONAL_VIEW_COUNT_SECONDS`` instead of writing a
+# version row on every view.
+DELETE_CASCADES = {
+    Folder: (Folder, File, Like, FolderComment, FileComment),
+    File: (File, FileComment),
+    FolderComment: (FolderComment,),
+    FileComment: (FileComment,),
+    User: (User, Folder, File, Like, FolderComment, FileComment),
+}
+
+# User fields that listings show next to folders and comments.
+USER_DISPLAY_FIELDS = {"username", "profile_photo", "avatar_variants"}
+
+
+def bump_on_save(sender, raw=False, **kwargs):
+    if not raw and not counters_deferred():
+        versions.bump(sender)
+
+
+def bump_on_delete(sender, **kwargs):
+    # Bulk admin deletes defer this and bump every table once afterwards.
+    if not counters_deferred():
+        versions.bump(*DELETE_CASCADES[sender])
+
+
+for model in (Folder, File, FolderComment, FileComment):
+    post_save.connect(bump_on_save, sender=model, dispatch_uid=f"bump-version-save:{model._meta.label}")
+for model in DELETE_CASCADES:
+    post_delete.connect(bump_on_delete, sender=model, dispatch_uid=f"bump-version-delete:{model._meta.label}")
+
+
+@receiver(post_save, sender=User)
+def bump_on_user_save(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    # New users own nothing yet, and logins only touch last_login.
+    if created or raw or counters_deferred():
+        return
+    if update_fields is None or USER_DISPLAY_FIELDS & set(update_fields):
+        versions.bump(User)
+
+
+def _existing_likes(instance, reverse, pk_set):
+    # ``remove()`` reports every id it was given, so look up the rows that really go away.
+    if reverse:
+        rows = Like.objects.filter(user_id=instance.pk)
+        column = "folder_id"
+    else:
+        rows = Like.objects.filter(folder_id=instance.pk)
+        column = "user_id"
+    if pk_set is not None:
+        rows = rows.filter(**{f"{column}__in": pk_set})
+    return list(rows.values_list(column, flat=True))
+
+
+@receiver(m2m_changed, sender=Like)
+def count_likes(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("pre_remove", "pre_clear"):
+        instance._removed_likes = _existing_likes(instance, reverse, pk_set)
+        return
+    if action == "post_add":
+        changed, sign = list(pk_set), 1
+    elif action in ("post_remove", "post_clear"):
+        changed, sign = instance.__dict__.pop("_removed_likes", []), -1
+    else:
+        return
+    if not changed:
+        return
+
+    versions.bump(Like)
+    if reverse:
+        record_activity(changed, likes=sign)
+    else:
+        record_activity(instance.pk, likes=sign * len(changed))
+
+
+@receiver(post_save, sender=FolderComment)
+def count_created_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_activity(instance.folder_id, instance.created_at, comments=1)
+
+
+@receiver(post_delete, sender=FolderComment)
+def count_deleted_comment(sender, instance, **kwargs):
+    # Only the comment's own buckets, and only while they are still retained.
+    # Bulk admin deletes defer this and subtract per folder and hour instead
+    # (see ``forget_activity``).
+    if counters_deferred():
+        return
+    record_activity(instance.folder_id, instance.created_at, create=False, comments=-1)
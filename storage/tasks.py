@@ -0,0 +1,16 @@
+from tasks.queue import task
+
+from .activity import record_activity
+from .models import FolderView
+
+
+@task(priority=-5, max_attempts=1)
+def record_folder_view(folder_id, user_id):
+    view, created = FolderView.objects.get_or_create(folder_id=folder_id, user_id=user_id)
+    if created:
+        record_activity(folder_id, view.viewed_at, views=1)
+
+
+def enqueue_folder_view(folder_id, user_id):
+    # The key makes repeat views a no-op insert instead of a lookup.
+    record_folder_view.enqueue(folder_id, user_id, idempotency_key=f"folder-view:{folder_id}:{user_id}")
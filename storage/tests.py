@@ -1,3 +1,545 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import brotli
+import msgpack
+import zstandard
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.authentication import add_user_claims
+from accounts.models import UserStats
+from core import compression, throttling
+
+from . import access_log, activity, versions
+from .importer import BoundedReader, TreeImportError
+from .models import AccessEvent, File, Folder, FolderActivityBucket, FolderComment, FolderDailyStats, FolderView
+from .recommendations import Graph, compute_neighbours, compute_recommendations, default_backend
+
+User = get_user_model()
+
+
+def make_zip(members, compression=zipfile.ZIP_DEFLATED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+class MediaTestCase(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+class FolderCodeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.taken = Folder.objects.create(name="first", owner=self.user)
+
+    def codes(self, *codes):
+        return mock.patch("storage.models.generate_folder_code", side_effect=codes)
+
+    def test_new_folder_gets_a_code(self):
+        self.assertRegex(self.taken.folder_code, r"^[0-9A-F]{8}$")
+
+    def test_save_retries_after_a_collision(self):
+        with self.codes(self.taken.folder_code, "NEWCODE1"):
+            folder = Folder.objects.create(name="second", owner=self.user)
+        self.assertEqual(folder.folder_code, "NEWCODE1")
+
+    def test_save_gives_up_after_repeated_collisions(self):
+        with self.codes(*[self.taken.folder_code] * 5), self.assertRaises(IntegrityError):
+            Folder.objects.create(name="second", owner=self.user)
+
+    def test_bulk_create_assigns_distinct_codes_and_retries(self):
+        with self.codes(self.taken.folder_code, "NEWCODE1", "NEWCODE2", "NEWCODE3"):
+            Folder.objects.bulk_create([Folder(name="a", owner=self.user), Folder(name="b", owner=self.user)])
+        self.assertEqual(
+            set(Folder.objects.filter(name__in=["a", "b"]).values_list("folder_code", flat=True)),
+            {"NEWCODE2", "NEWCODE3"},
+        )
+
+
+class FolderTreeImportTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, data):
+        archive = SimpleUploadedFile("tree.zip", data, content_type="application/zip")
+        return self.client.post("/api/folders/import/", {"archive": archive}, format="multipart")
+
+    def test_imports_tree(self):
+        response = self.upload(make_zip({"docs/a.txt": b"hello", "docs/sub/b.txt": b"world!"}))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["folders"], response.data["files"], response.data["bytes"]), (2, 2, 11))
+        self.assertEqual(File.objects.filter(owner=self.user).count(), 2)
+
+    def test_rejects_highly_compressed_member(self):
+        response = self.upload(make_zip({"docs/zeros.bin": b"\0" * (4 * 1024 * 1024)}))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Folder.objects.exists())
+        self.assertFalse(File.objects.exists())
+
+    @override_settings(IMPORT_MAX_TOTAL_BYTES=10)
+    def test_rejects_archive_over_total_size(self):
+        response = self.upload(make_zip({"docs/a.txt": b"hello", "docs/b.txt": b"world!"}))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Folder.objects.exists())
+
+    def test_bounded_reader_rejects_extra_bytes(self):
+        self.assertEqual(BoundedReader(io.BytesIO(b"abc"), 3).read(), b"abc")
+        with self.assertRaises(TreeImportError):
+            BoundedReader(io.BytesIO(b"abcd"), 3).read()
+        reader = BoundedReader(io.BytesIO(b"abcd"), 3)
+        self.assertEqual(reader.read(2), b"ab")
+        with self.assertRaises(TreeImportError):
+            reader.read(2)
+
+
+class FeedConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.folder = Folder.objects.create(name="docs", owner=self.user)
+        self.client = APIClient()
+
+    def etag(self):
+        response = self.client.get("/api/folders/feed/")
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_revalidation_is_one_query(self):
+        etag = self.etag()
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/folders/feed/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_delete_then_insert_changes_etag(self):
+        etag = self.etag()
+        self.folder.delete()
+        Folder.objects.create(name="docs", owner=self.user)
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_like_changes_etag(self):
+        etag = self.etag()
+        self.folder.liked_by.add(self.user)
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_owner_rename_changes_etag(self):
+        etag = self.etag()
+        self.user.username = "alicia"
+        self.user.save()
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_logins_and_views_keep_etag_within_the_window(self):
+        with mock.patch("storage.views.time.time", return_value=1000):
+            etag = self.etag()
+            self.user.save(update_fields=["last_login"])
+            FolderView.objects.create(folder=self.folder, user=self.user)
+            self.assertEqual(self.etag(), etag)
+        with mock.patch("storage.views.time.time", return_value=1000 + settings.CONDITIONAL_VIEW_COUNT_SECONDS):
+            self.assertNotEqual(self.etag(), etag)
+
+    def test_version_is_the_sum_of_its_shards(self):
+        for shard in range(3):
+            with mock.patch("storage.versions.random.choice", side_effect=lambda names: names[shard]):
+                versions.bump(Folder)
+        self.assertEqual(versions.current(Folder, File), (4, 0))
+
+    def test_failed_write_does_not_bump(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Folder.objects.create(name="gone", owner=self.user)
+            raise RuntimeError
+        self.assertEqual(versions.current(Folder), (1,))
+
+
+class ActivityBucketTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.folder = Folder.objects.create(name="docs", owner=self.user)
+
+    def buckets(self):
+        return set(
+            FolderActivityBucket.objects.filter(folder=self.folder).values_list(
+                "granularity", "views", "likes", "comments"
+            )
+        )
+
+    def test_events_fill_hour_and_day_buckets(self):
+        activity.record_activity(self.folder.id, views=2)
+        activity.record_activity(self.folder.id, likes=1)
+        activity.record_activity(self.folder.id, comments=1)
+        activity.record_activity(self.folder.id, create=False, comments=-2)
+        self.assertEqual(self.buckets(), {("hour", 2, 1, 0), ("day", 2, 1, 0)})
+
+    def test_removals_never_go_negative_or_create_buckets(self):
+        activity.record_activity(self.folder.id, likes=-1)
+        self.assertEqual(self.buckets(), set())
+
+        activity.record_activity(self.folder.id, views=1)
+        self.folder.liked_by.add(self.user)
+        with mock.patch("storage.activity.timezone.now", return_value=timezone.now() + timedelta(days=2)):
+            activity.record_activity(self.folder.id, views=1)
+            self.folder.liked_by.remove(self.user)
+            self.assertEqual(activity.trending(Folder.objects.all(), "24h", 5), [(self.folder.id, 1, 0, 0)])
+
+    def test_windows_and_pruning(self):
+        activity.record_activity(self.folder.id, timezone.now() - timedelta(days=3), views=1)
+        activity.record_activity(self.folder.id, timezone.now() - timedelta(days=60), views=5)
+        folders = Folder.objects.all()
+        self.assertEqual(activity.trending(folders, "24h", 10), [])
+        self.assertEqual(activity.trending(folders, "7d", 10), [(self.folder.id, 1, 0, 0)])
+
+        self.assertEqual(activity.prune_activity(), 3)
+        self.assertEqual(self.buckets(), {("day", 1, 0, 0)})
+
+    def test_rebuild_recounts_views_and_comments_and_keeps_likes(self):
+        FolderView.objects.create(folder=self.folder, user=self.user)
+        FolderComment.objects.create(folder=self.folder, owner=self.user, text="hi")
+        self.folder.liked_by.add(self.user)
+        FolderActivityBucket.objects.update(views=7, comments=7)
+
+        self.assertEqual(activity.rebuild_activity(), 2)
+        self.assertEqual(self.buckets(), {("hour", 1, 1, 1), ("day", 1, 1, 1)})
+
+
+class FolderDetailTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.other = User.objects.create_user(username="bob", email="bob@example.com", password="x")
+        self.public = Folder.objects.create(name="open", owner=self.owner)
+        self.private = Folder.objects.create(name="closed", owner=self.owner, is_public=False, password="secret")
+
+    def status(self, url, user):
+        client = APIClient()
+        if user is not None:
+            # Async views authenticate the header themselves, so force_authenticate is not enough.
+            token = add_user_claims(RefreshToken.for_user(user), user).access_token
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client.get(url).status_code
+
+    def test_async_view_matches_sync_view(self):
+        cases = [
+            (self.public.id, None),
+            (self.private.id, None),
+            (self.private.id, "other"),
+            (self.private.id, "owner"),
+            (999999, None),
+        ]
+        for pk, who in cases:
+            user = {"owner": self.owner, "other": self.other}.get(who)
+            with self.subTest(pk=pk, user=who):
+                self.assertEqual(
+                    self.status(f"/api/async/folders/{pk}/", user),
+                    self.status(f"/api/folders/{pk}/", user),
+                )
+        self.assertEqual(self.status(f"/api/async/folders/{self.private.id}/", None), 404)
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.quiet = Folder.objects.create(name="quiet", owner=self.user)
+        self.busy = Folder.objects.create(name="busy", owner=self.user)
+        self.client = APIClient()
+
+    def test_ranks_by_window_activity(self):
+        FolderComment.objects.create(folder=self.busy, owner=self.user, text="hi")
+        self.busy.liked_by.add(self.user)
+
+        response = self.client.get("/api/folders/trending/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["id"], self.busy.id)
+        self.assertEqual(response.data[0]["window_activity"], {"views": 0, "likes": 1, "comments": 1})
+
+    def test_rejects_bad_limit(self):
+        for limit in ("-1", "0", "abc"):
+            self.assertEqual(self.client.get(f"/api/folders/trending/?limit={limit}").status_code, 400)
+        self.assertEqual(self.client.get("/api/folders/trending/?window=1y").status_code, 400)
+
+
+class RecommendedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.folder = Folder.objects.create(name="docs", owner=self.user)
+        self.client = APIClient()
+
+    def test_rejects_bad_parameters(self):
+        for query in ("folder=abc", "folder=0", f"folder={self.folder.id}&limit=-1", f"folder={self.folder.id}&limit=x"):
+            self.assertEqual(self.client.get(f"/api/folders/recommended/?{query}").status_code, 400, query)
+
+    def test_folder_neighbours(self):
+        response = self.client.get(f"/api/folders/recommended/?folder={self.folder.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [])
+        self.assertEqual(self.client.get("/api/folders/recommended/?folder=999999").status_code, 404)
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={"ip": "3/min", "read": "3/min", "feed": "1/min"})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(throttling, "_store", throttling.LocalBucketStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def test_denied_request_keeps_ip_tokens(self):
+        self.assertEqual(self.client.get("/api/folders/feed/").status_code, 200)
+        self.assertEqual(self.client.get("/api/folders/feed/").status_code, 429)
+        self.assertEqual(self.client.get("/api/folders/").status_code, 200)
+        self.assertEqual(self.client.get("/api/folders/").status_code, 200)
+        self.assertEqual(self.client.get("/api/folders/").status_code, 429)
+
+    def test_spoofed_forwarded_for_does_not_reset_the_buckets(self):
+        statuses = [
+            self.client.get("/api/folders/", HTTP_X_FORWARDED_FOR=f"10.0.0.{n}").status_code for n in range(5)
+        ]
+        self.assertEqual(statuses, [200, 200, 200, 429, 429])
+
+    def test_forwarded_for_is_trusted_up_to_num_proxies(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1}):
+            for _ in range(3):
+                self.assertEqual(self.client.get("/api/folders/", HTTP_X_FORWARDED_FOR="10.0.0.1").status_code, 200)
+            self.assertEqual(self.client.get("/api/folders/", HTTP_X_FORWARDED_FOR="10.0.0.1").status_code, 429)
+            self.assertEqual(self.client.get("/api/folders/", HTTP_X_FORWARDED_FOR="1.2.3.4, 10.0.0.2").status_code, 200)
+
+    def test_full_local_store_evicts_least_recently_used(self):
+        store = throttling.LocalBucketStore()
+        store.max_buckets = 2
+        bucket = ("drained", 1, 1 / 60)
+        self.assertEqual(store.consume([bucket]), 0)
+        store.consume([("idle", 1, 1 / 60)])
+        self.assertGreater(store.consume([bucket]), 0)
+        store.consume([("new", 1, 1 / 60)])
+        self.assertEqual(list(store._buckets), ["drained", "new"])
+        self.assertGreater(store.consume([bucket]), 0)
+
+    def test_async_views_share_the_buckets(self):
+        self.assertEqual(self.client.get("/api/folders/feed/").status_code, 200)
+        response = self.client.get("/api/async/folders/feed/")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+        self.assertEqual(self.client.get("/api/async/files/").status_code, 200)
+
+
+class AdminBulkActionTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(username="root", email="root@example.com", password="x")
+        self.alice = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.bob = User.objects.create_user(username="bob", email="bob@example.com", password="x")
+        self.client.force_login(self.admin)
+        self.top = Folder.objects.create(name="top", owner=self.alice)
+        self.child = Folder.objects.create(name="child", owner=self.alice, parent=self.top)
+
+    def run_action(self, model, action, ids, **extra):
+        response = self.client.post(f"/admin/storage/{model}/", {"action": action, "_selected_action": ids, **extra})
+        self.assertEqual(response.status_code, 302)
+
+    def test_reassign_folder_moves_subtree(self):
+        self.run_action("folder", "reassign_owner", [self.top.id], new_owner="bob")
+        self.assertEqual(set(Folder.objects.values_list("owner__username", flat=True)), {"bob"})
+        self.assertEqual(UserStats.objects.get(user=self.bob).folder_count, 2)
+        self.assertEqual(UserStats.objects.get(user=self.alice).folder_count, 0)
+
+    def test_unknown_owner_changes_nothing(self):
+        self.run_action("folder", "reassign_owner", [self.top.id], new_owner="nobody")
+        self.assertEqual(Folder.objects.filter(owner=self.alice).count(), 2)
+
+    def test_bulk_delete_folder_tree(self):
+        self.run_action("folder", "bulk_delete", [self.top.id])
+        self.assertFalse(Folder.objects.exists())
+        self.assertEqual(UserStats.objects.get(user=self.alice).folder_count, 0)
+
+
+class ResponseFormatTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        Folder.objects.create(name="docs", owner=user)
+        self.client = APIClient()
+
+    def test_json_msgpack_and_columnar_agree(self):
+        rows = self.client.get("/api/folders/feed/").json()
+        self.assertEqual([row["name"] for row in rows], ["docs"])
+
+        response = self.client.get("/api/folders/feed/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), json.loads(json.dumps(rows)))
+
+        columnar = self.client.get("/api/folders/feed/?format=columnar").json()
+        self.assertEqual(columnar["count"], 1)
+        self.assertEqual(columnar["fields"]["name"], ["docs"])
+
+    def test_accept_header_negotiation_and_field_selection(self):
+        response = self.client.get("/api/folders/feed/?fields=id,name", HTTP_ACCEPT="application/vnd.columnar+json")
+        self.assertEqual(response["Content-Type"], "application/vnd.columnar+json")
+        self.assertEqual(set(response.json()["fields"]), {"id", "name"})
+
+        # Errors keep their usual shape in the columnar format.
+        response = self.client.get("/api/folders/999999/?format=columnar")
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("detail", response.json())
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_compression_prefers_zstd_then_br(self):
+        plain = self.client.get("/api/folders/feed/").content
+        decoders = {"zstd": zstandard.decompress, "br": brotli.decompress, "gzip": gzip.decompress}
+        for header, encoding in (("gzip, br, zstd", "zstd"), ("gzip, br", "br"), ("gzip", "gzip")):
+            response = self.client.get("/api/folders/feed/", HTTP_ACCEPT_ENCODING=header)
+            self.assertEqual(response["Content-Encoding"], encoding)
+            self.assertEqual(decoders[encoding](response.content), plain)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=0)
+class CompressionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        Folder.objects.create(name="docs", owner=user)
+        self.client = APIClient()
+        self.encode = mock.Mock(side_effect=gzip.compress)
+        patcher = mock.patch.object(compression, "ENCODERS", [("gzip", self.encode, True)])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, url, **headers):
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip", **headers)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        return response
+
+    def test_responses_with_etag_reuse_compressed_bytes(self):
+        first = self.get("/api/folders/feed/")
+        second = self.get("/api/folders/feed/")
+        self.assertEqual(self.encode.call_count, 1)
+        self.assertEqual(second.content, first.content)
+        self.assertTrue(second["ETag"].startswith("W/"))
+
+        Folder.objects.create(name="more", owner=User.objects.get())
+        self.assertIn(b"more", gzip.decompress(self.get("/api/folders/feed/").content))
+        self.assertEqual(self.encode.call_count, 2)
+
+    def test_responses_without_etag_are_not_cached(self):
+        self.get("/api/folders/")
+        self.get("/api/folders/")
+        self.assertEqual(self.encode.call_count, 2)
+
+    def test_refused_encodings_are_not_used(self):
+        response = self.client.get("/api/folders/feed/", HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+
+class StopFlushing(Exception):
+    pass
+
+
+@override_settings(ACCESS_LOG_BATCH_SIZE=3, ACCESS_LOG_FLUSH_SECONDS=60)
+class AccessLogTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice", email="alice@example.com", password="x")
+        self.folder = Folder.objects.create(name="docs", owner=self.user)
+        self.buffer = access_log.AccessLogBuffer()
+
+    def event(self, folder=None, when=None, visitor="v"):
+        return AccessEvent(
+            folder_id=(folder or self.folder).id,
+            visitor=visitor,
+            kind=AccessEvent.VIEW,
+            created_at=when or timezone.now(),
+        )
+
+    def visitor(self, **meta):
+        request = RequestFactory().get("/", **{"REMOTE_ADDR": "10.0.0.1", **meta})
+        request.user = AnonymousUser()
+        return access_log.visitor_key(request)
+
+    def test_visitor_key_ignores_forwarded_for(self):
+        self.assertEqual(self.visitor(HTTP_X_FORWARDED_FOR="1.2.3.4"), self.visitor())
+        self.assertNotEqual(self.visitor(REMOTE_ADDR="10.0.0.2"), self.visitor())
+
+    def test_full_buffer_wakes_the_writer_once_per_batch(self):
+        with mock.patch("storage.access_log.threading.Thread") as thread:
+            self.buffer.add(self.event())
+            self.buffer.add(self.event())
+            self.assertFalse(self.buffer._wake.is_set())
+            self.buffer.add(self.event())
+            self.assertTrue(self.buffer._wake.is_set())
+        thread.return_value.start.assert_called_once_with()
+        self.assertFalse(AccessEvent.objects.exists())
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(AccessEvent.objects.count(), 3)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_writer_flushes_every_interval(self):
+        self.buffer._events = [self.event()]
+        self.buffer._wake = mock.Mock(wait=mock.Mock(side_effect=[False, StopFlushing]))
+        with mock.patch("storage.access_log.connections"), self.assertRaises(StopFlushing):
+            self.buffer._run()
+        self.buffer._wake.wait.assert_called_with(60)
+        self.assertEqual(AccessEvent.objects.count(), 1)
+
+    @override_settings(ACCESS_LOG_FLUSH_SECONDS=0)
+    def test_no_interval_writes_each_event_straight_away(self):
+        self.buffer.add(self.event())
+        self.assertEqual(AccessEvent.objects.count(), 1)
+
+    def test_rollup_skips_deleted_folders(self):
+        gone = Folder.objects.create(name="gone", owner=self.user)
+        AccessEvent.objects.bulk_create([self.event(), self.event(visitor="w"), self.event(folder=gone)])
+        gone.delete()
+
+        self.assertEqual(access_log.rollup_day(timezone.localdate()), 1)
+        stats = FolderDailyStats.objects.get()
+        self.assertEqual((stats.folder_id, stats.views, stats.unique_visitors), (self.folder.id, 2, 2))
+
+    def test_pruned_days_cannot_be_rolled_up(self):
+        day = access_log.oldest_kept_day() - timedelta(days=1)
+        with self.assertRaises(ValueError):
+            access_log.rollup_day(day)
+        self.assertEqual(access_log.rollup_day(day + timedelta(days=1)), 0)
+
+
+class RecommendationBackendTests(TestCase):
+    def test_numpy_and_python_backends_agree(self):
+        graph = Graph(
+            likes=[(1, 10), (2, 10), (2, 11), (3, 11), (3, 12)],
+            views=[(1, 11), (4, 12), (4, 10)],
+            follows=[(1, 3), (4, 2)],
+            folders=[(10, 5, True), (11, 5, True), (12, 6, True)],
+        )
+        self.assertEqual(default_backend(), "numpy")
+
+        results = {}
+        for backend in ("python", "numpy"):
+            neighbours = compute_neighbours(graph, graph.folder_ids, 5, backend)
+            recommendations = compute_recommendations(graph, neighbours, graph.user_ids, 5, backend)
+            results[backend] = (neighbours, recommendations)
+
+        for python, numpy in zip(results["python"], results["numpy"]):
+            self.assertEqual(python.keys(), numpy.keys())
+            for key in python:
+                self.assertEqual([pk for pk, _ in python[key]], [pk for pk, _ in numpy[key]])
+                for (_, a), (_, b) in zip(python[key], numpy[key]):
+                    self.assertAlmostEqual(a, b, places=6)
@@ -1,4 +1,7 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
+
+from . import async_views
 from .views import (
     FileCommentViewSet,
     FileViewSet,
@@ -12,4 +15,9 @@ router.register(r'files', FileViewSet, basename='files')
 router.register(r'folder-comments', FolderCommentViewSet, basename='folder-comments')
 router.register(r'file-comments', FileCommentViewSet, basename='file-comments')
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    # Async (ASGI) variants of the hot read endpoints.
+    path('async/folders/feed/', async_views.folder_feed, name='async-folder-feed'),
+    path('async/folders/<int:pk>/', async_views.folder_detail, name='async-folder-detail'),
+    path('async/files/', async_views.file_list, name='async-file-list'),
+]
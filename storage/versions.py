@@ -0,0 +1,64 @@
+"""
+Change counters for the tables behind the feed's conditional GETs.
+
+Counting and taking ``MAX(updated_at)`` over whole tables on every request
+is as slow as the request it is meant to skip, and misses a delete followed
+by an insert. Instead each write that changes what a listing renders bumps
+a counter of that table in ``TableVersion`` (from the signals in
+``storage.signals``), and a view validates a whole-table listing with one
+indexed lookup. The bump runs in the writer's transaction, so it rolls back
+with it. Writes that skip model signals (``bulk_create``, ``QuerySet.update``)
+and bulk admin actions call ``bump`` themselves.
+
+Each table's counter is split over ``SHARDS`` rows and a writer bumps a
+random one, so concurrent writers rarely wait on the same row lock; the
+version is the sum of the shards.
+"""
+
+import random
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import File, FileComment, Folder, FolderComment, TableVersion
+
+# Users are tracked for the owner names and avatars joined into listings.
+TRACKED = (Folder, File, Folder.liked_by.through, FolderComment, FileComment, get_user_model())
+SHARDS = 16
+
+
+def table_name(model):
+    return model._meta.label_lower
+
+
+def shard_names(model):
+    name = table_name(model)
+    return [name, *(f"{name}#{shard}" for shard in range(1, SHARDS))]
+
+
+def bump(*models):
+    for model in dict.fromkeys(models):
+        name = random.choice(shard_names(model))
+        rows = TableVersion.objects.filter(name=name)
+        if rows.update(version=F("version") + 1):
+            continue
+        try:
+            with transaction.atomic():
+                TableVersion.objects.create(name=name, version=1)
+        except IntegrityError:
+            # Another writer created the row first.
+            rows.update(version=F("version") + 1)
+
+
+def bump_all():
+    bump(*TRACKED)
+
+
+def current(*models):
+    """The version of each model's table, in order; 0 for tables never written."""
+    shards = {name: model for model in models for name in shard_names(model)}
+    totals = dict.fromkeys(models, 0)
+    for name, version in TableVersion.objects.filter(name__in=shards).values_list("name", "version"):
+        totals[shards[name]] += version
+    return tuple(totals[model] for model in models)
@@ -1,5 +1,13 @@
-﻿from django.contrib.auth.hashers import check_password
+﻿import csv
+import json
+import time
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
 from django.db.models import Count, Q
+from django.http import FileResponse, StreamingHttpResponse
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
 from rest_framework.parsers import FormParser, MultiPartParser
@@ -7,7 +15,25 @@ from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnl
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
-from .models import File, FileComment, Folder, FolderComment, FolderMessage, FolderView
+from core.archival import history_page, history_params
+from core.conditional import ConditionalGetMixin, table_version
+from core.db.routers import ReplicaReadMixin
+from notifications import hooks as notify
+
+from . import versions
+from .access_log import DOWNLOAD, STATS_FIELDS, record_access
+from .activity import COUNTERS, WINDOWS, trending
+from .importer import TreeImportError, import_zip
+from .models import (
+    ArchivedFolderMessage,
+    File,
+    FileComment,
+    Folder,
+    FolderComment,
+    FolderDailyStats,
+    FolderMessage,
+    FolderView,
+)
 from .permissions import IsOwnerOrReadOnly
 from .serializers import (
     FileCommentSerializer,
@@ -16,12 +42,51 @@ from .serializers import (
     FolderMessageSerializer,
     FolderSerializer,
 )
+from .tasks import enqueue_folder_view
+
+User = get_user_model()
+
+EXPORT_COLUMNS = ("folder_id", "date", *STATS_FIELDS)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
 
+def _csv_rows(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
 
-class FolderViewSet(ModelViewSet):
+
+def _ndjson_rows(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + "\n"
+
+
+EXPORT_FORMATS = {"csv": (_csv_rows, "text/csv"), "ndjson": (_ndjson_rows, "application/x-ndjson")}
+
+
+class FolderViewSet(ConditionalGetMixin, ReplicaReadMixin, ModelViewSet):
     queryset = Folder.objects.all()
     serializer_class = FolderSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    replica_actions = (
+        "list",
+        "retrieve",
+        "feed",
+        "trending",
+        "recommended",
+        "following_feed",
+        "my_folders",
+        "liked",
+        "messages",
+        "analytics_export",
+    )
+    rate_limit_scopes = {"feed": "feed", "trending": "feed", "recommended": "feed", "following_feed": "feed", "like": "like"}
+    conditional_actions = {"feed": "feed_validators"}
     filter_backends = [SearchFilter]
     search_fields = ["name", "folder_code"]
 
@@ -39,7 +104,7 @@ class FolderViewSet(ModelViewSet):
             if parent_folder.is_public:
                 return queryset.filter(parent_id=parent_id)
 
-            if self.request.user == parent_folder.owner:
+            if self.request.user.id == parent_folder.owner_id:
                 return queryset.filter(parent_id=parent_id)
 
             if password and parent_folder.password and check_password(password, parent_folder.password):
@@ -55,6 +120,26 @@ class FolderViewSet(ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    def tree_validators(self):
+        # Subfolder and file counts cover whole subtrees, so any change to either table counts;
+        # User covers the owner names and photos shown with each folder.
+        return versions.current(Folder, File, User)
+
+    def feed_validators(self, request):
+        # Folder covers is_public and is_listed_in_feed; the rest feed the ordering counts.
+        # Views are too frequent to version, so view counts refresh once per window instead.
+        window = int(time.time() // settings.CONDITIONAL_VIEW_COUNT_SECONDS)
+        return (*versions.current(Folder, File, Folder.liked_by.through, FolderComment, User), window)
+
+    def folder_validators(self, folder):
+        return (
+            folder.updated_at,
+            table_version(FolderView.objects.filter(folder_id=folder.id)),
+            table_version(Folder.liked_by.through.objects.filter(folder_id=folder.id)),
+            table_version(FolderComment.objects.filter(folder_id=folder.id)),
+            *self.tree_validators(),
+        )
+
     @action(detail=False, methods=["get"])
     def feed(self, request):
         folders = (
@@ -71,29 +156,88 @@ class FolderViewSet(ModelViewSet):
         serializer = self.get_serializer(folders, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["get"])
+    def trending(self, request):
+        window = request.query_params.get("window", "24h")
+        if window not in WINDOWS:
+            return Response({"error": f"window must be one of: {', '.join(WINDOWS)}."}, status=400)
+        try:
+            limit = int(request.query_params.get("limit") or 50)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response({"error": "limit must be a positive integer."}, status=400)
+        limit = min(limit, 100)
+
+        folders = Folder.objects.filter(is_listed_in_feed=True)
+        if not request.user.is_authenticated:
+            folders = folders.filter(is_public=True)
+        ranked = trending(folders, window, limit)
+        by_id = folders.select_related("owner").in_bulk([row[0] for row in ranked])
+        ranked = [row for row in ranked if row[0] in by_id]
+        serializer = self.get_serializer([by_id[row[0]] for row in ranked], many=True)
+        data = [
+            {**item, "window_activity": dict(zip(COUNTERS, row[1:]))}
+            for item, row in zip(serializer.data, ranked)
+        ]
+        return Response(data)
+
+    @action(detail=False, methods=["get"])
+    def recommended(self, request):
+        """Folders similar to ``?folder=``, or picked for the current user without it."""
+        folder_id = request.query_params.get("folder")
+        try:
+            limit = int(request.query_params.get("limit") or 20)
+            folder_id = int(folder_id) if folder_id else None
+        except ValueError:
+            limit = 0
+        if limit < 1 or (folder_id is not None and folder_id < 1):
+            return Response({"error": "limit and folder must be positive integers."}, status=400)
+        limit = min(limit, settings.RECOMMENDATIONS_TOP_K)
+
+        folders = Folder.objects.filter(is_public=True, is_listed_in_feed=True).select_related("owner")
+        if folder_id is not None:
+            source = Folder.objects.filter(id=folder_id).only("is_public", "owner_id").first()
+            if source is None or not (source.is_public or source.owner_id == request.user.id):
+                return Response({"detail": "No Folder matches the given query."}, status=404)
+            folders = folders.filter(neighbour_of__folder_id=source.id).order_by("-neighbour_of__score")
+        elif request.user.is_authenticated:
+            folders = folders.filter(recommendations__user_id=request.user.id).order_by("-recommendations__score")
+        else:
+            return Response({"error": "Log in or pass ?folder= to get recommendations."}, status=400)
+
+        serializer = self.get_serializer(folders[:limit], many=True)
+        return Response(serializer.data)
+
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
     def following_feed(self, request):
-        followed_ids = request.user.follows.values_list("id", flat=True)
+        followed_ids = User.follows.through.objects.filter(
+            from_user_id=request.user.id
+        ).values("to_user_id")
         folders = Folder.objects.filter(
             is_listed_in_feed=True,
             owner_id__in=followed_ids,
-        ).filter(Q(is_public=True) | Q(owner=request.user)).order_by("-created_at")
+        ).filter(Q(is_public=True) | Q(owner_id=request.user.id)).order_by("-created_at")
         serializer = self.get_serializer(folders, many=True)
         return Response(serializer.data)
 
     def retrieve(self, request, *args, **kwargs):
         folder = self.get_object()
 
-        if folder.is_public or request.user == folder.owner:
+        if folder.is_public or request.user.id == folder.owner_id:
+            record_access(request, folder.id)
             if request.user.is_authenticated:
-                FolderView.objects.get_or_create(folder=folder, user=request.user)
+                enqueue_folder_view(folder.id, request.user.id)
+            self.check_not_modified(*self.folder_validators(folder))
             return super().retrieve(request, *args, **kwargs)
 
         password = request.query_params.get("password")
 
         if password and folder.password and check_password(password, folder.password):
+            record_access(request, folder.id)
             if request.user.is_authenticated:
-                FolderView.objects.get_or_create(folder=folder, user=request.user)
+                enqueue_folder_view(folder.id, request.user.id)
+            self.check_not_modified(*self.folder_validators(folder))
             return super().retrieve(request, *args, **kwargs)
 
         return Response(
@@ -103,7 +247,7 @@ class FolderViewSet(ModelViewSet):
 
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
     def my_folders(self, request):
-        folders = Folder.objects.filter(owner=request.user)
+        folders = Folder.objects.filter(owner_id=request.user.id)
         serializer = self.get_serializer(folders, many=True)
         return Response(serializer.data)
 
@@ -112,22 +256,114 @@ class FolderViewSet(ModelViewSet):
         folder = self.get_object()
 
         if folder.liked_by.filter(id=request.user.id).exists():
-            folder.liked_by.remove(request.user)
+            folder.liked_by.remove(request.user.id)
             liked = False
         else:
-            folder.liked_by.add(request.user)
+            folder.liked_by.add(request.user.id)
             liked = True
+            notify.folder_liked(folder, request.user.id)
 
         return Response({"liked": liked, "like_count": folder.liked_by.count()})
 
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[IsAuthenticated],
+        parser_classes=[MultiPartParser, FormParser],
+        url_path="import",
+    )
+    def import_tree(self, request):
+        archive = request.FILES.get("archive")
+        if archive is None:
+            return Response({"error": "Upload a ZIP file as 'archive'."}, status=400)
+
+        parent = None
+        parent_id = request.data.get("parent")
+        if parent_id:
+            parent = Folder.objects.filter(id=parent_id, owner_id=request.user.id).first()
+            if parent is None:
+                return Response({"error": "Parent folder not found."}, status=404)
+
+        is_public = str(request.data.get("is_public", "true")).lower() != "false"
+        try:
+            result = import_zip(archive, owner=request.user, parent=parent, is_public=is_public)
+        except TreeImportError as exc:
+            return Response({"error": str(exc)}, status=400)
+
+        return Response(
+            {
+                "folders": result.folders,
+                "files": result.files,
+                "bytes": result.bytes,
+                "root_ids": result.root_ids,
+                "skipped": result.skipped,
+            },
+            status=201,
+        )
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated], url_path="analytics/export")
+    def analytics_export(self, request):
+        """
+        Stream the daily stats of the user's folders (or ``?folder=``) as
+        ``?as=csv`` or ``?as=ndjson``, optionally limited to ``?from=`` and
+        ``?to=`` (inclusive ISO dates).
+        """
+        export_as = request.query_params.get("as", "csv")
+        if export_as not in EXPORT_FORMATS:
+            return Response({"error": "as must be 'csv' or 'ndjson'."}, status=400)
+        stats = FolderDailyStats.objects.filter(folder__owner_id=request.user.id)
+        try:
+            if request.query_params.get("folder"):
+                stats = stats.filter(folder_id=int(request.query_params["folder"]))
+            if request.query_params.get("from"):
+                stats = stats.filter(date__gte=date.fromisoformat(request.query_params["from"]))
+            if request.query_params.get("to"):
+                stats = stats.filter(date__lte=date.fromisoformat(request.query_params["to"]))
+        except ValueError:
+            return Response({"error": "folder must be a number and from/to YYYY-MM-DD dates."}, status=400)
+
+        rows = stats.order_by("folder_id", "date").values_list("folder_id", "date", *STATS_FIELDS)
+        render, content_type = EXPORT_FORMATS[export_as]
+        response = StreamingHttpResponse(render(rows.iterator(chunk_size=2000)), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="folder-stats.{export_as}"'
+        return response
+
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
     def liked(self, request):
-        folders = Folder.objects.filter(liked_by=request.user)
+        folders = Folder.objects.filter(liked_by=request.user.id)
         serializer = self.get_serializer(folders, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
+    def messages(self, request, pk=None):
+        folder = self.get_object()
+        if not (folder.is_public or request.user.id == folder.owner_id):
+            password = request.query_params.get("password")
+            if not (password and folder.password and check_password(password, folder.password)):
+                return Response(
+                    {"error": "This folder is private. Password required or incorrect."},
+                    status=403,
+                )
+        try:
+            before, limit = history_params(request.query_params)
+        except ValueError:
+            return Response({"error": "before and limit must be positive integers."}, status=400)
+
+        messages, next_before = history_page(
+            FolderMessage.objects.filter(folder_id=folder.id).select_related("owner"),
+            ArchivedFolderMessage.objects.filter(folder_id=folder.id).select_related("owner"),
+            before,
+            limit,
+        )
+        return Response(
+            {
+                "results": FolderMessageSerializer(messages, many=True).data,
+                "next_before": next_before,
+            }
+        )
+
 
-class FileViewSet(ModelViewSet):
+class FileViewSet(ReplicaReadMixin, ModelViewSet):
     serializer_class = FileSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
     parser_classes = [MultiPartParser, FormParser]
@@ -137,12 +373,12 @@ class FileViewSet(ModelViewSet):
         folder_id = self.request.query_params.get("folder")
         password = self.request.query_params.get("password")
 
-        if self.action == "retrieve":
+        if self.action in ("retrieve", "download"):
             return queryset
 
         if not folder_id:
             if self.request.user.is_authenticated:
-                return queryset.filter(owner=self.request.user)
+                return queryset.filter(owner_id=self.request.user.id)
             return File.objects.none()
 
         queryset = queryset.filter(folder_id=folder_id)
@@ -155,7 +391,7 @@ class FileViewSet(ModelViewSet):
         if folder.is_public:
             return queryset
 
-        if self.request.user == folder.owner:
+        if self.request.user.id == folder.owner_id:
             return queryset
 
         if password and folder.password and check_password(password, folder.password):
@@ -167,7 +403,7 @@ class FileViewSet(ModelViewSet):
         file_obj = self.get_object()
         folder = file_obj.folder
 
-        if folder.is_public or request.user == folder.owner:
+        if folder.is_public or request.user.id == folder.owner_id:
             return super().retrieve(request, *args, **kwargs)
 
         password = request.query_params.get("password")
@@ -176,13 +412,27 @@ class FileViewSet(ModelViewSet):
 
         return Response({"error": "This file belongs to a private folder."}, status=403)
 
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        file_obj = self.get_object()
+        folder = file_obj.folder
+
+        if not (folder.is_public or request.user.id == folder.owner_id):
+            password = request.query_params.get("password")
+            if not (password and folder.password and check_password(password, folder.password)):
+                return Response({"error": "This file belongs to a private folder."}, status=403)
+
+        record_access(request, folder.id, DOWNLOAD, file_obj.id)
+        return FileResponse(file_obj.file.open("rb"), as_attachment=True, filename=file_obj.name)
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
 
-class FolderCommentViewSet(ModelViewSet):
+class FolderCommentViewSet(ConditionalGetMixin, ReplicaReadMixin, ModelViewSet):
     serializer_class = FolderCommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    conditional_actions = {"list": "list_validators"}
 
     def get_queryset(self):
         queryset = FolderComment.objects.all().order_by("-created_at")
@@ -191,13 +441,18 @@ class FolderCommentViewSet(ModelViewSet):
             queryset = queryset.filter(folder_id=folder_id)
         return queryset
 
+    def list_validators(self, request):
+        return versions.current(FolderComment, User)
+
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        comment = serializer.save(owner=self.request.user)
+        notify.folder_commented(comment)
 
 
-class FileCommentViewSet(ModelViewSet):
+class FileCommentViewSet(ConditionalGetMixin, ReplicaReadMixin, ModelViewSet):
     serializer_class = FileCommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    conditional_actions = {"list": "list_validators"}
 
     def get_queryset(self):
         queryset = FileComment.objects.all().order_by("-created_at")
@@ -206,11 +461,15 @@ class FileCommentViewSet(ModelViewSet):
             queryset = queryset.filter(file_id=file_id)
         return queryset
 
+    def list_validators(self, request):
+        return versions.current(FileComment, User)
+
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        comment = serializer.save(owner=self.request.user)
+        notify.file_commented(comment)
 
 
-class FolderMessageViewSet(ModelViewSet):
+class FolderMessageViewSet(ReplicaReadMixin, ModelViewSet):
     serializer_class = FolderMessageSerializer
     permission_classes = [IsAuthenticated]
 
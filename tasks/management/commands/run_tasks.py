@@ -0,0 +1,120 @@
+import logging
+import os
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+
+from core.prefork import warm_up
+from tasks.queue import claim, execute, purge_finished, requeue_stale, worker_id
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks with a pool of worker threads."
+    # Workers never serve HTTP, so skip the checks that import every URLconf and view.
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Threads per process.")
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Fork this many worker processes from one warmed-up parent.",
+        )
+        parser.add_argument("--batch-size", type=int, default=10, help="Tasks claimed per query.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when idle.")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is drained.")
+
+    def handle(self, *args, **options):
+        if options["processes"] <= 1:
+            return self.run_workers(options)
+        if not hasattr(os, "fork"):
+            raise CommandError("--processes needs a platform with os.fork().")
+
+        warm_up(urls=False)
+        children = []
+        for _ in range(options["processes"]):
+            pid = os.fork()
+            if pid == 0:
+                # Children reset the signal handlers themselves in run_workers().
+                code = 0
+                try:
+                    self.run_workers(options)
+                except BaseException:
+                    logger.exception("Task worker process failed")
+                    code = 1
+                finally:
+                    self.stdout.flush()
+                    os._exit(code)
+            children.append(pid)
+
+        def forward(signum, frame):
+            for pid in children:
+                try:
+                    os.kill(pid, signum)
+                except ProcessLookupError:
+                    pass
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, forward)
+        for pid in children:
+            os.waitpid(pid, 0)
+
+    def run_workers(self, options):
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda *_: stop.set())
+
+        requeue_stale(settings.TASKS_LOCK_TIMEOUT)
+        purged = purge_finished(settings.TASKS_RETENTION_DAYS)
+        if purged:
+            self.stdout.write(f"Purged {purged} finished tasks.")
+
+        counts = {"done": 0, "failed": 0, "queued": 0}
+        lock = threading.Lock()
+
+        def work():
+            name = worker_id()
+            try:
+                while not stop.is_set():
+                    try:
+                        rows = claim(name, options["batch_size"])
+                    except DatabaseError:
+                        # Lock contention or a dropped connection; try again after a pause.
+                        logger.exception("Could not claim tasks")
+                        connections.close_all()
+                        stop.wait(options["poll_interval"])
+                        continue
+                    if not rows:
+                        if options["once"]:
+                            return
+                        stop.wait(options["poll_interval"])
+                        continue
+                    for row in rows:
+                        status = execute(row)
+                        with lock:
+                            counts[status] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(options["workers"])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Ran {counts['done']} tasks ({counts['failed']} failed, {counts['queued']} to retry) "
+                f"in {time.monotonic() - started:.1f}s."
+            )
+        )
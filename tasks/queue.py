@@ -0,0 +1,201 @@
+"""
+A small task queue stored in the ``tasks_task`` table.
+
+Functions decorated with ``@task`` in an app's ``tasks`` module get an
+``enqueue()`` method. Enqueueing inserts a row in the caller's transaction,
+so a rolled-back request never leaves work behind. ``manage.py run_tasks``
+claims rows with ``SELECT ... FOR UPDATE SKIP LOCKED`` (highest priority and
+oldest first), runs them, and retries failures with exponential backoff up
+to ``max_attempts``. A task that fails for good gives up its idempotency key
+so the same work can be enqueued again. With ``TASKS_EAGER`` (the default),
+tasks run in-process right after the surrounding transaction commits and no
+worker is needed; a task with an idempotency key still claims it with a row
+of its own, so eager mode drops repeats exactly like the queue does. Tasks
+declared with ``background=True`` run eagerly on a thread of their own
+instead, so slow work stays out of the request; like the rest of eager
+mode, they are lost if the process exits first.
+"""
+
+import logging
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+class TaskFunction:
+    def __init__(self, func, name, priority, max_attempts, background):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.background = background
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, idempotency_key=None, priority=None, delay=None, **kwargs):
+        return enqueue(
+            self.name,
+            args=args,
+            kwargs=kwargs,
+            priority=self.priority if priority is None else priority,
+            delay=delay,
+            idempotency_key=idempotency_key,
+            max_attempts=self.max_attempts,
+            background=self.background,
+        )
+
+
+def task(func=None, *, name=None, priority=0, max_attempts=3, background=False):
+    def register(func):
+        task_name = name or f"{func.__module__}.{func.__qualname__}"
+        REGISTRY[task_name] = TaskFunction(func, task_name, priority, max_attempts, background)
+        return REGISTRY[task_name]
+
+    return register(func) if func is not None else register
+
+
+def enqueue(
+    name, args=(), kwargs=None, priority=0, delay=None, idempotency_key=None, max_attempts=3, background=False
+):
+    kwargs = kwargs or {}
+    if settings.TASKS_EAGER:
+        if idempotency_key is not None:
+            return _enqueue_eager_once(name, args, kwargs, priority, idempotency_key, background)
+        # robust: a failing side effect is logged, not raised into a committed request.
+        _run_after_commit(lambda: REGISTRY[name](*args, **kwargs), background)
+        return None
+
+    row = Task(
+        name=name,
+        args=list(args),
+        kwargs=kwargs,
+        priority=priority,
+        run_at=timezone.now() + (delay or timedelta()),
+        idempotency_key=idempotency_key,
+        max_attempts=max_attempts,
+    )
+    if idempotency_key is None:
+        row.save()
+    else:
+        # A single INSERT that is ignored when the key is already queued or done.
+        Task.objects.bulk_create([row], ignore_conflicts=True)
+    return row
+
+
+def _run_after_commit(job, background):
+    transaction.on_commit(partial(_start_thread, job) if background else job, robust=True)
+
+
+def _start_thread(job):
+    def run():
+        try:
+            job()
+        except Exception:
+            logger.exception("Background task failed")
+        finally:
+            # The thread's connections would otherwise stay open until the server restarts.
+            connections.close_all()
+
+    threading.Thread(target=run, name="eager-task", daemon=True).start()
+
+
+def _enqueue_eager_once(name, args, kwargs, priority, idempotency_key, background):
+    # Claim the key in the caller's transaction as a single-attempt running
+    # row; ``execute`` then marks it done, or failed and releases the key.
+    row = Task(
+        name=name,
+        args=list(args),
+        kwargs=kwargs,
+        priority=priority,
+        status=Task.RUNNING,
+        attempts=1,
+        max_attempts=1,
+        idempotency_key=idempotency_key,
+        locked_by=worker_id(),
+        locked_at=timezone.now(),
+    )
+    try:
+        with transaction.atomic():
+            row.save()
+    except IntegrityError:
+        # Already run, or waiting to run, under this key.
+        return None
+    _run_after_commit(lambda: execute(row), background)
+    return row
+
+
+def requeue_stale(timeout):
+    """Release tasks whose worker died mid-run."""
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return Task.objects.filter(status=Task.RUNNING, locked_at__lt=cutoff).update(
+        status=Task.QUEUED, locked_by="", locked_at=None
+    )
+
+
+def claim(worker_id, batch_size=10):
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status=Task.QUEUED, run_at__lte=now)
+            .order_by("-priority", "run_at", "id")[:batch_size]
+        )
+        for row in tasks:
+            row.status = Task.RUNNING
+            row.locked_by = worker_id
+            row.locked_at = now
+            row.attempts += 1
+        Task.objects.bulk_update(tasks, ["status", "locked_by", "locked_at", "attempts"])
+    return tasks
+
+
+def execute(row):
+    func = REGISTRY.get(row.name)
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task {row.name!r}")
+        func(*row.args, **row.kwargs)
+    except Exception:
+        row.last_error = traceback.format_exc()
+        if row.attempts < row.max_attempts and func is not None:
+            row.status = Task.QUEUED
+            row.run_at = timezone.now() + timedelta(seconds=settings.TASKS_RETRY_DELAY * 2 ** (row.attempts - 1))
+            logger.warning("Task %s #%s failed, retrying at %s", row.name, row.pk, row.run_at)
+        else:
+            row.status = Task.FAILED
+            row.finished_at = timezone.now()
+            row.idempotency_key = None
+            logger.error("Task %s #%s failed permanently", row.name, row.pk)
+    else:
+        row.status = Task.DONE
+        row.finished_at = timezone.now()
+        row.last_error = ""
+    row.locked_by = ""
+    row.locked_at = None
+    row.save(
+        update_fields=["status", "run_at", "finished_at", "last_error", "locked_by", "locked_at", "idempotency_key"]
+    )
+    return row.status
+
+
+def purge_finished(days):
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Task.objects.filter(status=Task.DONE, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{threading.get_native_id()}"
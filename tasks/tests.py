@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Task
+from .queue import claim, enqueue, execute, task
+
+calls = []
+
+
+@task(name="tasks.tests.flaky", max_attempts=2)
+def flaky(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise RuntimeError("boom")
+
+
+@override_settings(TASKS_EAGER=False, TASKS_RETRY_DELAY=10)
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_claim_runs_highest_priority_first(self):
+        flaky.enqueue("low")
+        flaky.enqueue("high", priority=5)
+        flaky.enqueue("later", delay=timedelta(hours=1))
+
+        rows = claim("test-worker")
+        self.assertEqual([row.args for row in rows], [["high"], ["low"]])
+        self.assertTrue(all(row.status == Task.RUNNING and row.attempts == 1 for row in rows))
+        self.assertEqual(claim("other-worker"), [])
+
+        for row in rows:
+            self.assertEqual(execute(row), Task.DONE)
+        self.assertEqual(calls, ["high", "low"])
+
+    def test_failure_retries_with_backoff_then_fails(self):
+        flaky.enqueue("x", fail=True)
+
+        (row,) = claim("test-worker")
+        before = timezone.now()
+        self.assertEqual(execute(row), Task.QUEUED)
+        row.refresh_from_db()
+        self.assertGreaterEqual(row.run_at, before + timedelta(seconds=10))
+        self.assertIn("RuntimeError", row.last_error)
+
+        Task.objects.filter(pk=row.pk).update(run_at=timezone.now())
+        (row,) = claim("test-worker")
+        self.assertEqual(row.attempts, 2)
+        self.assertEqual(execute(row), Task.FAILED)
+        self.assertEqual(claim("test-worker"), [])
+
+    def test_idempotency_key_dedupes_until_failed(self):
+        flaky.enqueue("x", fail=True, idempotency_key="k")
+        flaky.enqueue("x", fail=True, idempotency_key="k")
+        self.assertEqual(Task.objects.count(), 1)
+
+        Task.objects.update(max_attempts=1)
+        (row,) = claim("test-worker")
+        self.assertEqual(execute(row), Task.FAILED)
+        row.refresh_from_db()
+        self.assertIsNone(row.idempotency_key)
+
+        flaky.enqueue("x", idempotency_key="k")
+        self.assertEqual(Task.objects.filter(status=Task.QUEUED, idempotency_key="k").count(), 1)
+
+    def test_unknown_task_fails_without_retry(self):
+        enqueue("tasks.tests.missing")
+        (row,) = claim("test-worker")
+        self.assertEqual(execute(row), Task.FAILED)
+
+
+@override_settings(TASKS_EAGER=True)
+class EagerTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_after_commit_without_a_row(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            flaky.enqueue("now")
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, ["now"])
+        self.assertFalse(Task.objects.exists())
+
+    def test_idempotency_key_dedupes_until_failed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            flaky.enqueue("x", fail=True, idempotency_key="k")
+            self.assertIsNone(flaky.enqueue("x", fail=True, idempotency_key="k"))
+        self.assertEqual(calls, ["x"])
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            flaky.enqueue("y", idempotency_key="k")
+        with self.captureOnCommitCallbacks(execute=True):
+            flaky.enqueue("y", idempotency_key="k")
+        self.assertEqual(calls, ["x", "y"])
+        self.assertEqual(Task.objects.get(idempotency_key="k").status, Task.DONE)